@@ -0,0 +1,101 @@
+"""
+CPU inference benchmark for the SD3D CPU profile.
+
+Loads --model on the CPU once per setting, applies that setting's
+CpuInferenceProfile, runs a short warm-up call (which also pays for
+torch.compile) and then times --runs generations of --steps denoising steps,
+reporting the median seconds per step and the speed-up over the float32
+baseline. Needs torch and diffusers, and the model in the Hugging Face cache
+or reachable online.
+
+Settings: baseline (float32, torch defaults), threads, bf16, channels_last,
+compile, int8, and all (threads, bf16 where supported, channels_last and
+compile; int8 is left out as it rules out bf16).
+
+Usage (from the repository root):
+    python -m api.benchmarks.cpu_inference_benchmark --model stabilityai/sd-turbo --steps 8
+    python -m api.benchmarks.cpu_inference_benchmark --setting baseline --setting bf16 --threads 16
+"""
+import argparse
+import os
+import statistics
+import time
+from typing import Dict, List
+
+from api.generators.cpu_inference import CpuInferenceProfile, bfloat16_supported
+
+SETTINGS = ("baseline", "threads", "bf16", "channels_last", "compile", "int8", "all")
+
+
+def make_profile(setting: str, threads: int) -> CpuInferenceProfile:
+    plain = dict(threads=0, bfloat16="false", channels_last=False, compile=False, quantize_int8=False)
+    overrides = {
+        "baseline": {},
+        "threads": {"threads": threads},
+        "bf16": {"bfloat16": "true"},
+        "channels_last": {"channels_last": True},
+        "compile": {"compile": True},
+        "int8": {"quantize_int8": True},
+        "all": {"threads": threads, "bfloat16": "auto", "channels_last": True, "compile": True},
+    }[setting]
+    return CpuInferenceProfile(**dict(plain, **overrides))
+
+
+def seconds_per_step(pipeline, profile: CpuInferenceProfile, prompt: str, steps: int, size: int) -> List[float]:
+    stamps: List[float] = []
+
+    def on_step_end(pipe, step, timestep, callback_kwargs):
+        stamps.append(time.perf_counter())
+        return callback_kwargs
+
+    started = time.perf_counter()
+    with profile.inference():
+        pipeline(prompt, num_inference_steps=steps, height=size, width=size, guidance_scale=7.5,
+                 callback_on_step_end=on_step_end)
+    # Each step ends at a stamp; the first one starts after prompt encoding, so it is left out
+    return [later - earlier for earlier, later in zip(stamps, stamps[1:])] or [time.perf_counter() - started]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SD3D CPU inference settings")
+    parser.add_argument("--model", default="stabilityai/sd-turbo", help="Diffusers model id or path")
+    parser.add_argument("--setting", choices=SETTINGS, action="append", default=[], help="Setting to time, repeatable (default: all)")
+    parser.add_argument("--steps", type=int, default=8, help="Denoising steps per run")
+    parser.add_argument("--runs", type=int, default=2, help="Timed runs per setting")
+    parser.add_argument("--size", type=int, default=512, help="Image height and width")
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads for the threads/all settings (0 = physical cores)")
+    parser.add_argument("--prompt", default="a wooden treasure chest, highly detailed, 3D model")
+    args = parser.parse_args()
+
+    import torch
+    from diffusers import DiffusionPipeline
+
+    default_threads = torch.get_num_threads()
+    threads = args.threads or max((os.cpu_count() or 2) // 2, 1)
+    print(f"model={args.model} steps={args.steps} size={args.size} torch threads={default_threads} "
+          f"bf16 kernels={'yes' if bfloat16_supported() else 'no'}")
+
+    results: Dict[str, float] = {}
+    for setting in args.setting or SETTINGS:
+        profile = make_profile(setting, threads)
+        # Thread pools are process-wide; settings without a thread count get torch's default back
+        torch.set_num_threads(profile.threads or default_threads)
+        pipeline = DiffusionPipeline.from_pretrained(args.model, torch_dtype=torch.float32)
+        pipeline.set_progress_bar_config(disable=True)
+        pipeline = profile.optimize(pipeline.to("cpu"))
+        seconds_per_step(pipeline, profile, args.prompt, 2, args.size)
+        timings = []
+        for _ in range(args.runs):
+            timings.extend(seconds_per_step(pipeline, profile, args.prompt, args.steps, args.size))
+        results[setting] = statistics.median(timings)
+        del pipeline
+
+    baseline = results.get("baseline")
+    print(f"\n{'setting':<16}{'s/step':>10}{'speed-up':>10}")
+    for setting, seconds in results.items():
+        speedup = f"{baseline / seconds:.2f}x" if baseline else "-"
+        print(f"{setting:<16}{seconds:>10.3f}{speedup:>10}")
+
+
+if __name__ == "__main__":
+    main()
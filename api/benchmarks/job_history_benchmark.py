@@ -0,0 +1,88 @@
+"""
+Job history query latency benchmark.
+
+Fills a job history with synthetic jobs spread over the past --days days and
+times the admin API queries: the first page, a page deep into the history
+(reached through its cursor), filtered pages and the status/percentile
+aggregates over a one day window. With keyset pagination and the history
+indexes, every query should take about as long at 10M rows as at 100k.
+
+Usage (from the repository root):
+    python -m api.benchmarks.job_history_benchmark --rows 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from api.core.history import JobHistory, encode_cursor
+
+STATUSES = ("completed",) * 8 + ("failed", "cancelled")
+STYLES = ("realistic", "stylized", "cartoon", "anime", "low_poly", "sci_fi", "fantasy")
+
+
+def populate(history: JobHistory, rows: int, days: float, users: int):
+    conn = history._connect()
+    now = time.time()
+    chunk = 50_000
+    for offset in range(0, rows, chunk):
+        batch = []
+        for index in range(offset, min(offset + chunk, rows)):
+            created_at = now - random.random() * days * 86400
+            duration = random.lognormvariate(3.5, 0.6)
+            batch.append((
+                f"job-{index:09d}", random.choice(STATUSES), f"user-{random.randrange(users)}",
+                random.choice(STYLES), random.choice(("draft", "standard", "high")),
+                created_at, created_at + 1.0, created_at + duration, duration,
+            ))
+        conn.execute("BEGIN")
+        conn.executemany(f"INSERT INTO job_history ({', '.join(JobHistory.COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark job history queries")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Historical jobs to generate")
+    parser.add_argument("--days", type=float, default=90, help="Days the jobs are spread over")
+    parser.add_argument("--users", type=int, default=10_000, help="Distinct users")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = JobHistory(os.path.join(tmp, "history.db"))
+        started = time.perf_counter()
+        populate(history, args.rows, args.days, args.users)
+        print(f"rows={args.rows:,} populated in {time.perf_counter() - started:.1f}s")
+
+        now = time.time()
+        middle = history._connect().execute(
+            "SELECT created_at, job_id FROM job_history ORDER BY created_at LIMIT 1 OFFSET ?", (args.rows // 2,)
+        ).fetchone()
+        deep_cursor = encode_cursor(middle[0], middle[1])
+        queries = [
+            ("first page", lambda: history.query(limit=50)),
+            ("deep page (cursor)", lambda: history.query(limit=50, cursor=deep_cursor)),
+            ("status=failed", lambda: history.query(status="failed", limit=50)),
+            ("status=failed deep", lambda: history.query(status="failed", limit=50, cursor=deep_cursor)),
+            ("user", lambda: history.query(user_id="user-42", limit=50)),
+            ("style + last day", lambda: history.query(style="anime", since=now - 86400, limit=50)),
+            ("aggregates last day", lambda: history.aggregates(since=now - 86400)),
+            ("aggregates last week", lambda: history.aggregates(since=now - 7 * 86400)),
+        ]
+        print(f"{'query':<24}{'ms':>10}")
+        for name, query in queries:
+            print(f"{name:<24}{timed(query):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Job store write throughput benchmark.
+
+Compares the in-memory dict backend with the SQLite WAL backend. The dict can
+only be measured inside one process (it is not shared); the SQLite backend is
+additionally measured with several writer processes hammering the same file,
+which is the multi-worker uvicorn case.
+
+Usage (from the repository root):
+    python -m api.benchmarks.job_store_benchmark --jobs 200 --updates 50 --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from uuid import uuid4
+
+# Importing the job store module opens the configured job store and history, so
+# they are pointed at a throwaway directory first (settings are read at import time)
+_STATE_DIR = tempfile.mkdtemp(prefix="job_store_benchmark_")
+os.environ.update({
+    "JOB_STORE_BACKEND": "sqlite",
+    "JOB_STORE_PATH": os.path.join(_STATE_DIR, "jobs.db"),
+    "JOB_HISTORY_PATH": os.path.join(_STATE_DIR, "jobs.db"),
+})
+
+from api.core.jobs import InMemoryJobStore, SQLiteJobStore  # noqa: E402
+
+
+def _drive(store, job_ids, updates: int) -> int:
+    writes = 0
+    for job_id in job_ids:
+        store.create(job_id)
+        writes += 1
+    for step in range(updates):
+        for job_id in job_ids:
+            store.update(job_id, "processing", step, f"Step {step}")
+            writes += 1
+    for job_id in job_ids:
+        store.complete(job_id, {"modelUrl": f"/static/generated/{job_id}.glb"})
+        writes += 1
+    return writes
+
+
+def _sqlite_worker(path: str, jobs: int, updates: int, start, results) -> None:
+    store = SQLiteJobStore(path)
+    job_ids = [str(uuid4()) for _ in range(jobs)]
+    start.wait()
+    results.put(_drive(store, job_ids, updates))
+
+
+def bench_memory(jobs: int, updates: int) -> float:
+    store = InMemoryJobStore({})
+    job_ids = [str(uuid4()) for _ in range(jobs)]
+    started = time.perf_counter()
+    writes = _drive(store, job_ids, updates)
+    return writes / (time.perf_counter() - started)
+
+
+def bench_sqlite(path: str, jobs: int, updates: int, processes: int) -> float:
+    SQLiteJobStore(path)  # create the schema before the writers race for it
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_sqlite_worker, args=(path, jobs, updates, start, results))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    started = time.perf_counter()
+    start.set()
+    writes = sum(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    return writes / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark job store backends")
+    parser.add_argument("--jobs", type=int, default=200, help="Jobs created per process")
+    parser.add_argument("--updates", type=int, default=50, help="Status updates per job")
+    parser.add_argument("--processes", type=int, default=4, help="Writer processes for the SQLite run")
+    args = parser.parse_args()
+
+    print(f"jobs={args.jobs} updates/job={args.updates}")
+    print(f"{'backend':<28}{'writes/s':>12}")
+    print(f"{'memory (1 process)':<28}{bench_memory(args.jobs, args.updates):>12,.0f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for processes in sorted({1, args.processes}):
+            path = os.path.join(tmp, f"jobs_{processes}.db")
+            rate = bench_sqlite(path, args.jobs, args.updates, processes)
+            print(f"{f'sqlite-wal ({processes} processes)':<28}{rate:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Synthetic load harness for the full generation pipeline.
+
+Replaces the generators and post-processing services with configurable
+latency/CPU-burn profiles, then drives --jobs jobs through the real
+asset_pipeline on a PipelineExecutor, with the real job store, checkpoints,
+progress writes and asset save (all in a temporary directory). Reports
+throughput, queue wait and end-to-end latency percentiles, and the mean time
+spent per stage, for sizing slots and workers.
+
+A profile is STAGE=LATENCY[:CPU[:JITTER]] in seconds: LATENCY is spent
+sleeping (waiting on a GPU or a service), CPU is spent busy in Python, and
+JITTER (0..1) varies both uniformly by that fraction per job. Stages are
+generate, rigging, animation, conversion and splats; save always runs for real.
+Defaults are the mock services' own sleeps, multiplied by --scale.
+
+Usage (from the repository root):
+    python -m api.benchmarks.pipeline_load_benchmark --jobs 200 --slots 4 --rate 5
+    python -m api.benchmarks.pipeline_load_benchmark --profile generate=20:1:0.3 --profile splats=0:2 --scale 0.05
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+# Current mock sleeps (SD3D mock pipeline: 2s, rigging 5s, animation 3s, converter 2s)
+DEFAULT_PROFILES = {
+    "generate": (2.0, 0.0, 0.2),
+    "rigging": (5.0, 0.0, 0.2),
+    "animation": (3.0, 0.0, 0.2),
+    "conversion": (2.0, 0.0, 0.2),
+    "splats": (0.0, 0.5, 0.2),
+}
+GENERATE_STEPS = 20
+
+
+def parse_profile(spec: str) -> Tuple[str, Tuple[float, float, float]]:
+    stage, _, values = spec.partition("=")
+    if stage not in DEFAULT_PROFILES or not values:
+        raise argparse.ArgumentTypeError(f"Expected STAGE=LATENCY[:CPU[:JITTER]] with STAGE in {sorted(DEFAULT_PROFILES)}")
+    numbers = [float(value) for value in values.split(":")]
+    if len(numbers) > 3:
+        raise argparse.ArgumentTypeError(f"Too many values in profile {spec!r}")
+    latency = numbers[0]
+    cpu = numbers[1] if len(numbers) > 1 else 0.0
+    jitter = numbers[2] if len(numbers) > 2 else DEFAULT_PROFILES[stage][2]
+    return stage, (latency, cpu, jitter)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class StageProfile:
+    """Simulated cost of one stage: a sleep plus a CPU busy loop, both jittered per call."""
+
+    def __init__(self, latency: float, cpu: float, jitter: float):
+        self.latency = latency
+        self.cpu = cpu
+        self.jitter = jitter
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter) if seconds > 0 else 0.0
+
+    def run(self, parts: int = 1, on_part=None):
+        latency, cpu = self._jittered(self.latency), self._jittered(self.cpu)
+        for part in range(parts):
+            time.sleep(latency / parts)
+            deadline = time.perf_counter() + cpu / parts
+            while time.perf_counter() < deadline:
+                pass
+            if on_part is not None:
+                on_part(part + 1, parts)
+
+
+def install_profiles(profiles: Dict[str, StageProfile]):
+    """
+    Swap the generators and post-processing services for the profiles. The pipeline
+    code itself (stage graph, job store, checkpoints, save) is left untouched.
+    """
+    from api.generators import brickgpt, dreamfusion, gaussian_splatting, stable_diffusion_3d
+    from api.postprocessing import rigging, animation, converter
+
+    def generate(job_id: str, *args, step_callback=None, **kwargs) -> str:
+        # Steps go through the real step callback, so progress writes are part of the load
+        profiles["generate"].run(GENERATE_STEPS, step_callback)
+        return f"static/generated/{job_id}/model.glb"
+
+    def generate_batch(requests, style, *args, step_callbacks=None, **kwargs):
+        # One profile run serves the whole micro-batch, like one batched forward pass
+        callbacks = list((step_callbacks or {}).values())
+        profiles["generate"].run(GENERATE_STEPS, lambda step, total: [callback(step, total) for callback in callbacks])
+        return {request["job_id"]: f"static/generated/{request['job_id']}/model.glb" for request in requests}
+
+    stable_diffusion_3d.sd3d_generator.generate = generate
+    stable_diffusion_3d.sd3d_generator.generate_batch = generate_batch
+    brickgpt.generate = generate
+    dreamfusion.generate = generate
+    rigging.run = lambda job_id, model_path: (profiles["rigging"].run(), model_path)[1]
+    animation.run = lambda job_id, model_path, animations: (profiles["animation"].run(), model_path)[1]
+    converter.run = lambda job_id, model_path, output_format: (profiles["conversion"].run(), {
+        "modelUrl": f"/static/generated/{job_id}/model.{output_format}",
+        "thumbnailUrl": f"/static/generated/{job_id}/model.png",
+    })[1]
+    gaussian_splatting.splat_converter.convert_model_to_splats = (
+        lambda model_path, output_dir, check_cancelled=None: (profiles["splats"].run(), {"status": "success", "splat_count": 10000})[1]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive synthetic jobs through the asset pipeline")
+    parser.add_argument("--jobs", type=int, default=100, help="Jobs to run")
+    parser.add_argument("--slots", type=int, default=4, help="Executor slots")
+    parser.add_argument("--mode", choices=("thread", "process"), default="thread",
+                        help="Executor mode (process mode relies on fork to inherit the profiles)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Arrivals per second (0 = submit all at once)")
+    parser.add_argument("--profile", type=parse_profile, action="append", default=[],
+                        help="STAGE=LATENCY[:CPU[:JITTER]] seconds, repeatable")
+    parser.add_argument("--scale", type=float, default=0.05, help="Multiplier applied to every profile")
+    parser.add_argument("--style", default="realistic", help="Style of the generated jobs")
+    parser.add_argument("--quality", default="standard", help="Quality of the generated jobs")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for jitter and arrivals")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's own log output")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    profiles = dict(DEFAULT_PROFILES)
+    profiles.update(args.profile)
+    profiles = {
+        stage: StageProfile(latency * args.scale, cpu * args.scale, jitter)
+        for stage, (latency, cpu, jitter) in profiles.items()
+    }
+
+    workdir = tempfile.mkdtemp(prefix="pipeline_load_")
+    os.chdir(workdir)
+    # Settings are read at import time, so the api modules are imported only after this
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'assets.db')}",
+        "JOB_STORE_BACKEND": "sqlite",
+        "JOB_STORE_PATH": os.path.join(workdir, "jobs.db"),
+        "CHECKPOINT_STORE_PATH": os.path.join(workdir, "jobs.db"),
+        "JOB_HISTORY_PATH": os.path.join(workdir, "jobs.db"),
+        "BROKER_PATH": os.path.join(workdir, "jobs.db"),
+        "GENERATION_CACHE_ENABLED": "false",
+        "PIPELINE_BACKEND": "local",
+    })
+    from api.core.database import engine, Base
+    from api.core.executor import PipelineExecutor
+    from api.core.jobs import create_job
+    from api.core.pipeline import asset_pipeline
+    from api.models import database as db_models  # noqa: F401 (registers the tables)
+    from api.models.assets import GenerateRequest
+    Base.metadata.create_all(bind=engine)
+    install_profiles(profiles)
+
+    executor = PipelineExecutor(slots=args.slots, mode=args.mode)
+    print(f"jobs={args.jobs} slots={args.slots} mode={args.mode} rate={args.rate or 'burst'}/s")
+    for stage, profile in profiles.items():
+        print(f"  {stage:<11} latency={profile.latency:.3f}s cpu={profile.cpu:.3f}s jitter={profile.jitter:.0%}")
+
+    log = sys.stdout if args.verbose else io.StringIO()
+    tasks = []
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        for index in range(args.jobs):
+            job_id = f"load-{index:06d}"
+            request = GenerateRequest(prompt=f"synthetic asset {index}", style=args.style, quality=args.quality)
+            create_job(job_id, request_data=request)
+            tasks.append(executor.submit(asset_pipeline, job_id, job_id=job_id, request_data=request))
+            if args.rate > 0:
+                time.sleep(random.expovariate(args.rate))
+        summaries = [task.future.result() for task in tasks]
+    elapsed = time.perf_counter() - started
+    executor.shutdown()
+
+    waits = [task.started_at - task.submitted_at for task in tasks]
+    latencies = [task.finished_at - task.submitted_at for task in tasks]
+    outcomes: Dict[str, int] = {}
+    stage_seconds: Dict[str, List[float]] = {}
+    for summary in summaries:
+        outcomes[summary["outcome"]] = outcomes.get(summary["outcome"], 0) + 1
+        for stage, seconds in summary["stageTimings"].items():
+            stage_seconds.setdefault(stage, []).append(seconds)
+
+    print(f"\noutcomes: {outcomes}")
+    print(f"throughput: {args.jobs / elapsed:.2f} jobs/s over {elapsed:.1f}s")
+    print(f"{'':<14}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, values in (("queue wait", waits), ("latency", latencies)):
+        print(f"{name:<14}" + "".join(f"{value:>9.3f}" for value in (
+            percentile(values, 0.50), percentile(values, 0.95), percentile(values, 0.99), max(values),
+        )))
+    print(f"\n{'stage':<14}{'mean s':>9}")
+    for stage, values in stage_seconds.items():
+        print(f"{stage:<14}{statistics.mean(values):>9.3f}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
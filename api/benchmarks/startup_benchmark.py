@@ -0,0 +1,94 @@
+"""
+API import-time regression benchmark.
+
+Imports --module (api.main by default) in fresh interpreters under
+`python -X importtime`, and reports the best wall time of --repeat runs and
+the modules with the largest cumulative import time. Fails (exit status 1)
+if a heavy ML dependency (torch, diffusers, trimesh) got imported, or if the
+import took longer than --budget seconds: those load on first generation or
+conversion, not at API startup.
+
+Usage (from the repository root):
+    python -m api.benchmarks.startup_benchmark --repeat 5 --budget 2.0
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+HEAVY_MODULES = ("torch", "diffusers", "trimesh")
+
+
+def import_times(module: str, workdir: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """
+    Import module in a fresh interpreter. Returns the wall time in seconds and the
+    (self, cumulative) import time in microseconds of every module it imported.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    # Keep the stores the api creates at import out of the working tree
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'assets.db')}",
+        "JOB_STORE_PATH": os.path.join(workdir, "jobs.db"),
+        "CHECKPOINT_STORE_PATH": os.path.join(workdir, "jobs.db"),
+        "JOB_HISTORY_PATH": os.path.join(workdir, "jobs.db"),
+        "BROKER_PATH": os.path.join(workdir, "jobs.db"),
+        "GENERATION_CACHE_DIR": os.path.join(workdir, "generations"),
+    })
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return elapsed, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API import time")
+    parser.add_argument("--module", default="api.main", help="Module to import")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to time; the best run counts")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--budget", type=float, default=0.0, help="Fail above this many seconds (0 = no budget)")
+    args = parser.parse_args()
+
+    runs: List[Tuple[float, Dict[str, Tuple[int, int]]]] = []
+    with tempfile.TemporaryDirectory(prefix="startup_") as workdir:
+        for _ in range(args.repeat):
+            runs.append(import_times(args.module, workdir))
+    elapsed, modules = min(runs, key=lambda run: run[0])
+
+    print(f"import {args.module}: best {elapsed:.3f}s of {args.repeat} (wall, including interpreter start)")
+    print(f"modules imported: {len(modules)}")
+    print(f"\n{'module':<48}{'self ms':>10}{'cumul ms':>10}")
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{name:<48}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+    heavy = sorted(name for name in modules if name.split(".")[0] in HEAVY_MODULES)
+    failed = False
+    if heavy:
+        print(f"\nFAIL: heavy modules imported at startup: {', '.join(heavy[:10])}")
+        failed = True
+    if args.budget and elapsed > args.budget:
+        print(f"\nFAIL: import took {elapsed:.3f}s, budget {args.budget:.3f}s")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
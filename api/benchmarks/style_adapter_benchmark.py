@@ -0,0 +1,78 @@
+"""
+Style adapter memory and switch latency benchmark.
+
+Loads the shared base model (--base), attaches the LoRA adapter of every
+--style (from the --adapters template), then switches between the styles
+round-robin --switches times. Reports the base model's memory and load time,
+each adapter's memory and load time, and the switch latency percentiles.
+With --checkpoint, also loads that full per-style checkpoint once, to compare
+against the checkpoints mode cost of one full pipeline per style. Needs torch,
+diffusers and peft.
+
+Usage (from the repository root):
+    python -m api.benchmarks.style_adapter_benchmark --base stabilityai/stable-diffusion-3d \\
+        --adapters "stabilityai/stable-diffusion-3d-{style}-lora" --style realistic --style cartoon --style anime
+"""
+import argparse
+import time
+
+from api.generators.stable_diffusion_3d import sd3d_generator
+from api.generators.style_adapters import StyleAdapters
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def load_pipeline(model_id: str):
+    import torch
+    from diffusers import DiffusionPipeline
+    started = time.perf_counter()
+    pipeline = DiffusionPipeline.from_pretrained(model_id, torch_dtype=torch.float32)
+    return pipeline, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark style adapters on a shared base model")
+    parser.add_argument("--base", required=True, help="Base model id or path")
+    parser.add_argument("--adapters", required=True, help="LoRA id or path template with {style}")
+    parser.add_argument("--style", action="append", default=[], help="Style to load, repeatable (default: all SD3D styles)")
+    parser.add_argument("--switches", type=int, default=200, help="Style switches to time")
+    parser.add_argument("--checkpoint", help="A full per-style checkpoint to compare against")
+    args = parser.parse_args()
+    styles = args.style or sd3d_generator.available_styles
+    mib = 1024 ** 2
+
+    pipeline, base_seconds = load_pipeline(args.base)
+    base_bytes = sd3d_generator._pipeline_bytes(pipeline)
+    print(f"base model: {base_bytes / mib:.0f} MiB, loaded in {base_seconds:.1f}s")
+
+    adapters = StyleAdapters(pipeline, {style: args.adapters.format(style=style) for style in styles})
+    for style in styles:
+        adapters.preload(style)
+    stats = adapters.stats()
+    print(f"\n{'style':<14}{'kind':>8}{'MiB':>10}{'load s':>10}")
+    for style, adapter in stats["adapters"].items():
+        print(f"{style:<14}{adapter['kind']:>8}{adapter['bytes'] / mib:>10.1f}{adapter['loadSeconds']:>10.2f}")
+    print(f"total: {(base_bytes + stats['adapterBytes']) / mib:.0f} MiB for {len(styles)} styles")
+
+    latencies = []
+    for index in range(args.switches):
+        started = time.perf_counter()
+        with adapters.use(styles[index % len(styles)]):
+            latencies.append(time.perf_counter() - started)
+    print(f"\nswitch latency over {args.switches} switches: p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms")
+
+    if args.checkpoint:
+        del pipeline, adapters
+        checkpoint, checkpoint_seconds = load_pipeline(args.checkpoint)
+        checkpoint_bytes = sd3d_generator._pipeline_bytes(checkpoint)
+        print(f"\nfull checkpoint: {checkpoint_bytes / mib:.0f} MiB, loaded in {checkpoint_seconds:.1f}s "
+              f"(x{len(styles)} styles: {checkpoint_bytes * len(styles) / mib:.0f} MiB, "
+              f"{checkpoint_seconds * len(styles):.0f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import math
+import re
+from typing import Optional
+
+from .config import settings
+from .dispatch import pipeline_dispatcher
+from ..generators import stable_diffusion_3d
+
+
+class AdmissionRejected(Exception):
+    """Raised when accepting a job would push its expected finish past ADMISSION_MAX_WAIT."""
+
+    def __init__(self, retry_after: int, queue_position: int, estimated_wait: float):
+        super().__init__(f"Pipeline is overloaded, retry in {retry_after}s")
+        self.retry_after = retry_after
+        self.queue_position = queue_position
+        self.estimated_wait = estimated_wait
+
+
+def estimate_job_seconds(style: Optional[str], quality: Optional[str]) -> float:
+    """
+    Expected pipeline run time for a request: the midpoint of the style's advertised
+    generation time, scaled by the quality's inference steps relative to "standard".
+    Uploads and non-SD3D styles fall back to ADMISSION_DEFAULT_JOB_SECONDS.
+    """
+    generator = stable_diffusion_3d.sd3d_generator
+    if style not in generator.get_available_styles():
+        return settings.ADMISSION_DEFAULT_JOB_SECONDS
+    numbers = [float(n) for n in re.findall(r"\d+(?:\.\d+)?", generator.get_style_info(style).get("generation_time", ""))]
+    if not numbers:
+        return settings.ADMISSION_DEFAULT_JOB_SECONDS
+    seconds = sum(numbers) / len(numbers)
+    steps = generator._get_generation_params(quality or "standard", 24)["num_inference_steps"]
+    standard_steps = generator._get_generation_params("standard", 24)["num_inference_steps"]
+    return seconds * steps / standard_steps
+
+
+class AdmissionController:
+    """
+    Rejects new work the pipeline cannot finish within max_wait seconds.
+
+    The expected finish of a job is the dispatcher's backlog (estimated work of every
+    queued and running job, spread over the executor or worker slots) plus the job's
+    own estimate. An idle pipeline always admits, so a single oversized job is never starved.
+    """
+
+    def __init__(self, dispatcher, max_wait: float):
+        self.dispatcher = dispatcher
+        self.max_wait = max_wait
+
+    def check(self, cost: float, lane: int = 1) -> None:
+        """
+        Raise AdmissionRejected if a job costing cost seconds should not be queued in lane now.
+        Only work the job would not overtake counts towards its wait.
+        """
+        if self.max_wait <= 0:
+            return
+        stats = self.dispatcher.stats()
+        if stats["busy_slots"] < stats["slots"] and stats["queue_depth"] == 0:
+            return
+        wait = self.dispatcher.backlog_seconds(lane)
+        if wait + cost <= self.max_wait:
+            return
+        raise AdmissionRejected(
+            retry_after=max(1, math.ceil(wait + cost - self.max_wait)),
+            queue_position=self.dispatcher.queue_position(lane),
+            estimated_wait=wait,
+        )
+
+
+# Global instance
+admission_controller = AdmissionController(pipeline_dispatcher, settings.ADMISSION_MAX_WAIT)
@@ -0,0 +1,292 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional
+
+from .config import settings
+from .executor import QueueFullError, LANES
+
+
+class Lease:
+    """A message handed to one worker until its lease expires."""
+
+    __slots__ = ("message_id", "job_id", "task", "payload", "deliveries", "worker_id", "lane", "enqueued_at",
+                 "leased_at")
+
+    def __init__(self, message_id: int, job_id: Optional[str], task: str, payload: Dict[str, Any],
+                 deliveries: int, worker_id: str, lane: int = 1, enqueued_at: Optional[float] = None,
+                 leased_at: Optional[float] = None):
+        self.message_id = message_id
+        self.job_id = job_id
+        self.task = task
+        self.payload = payload
+        self.deliveries = deliveries
+        self.worker_id = worker_id
+        self.lane = lane
+        self.enqueued_at = enqueued_at
+        self.leased_at = leased_at
+
+
+class JobBroker(ABC):
+    """
+    Interface for the queue between API nodes and pipeline workers.
+
+    A worker leases a message for lease_seconds and keeps it alive with
+    heartbeats. It acks the message when done. A message whose lease expires
+    (the worker died or hung) is delivered again, up to max_deliveries times,
+    after which it is dead-lettered.
+    """
+
+    @abstractmethod
+    def enqueue(self, task: str, payload: Dict[str, Any], job_id: str = None, lane: int = 1,
+                cost: float = 0.0) -> int:
+        ...
+
+    @abstractmethod
+    def lease(self, worker_id: str, lease_seconds: float) -> Optional[Lease]:
+        ...
+
+    @abstractmethod
+    def heartbeat(self, lease: Lease, lease_seconds: float) -> bool:
+        """
+        Extend a lease. False if the worker no longer holds it (it expired and was redelivered).
+        """
+
+    @abstractmethod
+    def ack(self, lease: Lease) -> None:
+        ...
+
+    @abstractmethod
+    def release(self, lease: Lease) -> None:
+        """
+        Give a message back for immediate redelivery (it still counts as a delivery).
+        """
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> bool:
+        """
+        Drop a job's message if no worker holds it. True if it will never be delivered.
+        """
+
+    @abstractmethod
+    def register_worker(self, worker_id: str, slots: int) -> None:
+        ...
+
+    @abstractmethod
+    def dead_letters(self) -> List[Lease]:
+        """
+        Messages that just ran out of deliveries, removed from the queue as they are returned.
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class SQLiteBroker(JobBroker):
+    """
+    Reference broker backed by a SQLite database (WAL mode).
+
+    It works for any number of API and worker processes on one host, or on
+    hosts sharing a filesystem with working locks. Leasing is a single
+    BEGIN IMMEDIATE transaction, so two workers never get the same message.
+    Messages are ordered like the executor's LaneQueue: by lane, aged by
+    waiting time, then FIFO.
+    """
+
+    def __init__(self, path: str, max_queue: int = 0, max_deliveries: int = 3, aging_seconds: float = 60.0,
+                 worker_timeout: float = 60.0):
+        self.path = path
+        self.max_queue = max_queue
+        self.max_deliveries = max_deliveries
+        self.aging_seconds = aging_seconds
+        self.worker_timeout = worker_timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS broker_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT,
+                task TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                lane INTEGER NOT NULL DEFAULT 1,
+                cost REAL NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                deliveries INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                leased_at REAL,
+                enqueued_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_broker_messages_status ON broker_messages (status, lease_expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_broker_messages_job_id ON broker_messages (job_id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS broker_workers (worker_id TEXT PRIMARY KEY, slots INTEGER NOT NULL, last_seen REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def enqueue(self, task: str, payload: Dict[str, Any], job_id: str = None, lane: int = 1,
+                cost: float = 0.0) -> int:
+        conn = self._connect()
+        if self.max_queue > 0:
+            queued = conn.execute("SELECT COUNT(*) FROM broker_messages WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queue:
+                raise QueueFullError(f"Pipeline queue is full ({self.max_queue} jobs waiting)")
+        cursor = conn.execute(
+            "INSERT INTO broker_messages (job_id, task, payload, lane, cost, status, enqueued_at) "
+            "VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+            (job_id, task, json.dumps(payload), lane, cost, time.time()),
+        )
+        return cursor.lastrowid
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Optional[Lease]:
+        conn = self._connect()
+        now = time.time()
+        aging = self.aging_seconds if self.aging_seconds > 0 else float("inf")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, job_id, task, payload, deliveries, lane, enqueued_at FROM broker_messages "
+                "WHERE (status = 'queued' OR (status = 'leased' AND lease_expires_at < ?)) AND deliveries < ? "
+                "ORDER BY lane - (? - enqueued_at) / ?, id LIMIT 1",
+                (now, self.max_deliveries, now, aging),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE broker_messages SET status = 'leased', deliveries = deliveries + 1, lease_owner = ?, "
+                "lease_expires_at = ?, leased_at = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, now, row[0]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return Lease(row[0], row[1], row[2], json.loads(row[3]), row[4] + 1, worker_id, lane=row[5],
+                     enqueued_at=row[6], leased_at=now)
+
+    def heartbeat(self, lease: Lease, lease_seconds: float) -> bool:
+        cursor = self._connect().execute(
+            "UPDATE broker_messages SET lease_expires_at = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ? AND deliveries = ?",
+            (time.time() + lease_seconds, lease.message_id, lease.worker_id, lease.deliveries),
+        )
+        return cursor.rowcount == 1
+
+    def ack(self, lease: Lease) -> None:
+        self._connect().execute(
+            "DELETE FROM broker_messages WHERE id = ? AND lease_owner = ? AND deliveries = ?",
+            (lease.message_id, lease.worker_id, lease.deliveries),
+        )
+
+    def release(self, lease: Lease) -> None:
+        self._connect().execute(
+            "UPDATE broker_messages SET status = 'queued', lease_owner = NULL, lease_expires_at = NULL "
+            "WHERE id = ? AND lease_owner = ? AND deliveries = ?",
+            (lease.message_id, lease.worker_id, lease.deliveries),
+        )
+
+    def cancel(self, job_id: str) -> bool:
+        cursor = self._connect().execute(
+            "DELETE FROM broker_messages WHERE job_id = ? AND status = 'queued'", (job_id,)
+        )
+        return cursor.rowcount > 0
+
+    def register_worker(self, worker_id: str, slots: int) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO broker_workers (worker_id, slots, last_seen) VALUES (?, ?, ?)",
+            (worker_id, slots, time.time()),
+        )
+
+    def dead_letters(self) -> List[Lease]:
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT id, job_id, task, payload, deliveries, lease_owner FROM broker_messages "
+            "WHERE status = 'leased' AND lease_expires_at < ? AND deliveries >= ?",
+            (time.time(), self.max_deliveries),
+        ).fetchall()
+        dead = []
+        for row in rows:
+            cursor = conn.execute(
+                "DELETE FROM broker_messages WHERE id = ? AND status = 'leased' AND deliveries = ?", (row[0], row[4])
+            )
+            if cursor.rowcount == 1:
+                dead.append(Lease(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5]))
+        return dead
+
+    def _slots(self) -> int:
+        row = self._connect().execute(
+            "SELECT COALESCE(SUM(slots), 0) FROM broker_workers WHERE last_seen > ?",
+            (time.time() - self.worker_timeout,),
+        ).fetchone()
+        return row[0]
+
+    def queue_depth(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM broker_messages WHERE status = 'queued'").fetchone()[0]
+
+    def backlog_seconds(self, lane: int = None) -> float:
+        """
+        Estimated seconds until a new message is leased, as in PipelineExecutor.backlog_seconds.
+        """
+        now = time.time()
+        queued, running = self._connect().execute(
+            "SELECT "
+            "COALESCE(SUM(CASE WHEN status = 'queued' AND (? IS NULL OR lane <= ?) THEN cost END), 0), "
+            "COALESCE(SUM(CASE WHEN status = 'leased' THEN MAX(cost - (? - leased_at), 0) END), 0) "
+            "FROM broker_messages",
+            (lane, lane, now),
+        ).fetchone()
+        return (queued + running) / max(self._slots(), 1)
+
+    def queue_position(self, lane: int) -> int:
+        ahead = self._connect().execute(
+            "SELECT COUNT(*) FROM broker_messages WHERE status = 'queued' AND lane <= ?", (lane,)
+        ).fetchone()[0]
+        return ahead + 1
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        by_status = dict(conn.execute("SELECT status, COUNT(*) FROM broker_messages GROUP BY status").fetchall())
+        lanes = dict(conn.execute(
+            "SELECT lane, COUNT(*) FROM broker_messages WHERE status = 'queued' GROUP BY lane"
+        ).fetchall())
+        slots = self._slots()
+        busy = by_status.get("leased", 0)
+        return {
+            "mode": "broker",
+            "slots": slots,
+            "busy_slots": busy,
+            "idle_slots": max(slots - busy, 0),
+            "queue_depth": by_status.get("queued", 0),
+            "lane_depths": {name: lanes.get(index, 0) for index, name in enumerate(LANES)},
+            "max_queue": self.max_queue,
+            "backlog_seconds": round(self.backlog_seconds(), 1),
+        }
+
+
+def create_job_broker(path: str = None) -> JobBroker:
+    return SQLiteBroker(
+        path or settings.BROKER_PATH,
+        max_queue=settings.PIPELINE_QUEUE_SIZE,
+        max_deliveries=settings.JOB_MAX_ATTEMPTS,
+        aging_seconds=settings.PIPELINE_AGING_SECONDS,
+        worker_timeout=settings.BROKER_LEASE_SECONDS,
+    )
@@ -0,0 +1,70 @@
+import threading
+import time
+from typing import Callable, Dict
+
+from .jobs import run_cancelled
+
+
+class JobCancelled(BaseException):
+    """
+    Raised at a cancellation checkpoint of a cancelled job.
+
+    Derives from BaseException (like asyncio.CancelledError) so the broad
+    `except Exception` fallbacks in the generators do not swallow it.
+    """
+
+
+class CancellationRegistry:
+    """
+    Cancel flags checked by running pipelines.
+
+    Flags set in this process are seen immediately. Pipelines running in other
+    processes (process executor slots, other uvicorn workers) see a cancellation
+    through the job store (see run_cancelled), which is polled at most every
+    poll_interval seconds per job so per-step checks stay cheap.
+    """
+
+    def __init__(self, poll_interval: float = 0.5):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._cancelled: set = set()
+        self._last_polled: Dict[str, float] = {}
+
+    def cancel(self, job_id: str):
+        with self._lock:
+            self._cancelled.add(job_id)
+
+    def discard(self, job_id: str):
+        with self._lock:
+            self._cancelled.discard(job_id)
+            self._last_polled.pop(job_id, None)
+
+    def is_cancelled(self, job_id: str) -> bool:
+        now = time.time()
+        with self._lock:
+            if job_id in self._cancelled:
+                return True
+            if now - self._last_polled.get(job_id, 0) < self.poll_interval:
+                return False
+            self._last_polled[job_id] = now
+        if run_cancelled(job_id):
+            self.cancel(job_id)
+            return True
+        return False
+
+    def check(self, job_id: str):
+        """
+        Cancellation checkpoint: raise JobCancelled if the job has been cancelled.
+        """
+        if self.is_cancelled(job_id):
+            raise JobCancelled(job_id)
+
+    def checker(self, job_id: str) -> Callable[[], None]:
+        """
+        A no-argument checkpoint for code that does not know about jobs (generator loops).
+        """
+        return lambda: self.check(job_id)
+
+
+# Global instance
+cancellations = CancellationRegistry()
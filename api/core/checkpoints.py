@@ -0,0 +1,151 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from .config import settings
+
+
+class CheckpointStore:
+    """
+    Durable record of pipeline progress, kept next to the job store.
+
+    job_requests holds the arguments a job was submitted with, so it can be
+    re-run after a crash; job_checkpoints holds the outputs of every stage that
+    finished. A checkpoint is only trusted while the artifact files it points to
+    still exist.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_requests (
+                job_id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                claimed_at REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        if "claimed_at" not in {row[1] for row in conn.execute("PRAGMA table_info(job_requests)")}:
+            conn.execute("ALTER TABLE job_requests ADD COLUMN claimed_at REAL NOT NULL DEFAULT 0")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_checkpoints (
+                job_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                outputs TEXT NOT NULL,
+                artifacts TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, stage)
+            )
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def save_request(self, job_id: str, params: Dict[str, Any]) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO job_requests (job_id, params, attempts, created_at) VALUES (?, ?, 0, ?)",
+            (job_id, json.dumps(params), time.time()),
+        )
+
+    def load_request(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT params FROM job_requests WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def claim_attempt(self, job_id: str, max_attempts: int) -> bool:
+        """
+        Atomically count one more run of a job. False once max_attempts is reached.
+        """
+        cursor = self._connect().execute(
+            "UPDATE job_requests SET attempts = attempts + 1, claimed_at = ? WHERE job_id = ? AND attempts < ?",
+            (time.time(), job_id, max_attempts),
+        )
+        return cursor.rowcount == 1
+
+    def claim_resume(self, job_id: str, max_attempts: int, stale_before: float) -> Optional[bool]:
+        """
+        Atomically claim an interrupted job for this process, so that of several processes
+        resuming at once only one resubmits it. None if the job has no request record or was
+        claimed after stale_before; otherwise it is now claimed and the result says whether it
+        may run again (one more attempt is counted) or has reached max_attempts.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT attempts, claimed_at FROM job_requests WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row[1] >= stale_before:
+                conn.execute("COMMIT")
+                return None
+            attempts, _ = row
+            conn.execute(
+                "UPDATE job_requests SET attempts = ?, claimed_at = ? WHERE job_id = ?",
+                (min(attempts + 1, max_attempts), time.time(), job_id),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return attempts < max_attempts
+
+    def pending_job_ids(self) -> List[str]:
+        return [row[0] for row in self._connect().execute("SELECT job_id FROM job_requests").fetchall()]
+
+    def save(self, job_id: str, stage: str, outputs: Dict[str, Any]) -> None:
+        artifacts = [value for value in outputs.values() if isinstance(value, str) and os.path.isfile(value)]
+        self._connect().execute(
+            "INSERT OR REPLACE INTO job_checkpoints (job_id, stage, outputs, artifacts, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (job_id, stage, json.dumps(outputs), json.dumps(artifacts), time.time()),
+        )
+
+    def load(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Outputs of every completed stage whose artifacts are still on disk, keyed by stage name.
+        """
+        completed = {}
+        for stage, outputs, artifacts in self._connect().execute(
+            "SELECT stage, outputs, artifacts FROM job_checkpoints WHERE job_id = ?", (job_id,)
+        ).fetchall():
+            if all(os.path.isfile(path) for path in json.loads(artifacts)):
+                completed[stage] = json.loads(outputs)
+        return completed
+
+    def clear(self, job_id: str) -> None:
+        conn = self._connect()
+        conn.execute("DELETE FROM job_checkpoints WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM job_requests WHERE job_id = ?", (job_id,))
+
+    def purge(self, older_than: float) -> int:
+        """
+        Drop requests and checkpoints of jobs that were never finished or retried.
+        """
+        conn = self._connect()
+        stale = [row[0] for row in conn.execute(
+            "SELECT job_id FROM job_requests WHERE created_at < ?", (older_than,)
+        ).fetchall()]
+        for job_id in stale:
+            self.clear(job_id)
+        conn.execute("DELETE FROM job_checkpoints WHERE created_at < ?", (older_than,))
+        return len(stale)
+
+
+# Global instance
+checkpoint_store = CheckpointStore(settings.CHECKPOINT_STORE_PATH)
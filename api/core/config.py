@@ -11,6 +11,95 @@ class Settings:
     # Database Configuration
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./jambam.db")
     
+    # Job Store Configuration ("sqlite" is shared across workers, "memory" is single-process only)
+    JOB_STORE_BACKEND: str = os.getenv("JOB_STORE_BACKEND", "sqlite")
+    JOB_STORE_PATH: str = os.getenv("JOB_STORE_PATH", "./jambam_jobs.db")
+    
+    # Job Retention (seconds a job stays in the store after reaching a terminal state, 0 = forever)
+    JOB_TTL_COMPLETED: float = float(os.getenv("JOB_TTL_COMPLETED", "3600"))
+    JOB_TTL_FAILED: float = float(os.getenv("JOB_TTL_FAILED", "86400"))
+    JOB_TTL_CANCELLED: float = float(os.getenv("JOB_TTL_CANCELLED", "3600"))
+    JOB_SWEEP_INTERVAL: float = float(os.getenv("JOB_SWEEP_INTERVAL", "60"))
+    
+    # Job History (kept after jobs leave the job store, for the admin job API; TTL 0 = forever)
+    JOB_HISTORY_PATH: str = os.getenv("JOB_HISTORY_PATH", JOB_STORE_PATH)
+    JOB_HISTORY_TTL: float = float(os.getenv("JOB_HISTORY_TTL", str(90 * 24 * 3600)))
+    
+    # Stage Checkpoints (interrupted jobs resume from their last completed stage)
+    CHECKPOINT_STORE_PATH: str = os.getenv("CHECKPOINT_STORE_PATH", os.getenv("JOB_STORE_PATH", "./jambam_jobs.db"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RESUME_STALE_AFTER: float = float(os.getenv("JOB_RESUME_STALE_AFTER", "600"))
+    
+    # Pipeline Execution ("thread" or "process" slots, queue size 0 = unbounded)
+    PIPELINE_EXECUTOR: str = os.getenv("PIPELINE_EXECUTOR", "thread")
+    PIPELINE_WORKERS: int = int(os.getenv("PIPELINE_WORKERS", "2"))
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "32"))
+    # Seconds a queued job waits before it is promoted one priority lane (0 = no aging)
+    PIPELINE_AGING_SECONDS: float = float(os.getenv("PIPELINE_AGING_SECONDS", "60"))
+    
+    # Job Broker ("local" runs pipelines in the API process, "broker" hands them to `python -m api.worker`)
+    PIPELINE_BACKEND: str = os.getenv("PIPELINE_BACKEND", "local")
+    BROKER_PATH: str = os.getenv("BROKER_PATH", JOB_STORE_PATH)
+    BROKER_LEASE_SECONDS: float = float(os.getenv("BROKER_LEASE_SECONDS", "60"))
+    BROKER_HEARTBEAT_INTERVAL: float = float(os.getenv("BROKER_HEARTBEAT_INTERVAL", "15"))
+    BROKER_POLL_INTERVAL: float = float(os.getenv("BROKER_POLL_INTERVAL", "1.0"))
+    # Port of a worker's Prometheus /metrics endpoint (0 = off)
+    WORKER_METRICS_PORT: int = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+    
+    # Admission Control (reject with 429 when a job would not finish within ADMISSION_MAX_WAIT seconds, 0 = off)
+    ADMISSION_MAX_WAIT: float = float(os.getenv("ADMISSION_MAX_WAIT", "600"))
+    ADMISSION_DEFAULT_JOB_SECONDS: float = float(os.getenv("ADMISSION_DEFAULT_JOB_SECONDS", "30"))
+    
+    # Model Pool (bytes of loaded SD3D pipelines kept in memory, LRU-evicted beyond it; 0 = half of system RAM).
+    # A pipeline is assumed to take MODEL_POOL_DEFAULT_MODEL_BYTES until the first one has loaded and been measured
+    MODEL_POOL_MEMORY_BUDGET: int = int(os.getenv("MODEL_POOL_MEMORY_BUDGET", "0"))
+    MODEL_POOL_DEFAULT_MODEL_BYTES: int = int(os.getenv("MODEL_POOL_DEFAULT_MODEL_BYTES", str(4 * 1024 ** 3)))
+    
+    # Micro-batching (concurrent SD3D generations of one style and quality gathered for up to
+    # SD3D_BATCH_WINDOW seconds into one batched call of at most SD3D_BATCH_MAX_SIZE; window 0 = off)
+    SD3D_BATCH_WINDOW: float = float(os.getenv("SD3D_BATCH_WINDOW", "0.05"))
+    SD3D_BATCH_MAX_SIZE: int = int(os.getenv("SD3D_BATCH_MAX_SIZE", "4"))
+    
+    # SD3D Models ("adapters": one shared base model plus a LoRA per style, SD3D_STYLE_ADAPTERS being a
+    # path or hub id template with {style}, empty = prompt-only styles; "checkpoints": a full model per style)
+    SD3D_MODEL_MODE: str = os.getenv("SD3D_MODEL_MODE", "adapters")
+    SD3D_BASE_MODEL: str = os.getenv("SD3D_BASE_MODEL", "stabilityai/stable-diffusion-3d")
+    SD3D_STYLE_ADAPTERS: str = os.getenv("SD3D_STYLE_ADAPTERS", "stabilityai/stable-diffusion-3d-{style}-lora")
+    SD3D_ADAPTER_SCALE: float = float(os.getenv("SD3D_ADAPTER_SCALE", "1.0"))
+    
+    # CPU Inference (SD3D on machines without CUDA; threads 0 = torch default, bfloat16 auto/true/false)
+    CPU_THREADS: int = int(os.getenv("CPU_THREADS", "0"))
+    CPU_INTEROP_THREADS: int = int(os.getenv("CPU_INTEROP_THREADS", "0"))
+    CPU_BFLOAT16: str = os.getenv("CPU_BFLOAT16", "auto").lower()
+    CPU_CHANNELS_LAST: bool = os.getenv("CPU_CHANNELS_LAST", "true").lower() == "true"
+    CPU_COMPILE: bool = os.getenv("CPU_COMPILE", "false").lower() == "true"
+    CPU_QUANTIZE_INT8: bool = os.getenv("CPU_QUANTIZE_INT8", "false").lower() == "true"
+    
+    # Model Warm-up (comma-separated styles preloaded at startup; /ready waits for them)
+    WARMUP_STYLES: list = [style.strip() for style in os.getenv("WARMUP_STYLES", "").split(",") if style.strip()]
+    
+    # Generation Cache (generated models keyed on prompt, style, quality, seed and model version)
+    GENERATION_CACHE_ENABLED: bool = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+    GENERATION_CACHE_DIR: str = os.getenv("GENERATION_CACHE_DIR", "./cache/generations")
+    GENERATION_CACHE_MAX_BYTES: int = int(os.getenv("GENERATION_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+    GENERATION_CACHE_MAX_ENTRIES: int = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1000"))
+    
+    # Embedding Cache (text-encoder outputs per enhanced prompt; persisted to EMBEDDING_CACHE_DIR if set)
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "1024"))
+    EMBEDDING_CACHE_DIR: str = os.getenv("EMBEDDING_CACHE_DIR", "")
+    EMBEDDING_CACHE_MAX_DISK_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_DISK_ENTRIES", "20000"))
+    
+    # Request Coalescing (identical in-flight generation requests share one pipeline run)
+    COALESCE_REQUESTS: bool = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+    
+    # Job Streaming (seconds between job store re-reads on idle SSE/WebSocket streams)
+    JOB_STREAM_POLL_INTERVAL: float = float(os.getenv("JOB_STREAM_POLL_INTERVAL", "2.0"))
+    
+    # Progress Reporting (seconds between coalesced writes of per-step job progress)
+    JOB_PROGRESS_INTERVAL: float = float(os.getenv("JOB_PROGRESS_INTERVAL", "1.0"))
+    
     # JWT Configuration
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ALGORITHM: str = "HS256"
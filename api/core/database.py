@@ -1,10 +1,11 @@
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from .config import DATABASE_URL
+from .config import settings
 
 engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} # check_same_thread is only for SQLite
+    settings.DATABASE_URL, connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {} # check_same_thread is only for SQLite
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -16,4 +17,20 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+@contextmanager
+def session_scope():
+    """
+    A short-lived session for background work: one transaction, committed on
+    success and rolled back on error, and its connection returned to the pool on exit.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,143 @@
+from concurrent.futures import Future
+from typing import Dict, Any, List, Tuple
+
+from .config import settings
+from .executor import PipelineExecutor, QueueFullError, pipeline_executor, pipeline_lane
+from .broker import JobBroker, create_job_broker
+from .jobs import update_job_status
+from .pipeline import asset_pipeline, batch_pipeline, encode_job_params, decode_job_params
+from ..models.assets import GenerateRequest
+
+
+class LocalDispatcher:
+    """
+    Runs pipelines on this process's PipelineExecutor.
+    """
+    local = True
+
+    def __init__(self, executor: PipelineExecutor):
+        self.executor = executor
+
+    def submit_job(self, job_id: str, params: Dict[str, Any], cost: float = 0.0, lane: int = 1):
+        # job_id= only keys the task in the executor; the pipeline gets it positionally
+        self.executor.submit(asset_pipeline, job_id, job_id=job_id, cost=cost, lane=lane, **params)
+
+    def submit_batch(self, batch_id: str, style: str, items: List[Tuple[str, GenerateRequest]], cost: float = 0.0,
+                     lane: int = 1):
+        # Keyed by group, not by a member job, so cancelling one job cannot drop the whole group
+        task = self.executor.submit(batch_pipeline, batch_id, style, items, job_id=f"{batch_id}:{style}", cost=cost,
+                                    lane=lane, job_ids=[job_id for job_id, _ in items])
+        # Queued from this process, since a process-mode slot has no executor of its own to queue on
+        task.future.add_done_callback(self._submit_members)
+
+    def _submit_members(self, future: Future):
+        if not future.cancelled() and future.exception() is None:
+            submit_batch_members(self, future.result())
+
+    def cancel(self, job_id: str) -> bool:
+        return self.executor.cancel(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.executor.stats()
+
+    def backlog_seconds(self, lane: int = None) -> float:
+        return self.executor.backlog_seconds(lane)
+
+    def queue_position(self, lane: int) -> int:
+        return self.executor.queue_position(lane)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+class BrokerDispatcher:
+    """
+    Enqueues pipelines on a JobBroker for `python -m api.worker` processes to run.
+    Messages carry the pipeline arguments as JSON; run_message turns them back into a call.
+    """
+    local = False
+
+    def __init__(self, broker: JobBroker):
+        self.broker = broker
+
+    def submit_job(self, job_id: str, params: Dict[str, Any], cost: float = 0.0, lane: int = 1):
+        self.broker.enqueue(
+            "asset_pipeline", {"job_id": job_id, "params": encode_job_params(params)}, job_id=job_id, lane=lane, cost=cost,
+        )
+
+    def submit_batch(self, batch_id: str, style: str, items: List[Tuple[str, GenerateRequest]], cost: float = 0.0,
+                     lane: int = 1):
+        self.broker.enqueue(
+            "batch_pipeline",
+            {"batch_id": batch_id, "style": style, "items": [[job_id, item.dict()] for job_id, item in items]},
+            job_id=f"{batch_id}:{style}", lane=lane, cost=cost,
+        )
+
+    def cancel(self, job_id: str) -> bool:
+        return self.broker.cancel(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.broker.stats()
+
+    def backlog_seconds(self, lane: int = None) -> float:
+        return self.broker.backlog_seconds(lane)
+
+    def queue_position(self, lane: int) -> int:
+        return self.broker.queue_position(lane)
+
+    def shutdown(self):
+        pass
+
+
+def submit_batch_members(dispatcher, summary: Dict[str, Any]):
+    """
+    Queue every member of a finished batch_pipeline group as its own asset_pipeline task.
+    Only the generation is shared: the remaining stages of every job run side by side on
+    other slots (or workers) rather than one after another in the group's.
+    """
+    for job_id, request_data in summary["members"]:
+        try:
+            # Post-processing only, so costed like an upload
+            dispatcher.submit_job(job_id, {"request_data": request_data},
+                                  cost=settings.ADMISSION_DEFAULT_JOB_SECONDS, lane=pipeline_lane(request_data))
+        except QueueFullError as e:
+            update_job_status(job_id, "failed", 100, str(e))
+
+
+def message_job_ids(task: str, payload: Dict[str, Any]) -> List[str]:
+    """
+    The jobs a broker message runs.
+    """
+    if task == "batch_pipeline":
+        return [job_id for job_id, _ in payload["items"]]
+    return [payload["job_id"]]
+
+
+def run_message(task: str, payload: Dict[str, Any]):
+    """
+    Execute a broker message in the current process.
+    """
+    if task == "asset_pipeline":
+        return asset_pipeline(payload["job_id"], **decode_job_params(payload["params"]))
+    if task == "batch_pipeline":
+        items = [(job_id, GenerateRequest(**item)) for job_id, item in payload["items"]]
+        summary = batch_pipeline(payload["batch_id"], payload["style"], items)
+        submit_batch_members(pipeline_dispatcher, summary)
+        return summary
+    raise ValueError(f"Unknown pipeline task: {task}")
+
+
+def create_dispatcher(backend: str = None):
+    """
+    Build the dispatcher configured by PIPELINE_BACKEND ("local" or "broker").
+    """
+    backend = backend or settings.PIPELINE_BACKEND
+    if backend == "local":
+        return LocalDispatcher(pipeline_executor)
+    if backend == "broker":
+        return BrokerDispatcher(create_job_broker())
+    raise ValueError(f"Unknown pipeline backend: {backend}")
+
+
+# Global instance
+pipeline_dispatcher = create_dispatcher()
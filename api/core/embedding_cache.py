@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+
+from .config import settings
+
+
+def embedding_key(prompt: str, style: str, model_version: str) -> str:
+    """
+    Key of an encoded prompt: the exact enhanced prompt (the text encoder sees every
+    character) and the model that encoded it.
+    """
+    payload = json.dumps([prompt, style, model_version], separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    LRU cache of text-encoder outputs (a dict of tensors per prompt).
+
+    Keeps up to max_entries embeddings in memory. With a directory, every
+    embedding is also written there (one torch.save file per key) and a
+    memory miss is looked up on disk before encoding, so a restarted process
+    starts warm; the least recently used files beyond max_disk_entries are
+    removed. torch is imported only when a file is read or written.
+    """
+
+    def __init__(self, max_entries: int, directory: Optional[str] = None, max_disk_entries: int = 0):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pt")
+
+    def _remember(self, key: str, embeddings: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = embeddings
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key: str, device) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        import torch
+        try:
+            stored = torch.load(path, map_location="cpu", weights_only=True)
+            os.utime(path)  # mtime is the disk LRU order
+        except Exception as e:
+            print(f"Embedding cache: dropping unreadable {path}: {e}")
+            self._remove(path)
+            return None
+        return {name: tensor.to(device) if tensor is not None else None for name, tensor in stored.items()}
+
+    def _store(self, key: str, embeddings: Dict[str, Any]):
+        import torch
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            torch.save({name: tensor.cpu() if tensor is not None else None for name, tensor in embeddings.items()}, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Embedding cache: failed to persist {key}: {e}")
+            self._remove(tmp_path)
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self.max_disk_entries and self._writes % 100 == 1
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pt"):
+                path = os.path.join(self.directory, name)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        files.sort()
+        for _, path in files[:max(len(files) - self.max_disk_entries, 0)]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get_or_encode(self, key: str, encode: Callable[[], Dict[str, Any]], device=None) -> Dict[str, Any]:
+        """
+        The cached embeddings for key, or encode() them (and cache the result).
+        """
+        with self._lock:
+            embeddings = self._entries.get(key)
+            if embeddings is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embeddings
+        if self.directory:
+            embeddings = self._load(key, device)
+            if embeddings is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, embeddings)
+                return embeddings
+        with self._lock:
+            self.misses += 1
+        embeddings = encode()
+        self._remember(key, embeddings)
+        if self.directory:
+            self._store(key, embeddings)
+        return embeddings
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": bool(self.directory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+# Global instance (None when EMBEDDING_CACHE_ENABLED is off)
+embedding_cache: Optional[EmbeddingCache] = (
+    EmbeddingCache(
+        settings.EMBEDDING_CACHE_MAX_ENTRIES,
+        directory=settings.EMBEDDING_CACHE_DIR or None,
+        max_disk_entries=settings.EMBEDDING_CACHE_MAX_DISK_ENTRIES,
+    )
+    if settings.EMBEDDING_CACHE_ENABLED
+    else None
+)
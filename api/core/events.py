@@ -0,0 +1,94 @@
+import asyncio
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
+class JobSubscription:
+    """
+    A set of job IDs watched by one streaming connection.
+    Events are delivered onto an asyncio queue owned by the connection's event loop.
+    """
+
+    def __init__(self, bus: "JobEventBus", loop: asyncio.AbstractEventLoop):
+        self._bus = bus
+        self._loop = loop
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self.job_ids: Set[str] = set()
+
+    def add(self, job_ids: Iterable[str]):
+        self._bus._add(self, job_ids)
+
+    def remove(self, job_ids: Iterable[str]):
+        self._bus._remove(self, job_ids)
+
+    def close(self):
+        self._bus._remove(self, list(self.job_ids))
+
+    def _deliver(self, event: Dict[str, Any]):
+        try:
+            self._loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        except RuntimeError:
+            # The connection's loop is gone; it will be cleaned up by close()
+            pass
+
+    async def next_event(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next event, or return None after timeout seconds.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class JobEventBus:
+    """
+    In-process fan-out of job status transitions to streaming subscribers.
+
+    Publishing happens on pipeline threads; delivery is handed to each
+    subscriber's event loop, so publishers never block on slow clients.
+    Transitions made in other processes (process executor slots, other uvicorn
+    workers) are not seen here; stream endpoints cover them by re-reading the
+    job store when a subscription has been idle.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[JobSubscription]] = {}
+
+    def subscribe(self, job_ids: Iterable[str] = ()) -> JobSubscription:
+        subscription = JobSubscription(self, asyncio.get_running_loop())
+        subscription.add(job_ids)
+        return subscription
+
+    def _add(self, subscription: JobSubscription, job_ids: Iterable[str]):
+        with self._lock:
+            for job_id in job_ids:
+                subscription.job_ids.add(job_id)
+                self._subscribers.setdefault(job_id, set()).add(subscription)
+
+    def _remove(self, subscription: JobSubscription, job_ids: Iterable[str]):
+        with self._lock:
+            for job_id in job_ids:
+                subscription.job_ids.discard(job_id)
+                subscribers = self._subscribers.get(job_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[job_id]
+
+    def publish(self, job_id: str, event: Dict[str, Any]):
+        with self._lock:
+            subscribers: List[JobSubscription] = list(self._subscribers.get(job_id, ()))
+        for subscription in subscribers:
+            subscription._deliver(event)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+# Global instance
+job_event_bus = JobEventBus()
@@ -0,0 +1,312 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
+
+from .cancellation import JobCancelled
+from .config import settings
+from .jobs import fail_jobs
+from .metrics import registry, Gauge, queue_wait, observe_pipeline_result
+
+
+class QueueFullError(Exception):
+    """Raised when the pipeline queue cannot accept more work."""
+
+
+# Priority lanes, most urgent first
+LANES = ("interactive", "standard", "bulk")
+
+# Priority lane per quality: quick drafts jump ahead of long renders
+QUALITY_LANES = {"draft": 0, "standard": 1, "high": 2}
+
+
+def pipeline_lane(request_data) -> int:
+    return QUALITY_LANES.get(getattr(request_data, 'quality', None), 1)
+
+
+class PipelineTask:
+    """A unit of work waiting for or occupying an executor slot."""
+
+    def __init__(self, job_id: Optional[str], fn: Callable, args: tuple, kwargs: Dict[str, Any], cost: float = 0.0,
+                 lane: int = 1, job_ids: Optional[List[str]] = None):
+        self.job_id = job_id
+        # Jobs the task runs, marked failed if it raises
+        self.job_ids = job_ids if job_ids is not None else [job_id] if job_id is not None else []
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        # Estimated run time in seconds, used for backlog estimates
+        self.cost = cost
+        self.lane = lane
+        self.future: Future = Future()
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+
+class LaneQueue:
+    """
+    Bounded multi-lane queue with anti-starvation aging.
+
+    Each lane is FIFO. get() takes the lane head with the best effective rank:
+    its lane index minus one for every aging_seconds it has waited, so a bulk
+    task queued long enough eventually outranks fresh interactive work.
+    Ties go to the task submitted first.
+    """
+
+    def __init__(self, lanes: int, maxsize: int = 0, aging_seconds: float = 60.0):
+        self.maxsize = maxsize
+        self.aging_seconds = aging_seconds
+        self._lanes: List[deque] = [deque() for _ in range(lanes)]
+        self._size = 0
+        self._closed = False
+        self._not_empty = threading.Condition()
+
+    def put_nowait(self, task: PipelineTask):
+        with self._not_empty:
+            if self.maxsize > 0 and self._size >= self.maxsize:
+                raise queue.Full
+            self._lanes[min(max(task.lane, 0), len(self._lanes) - 1)].append(task)
+            self._size += 1
+            self._not_empty.notify()
+
+    def _rank(self, task: PipelineTask, now: float) -> tuple:
+        aged = (now - task.submitted_at) / self.aging_seconds if self.aging_seconds > 0 else 0.0
+        return (task.lane - aged, task.submitted_at)
+
+    def get(self) -> Optional[PipelineTask]:
+        """
+        Block until a task is available. Returns None once the queue is closed and drained.
+        """
+        with self._not_empty:
+            while not self._size and not self._closed:
+                self._not_empty.wait()
+            if not self._size:
+                return None
+            now = time.time()
+            lane = min((lane for lane in self._lanes if lane), key=lambda lane: self._rank(lane[0], now))
+            self._size -= 1
+            return lane.popleft()
+
+    def close(self):
+        with self._not_empty:
+            self._closed = True
+            self._not_empty.notify_all()
+
+    def qsize(self) -> int:
+        with self._not_empty:
+            return self._size
+
+    def depths(self) -> Dict[str, int]:
+        with self._not_empty:
+            return {name: len(lane) for name, lane in zip(LANES, self._lanes)}
+
+
+class PipelineExecutor:
+    """
+    Runs asset pipelines on a fixed number of slots, away from the web server's threadpool.
+
+    Each slot is a dispatcher thread that pulls tasks from a bounded LaneQueue,
+    so draft previews are not stuck behind high-quality renders. In
+    "thread" mode the task runs on the dispatcher thread itself; in "process"
+    mode the dispatcher hands it to a process pool of the same size and waits,
+    so CPU-bound stages never contend with the event loop for the GIL.
+    """
+
+    def __init__(self, slots: int, mode: str = "thread", max_queue: int = 0, aging_seconds: float = 60.0):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown executor mode: {mode}")
+        self.slots = slots
+        self.mode = mode
+        self.max_queue = max_queue
+        self._queue = LaneQueue(len(LANES), maxsize=max_queue, aging_seconds=aging_seconds)
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._tasks: Dict[str, PipelineTask] = {}
+        self._active: set = set()
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._workers = []
+        self._started = False
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            if self.mode == "process":
+                self._process_pool = ProcessPoolExecutor(max_workers=self.slots)
+            for index in range(self.slots):
+                worker = threading.Thread(target=self._worker_loop, name=f"pipeline-slot-{index}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            self._started = True
+
+    def submit(self, fn: Callable, *args, job_id: str = None, cost: float = 0.0, lane: int = 1,
+               job_ids: Optional[List[str]] = None, **kwargs) -> PipelineTask:
+        """
+        Queue fn(*args, **kwargs) for execution. Raises QueueFullError when the queue is at capacity.
+        cost is the task's estimated run time in seconds (see backlog_seconds); lane indexes LANES.
+        job_id keys the task for cancel() and is not passed on to fn. job_ids are the jobs
+        fn runs (default [job_id]); if fn raises, the ones not yet finished are marked failed.
+        """
+        self._start()
+        task = PipelineTask(job_id, fn, args, kwargs, cost, lane, job_ids)
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            raise QueueFullError(f"Pipeline queue is full ({self.max_queue} jobs waiting)")
+        with self._lock:
+            self._submitted += 1
+            self._active.add(task)
+            if job_id is not None:
+                self._tasks[job_id] = task
+        return task
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Drop a job's task if it has not started yet. True if it will never run;
+        a running task has to stop itself at its next cancellation checkpoint.
+        """
+        with self._lock:
+            task = self._tasks.get(job_id)
+        if task is None or not task.future.cancel():
+            return False
+        with self._lock:
+            self._tasks.pop(job_id, None)
+            self._active.discard(task)
+            self._cancelled += 1
+        return True
+
+    def _worker_loop(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            if not task.future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._busy += 1
+            task.started_at = time.time()
+            queue_wait.observe(task.started_at - task.submitted_at, lane=LANES[task.lane])
+            try:
+                if self._process_pool is not None:
+                    result = self._process_pool.submit(task.fn, *task.args, **task.kwargs).result()
+                else:
+                    result = task.fn(*task.args, **task.kwargs)
+            except BaseException as e:
+                task.finished_at = time.time()
+                with self._lock:
+                    self._busy -= 1
+                    self._failed += 1
+                    self._forget(task)
+                print(f"Pipeline task for job {task.job_id} raised: {e}")
+                if not isinstance(e, JobCancelled):
+                    self._fail_jobs(task, e)
+                task.future.set_exception(e)
+            else:
+                task.finished_at = time.time()
+                with self._lock:
+                    self._busy -= 1
+                    self._completed += 1
+                    self._forget(task)
+                try:
+                    observe_pipeline_result(result)
+                except Exception as e:
+                    print(f"Recording metrics for job {task.job_id} failed: {e}")
+                task.future.set_result(result)
+
+    def _fail_jobs(self, task: PipelineTask, error: BaseException):
+        """
+        Mark the unfinished jobs of a task that raised outside the pipeline's own error
+        handling (bad arguments, import errors), so they are not left pending forever.
+        """
+        try:
+            fail_jobs(task.job_ids, f"Pipeline crashed: {error or type(error).__name__}")
+        except Exception as e:
+            print(f"Marking jobs {task.job_ids} failed raised: {e}")
+
+    def _forget(self, task: PipelineTask):
+        self._active.discard(task)
+        if task.job_id is not None and self._tasks.get(task.job_id) is task:
+            del self._tasks[task.job_id]
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def backlog_seconds(self, lane: int = None) -> float:
+        """
+        Estimated seconds until a newly queued task starts: the remaining cost of every
+        running task and every queued task it would not overtake (same or more urgent
+        lane; all of them when lane is None), spread over the slots.
+        """
+        now = time.time()
+        with self._lock:
+            remaining = sum(
+                task.cost if task.started_at is None else max(task.cost - (now - task.started_at), 0.0)
+                for task in self._active
+                if lane is None or task.started_at is not None or task.lane <= lane
+            )
+        return remaining / self.slots
+
+    def queue_position(self, lane: int) -> int:
+        """
+        Place a new task in the given lane would take: queued tasks ahead of it, plus one.
+        """
+        depths = self._queue.depths()
+        return sum(depths[name] for name in LANES[:lane + 1]) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of slot usage and queue depth.
+        """
+        backlog = self.backlog_seconds()
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "slots": self.slots,
+                "busy_slots": self._busy,
+                "idle_slots": self.slots - self._busy,
+                "queue_depth": self._queue.qsize(),
+                "lane_depths": self._queue.depths(),
+                "max_queue": self.max_queue,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "backlog_seconds": round(backlog, 1),
+            }
+
+    def shutdown(self, wait: bool = True):
+        if not self._started:
+            return
+        self._queue.close()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
+
+
+# Global instance
+pipeline_executor = PipelineExecutor(
+    slots=settings.PIPELINE_WORKERS,
+    mode=settings.PIPELINE_EXECUTOR,
+    max_queue=settings.PIPELINE_QUEUE_SIZE,
+    aging_seconds=settings.PIPELINE_AGING_SECONDS,
+)
+
+registry.register(Gauge(
+    "jambam_pipeline_queue_depth",
+    "Jobs waiting for an executor slot.",
+    callback=lambda: {(): pipeline_executor.queue_depth()},
+))
+registry.register(Gauge(
+    "jambam_pipeline_busy_slots",
+    "Executor slots currently running a pipeline.",
+    callback=lambda: {(): pipeline_executor.stats()["busy_slots"]},
+))
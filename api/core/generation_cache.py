@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from .config import settings
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Collapse case, whitespace and trailing punctuation so trivially different prompts share a key.
+    """
+    return re.sub(r"\s+", " ", prompt.strip().lower()).rstrip(" .!,;")
+
+
+def generation_key(prompt: str, style: str, quality: str, seed: Optional[int], model_version: str) -> str:
+    """
+    Content address of a generation request.
+    """
+    payload = json.dumps(
+        [normalize_prompt(prompt), style, quality, seed, model_version],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    Persistent cache of generated model artifacts keyed on generation_key().
+
+    Artifacts are stored as files in the cache directory; a SQLite index (WAL
+    mode, shared by all worker processes) tracks size and last access so the
+    least recently used entries are evicted once max_bytes or max_entries is
+    exceeded.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_entries: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                metadata TEXT,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._connect().execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(os.path.join(self.directory, "index.db"), timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Path of the cached artifact for key, or None on a miss.
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT file_name FROM entries WHERE key = ?", (key,)).fetchone()
+        path = os.path.join(self.directory, row[0]) if row else None
+        if path is None or not os.path.exists(path):
+            if row:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            with self._lock:
+                self.misses += 1
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key: str, artifact_path: str, metadata: Dict[str, Any] = None) -> str:
+        """
+        Copy an artifact into the cache and evict least recently used entries over budget.
+        """
+        _, ext = os.path.splitext(artifact_path)
+        file_name = f"{key}{ext}"
+        cached_path = os.path.join(self.directory, file_name)
+        tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+        shutil.copyfile(artifact_path, tmp_path)
+        os.replace(tmp_path, cached_path)
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO entries (key, file_name, size, metadata, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, file_name, os.path.getsize(cached_path), json.dumps(metadata or {}), now, now),
+        )
+        self._evict()
+        return cached_path
+
+    def restore(self, key: str, destination_stem: str) -> Optional[str]:
+        """
+        Copy the cached artifact for key to destination_stem plus the artifact's extension.
+        Returns the new path, or None on a miss.
+        """
+        cached_path = self.get(key)
+        if cached_path is None:
+            return None
+        destination = f"{destination_stem}{os.path.splitext(cached_path)[1]}"
+        os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+        shutil.copyfile(cached_path, destination)
+        return destination
+
+    def _evict(self):
+        conn = self._connect()
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, file_name, size in conn.execute(
+            "SELECT key, file_name, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        count, total = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": count,
+                "bytes": total,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+# Global instance (None when GENERATION_CACHE_ENABLED is off)
+generation_cache: Optional[GenerationCache] = (
+    GenerationCache(
+        settings.GENERATION_CACHE_DIR,
+        max_bytes=settings.GENERATION_CACHE_MAX_BYTES,
+        max_entries=settings.GENERATION_CACHE_MAX_ENTRIES,
+    )
+    if settings.GENERATION_CACHE_ENABLED
+    else None
+)
@@ -0,0 +1,176 @@
+import base64
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from .config import settings
+
+
+class JobHistory:
+    """
+    Append-mostly record of every job, kept long after the job store evicts it.
+
+    One row per job with its labels (user, style, quality) and lifecycle times.
+    Listing uses keyset pagination on (created_at, job_id), so a page deep in a
+    history of millions of jobs costs the same as the first one. Every filter
+    combination the admin API offers has an index that starts with the filter
+    column and ends in created_at; (status, created_at, duration) also covers
+    the percentile queries.
+    """
+
+    COLUMNS = ("job_id", "status", "user_id", "style", "quality", "created_at", "started_at", "finished_at", "duration")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_history (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                user_id TEXT,
+                style TEXT,
+                quality TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                duration REAL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_history_created_at ON job_history (created_at, job_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_history_status ON job_history (status, created_at, duration)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_history_user_id ON job_history (user_id, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_history_style ON job_history (style, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def record_created(self, job_id: str, user_id: Optional[str] = None, style: Optional[str] = None,
+                       quality: Optional[str] = None, created_at: float = None):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO job_history (job_id, status, user_id, style, quality, created_at) "
+            "VALUES (?, 'pending', ?, ?, ?, ?)",
+            (job_id, user_id, style, quality, created_at or time.time()),
+        )
+
+    def record_status(self, job_id: str, status: str, terminal: bool):
+        """
+        Record a status change. Repeated writes of the same non-terminal status (one per
+        stage) match no row and cost no write. A cancelled job stays cancelled.
+        """
+        now = time.time()
+        if terminal:
+            self._connect().execute(
+                "UPDATE job_history SET status = ?, finished_at = ?, duration = ? - created_at "
+                "WHERE job_id = ? AND status != 'cancelled'",
+                (status, now, now, job_id),
+            )
+        else:
+            # A retried job starts over, so its previous finish no longer counts
+            self._connect().execute(
+                "UPDATE job_history SET status = ?, finished_at = NULL, duration = NULL, "
+                "started_at = CASE WHEN ? = 'processing' THEN COALESCE(started_at, ?) ELSE started_at END "
+                "WHERE job_id = ? AND status NOT IN (?, 'cancelled')",
+                (status, status, now, job_id, status),
+            )
+
+    @staticmethod
+    def _where(status: str = None, user_id: str = None, style: str = None, since: float = None,
+               until: float = None) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        for column, value in (("status", status), ("user_id", user_id), ("style", style)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        return clauses, params
+
+    def query(self, status: str = None, user_id: str = None, style: str = None, since: float = None,
+              until: float = None, limit: int = 50, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of jobs, newest first. Returns the jobs and the cursor of the next page (None on the last page).
+        """
+        clauses, params = self._where(status, user_id, style, since, until)
+        if cursor:
+            created_at, job_id = decode_cursor(cursor)
+            clauses.append("(created_at, job_id) < (?, ?)")
+            params.extend([created_at, job_id])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM job_history {where} "
+            "ORDER BY created_at DESC, job_id DESC LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+        jobs = [dict(zip(self.COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = encode_cursor(jobs[-1]["created_at"], jobs[-1]["job_id"]) if len(rows) > limit else None
+        return jobs, next_cursor
+
+    def aggregates(self, user_id: str = None, style: str = None, since: float = None,
+                   until: float = None) -> Dict[str, Any]:
+        """
+        Job counts per status, and p50/p95 duration (created to finished) of completed jobs.
+        """
+        conn = self._connect()
+        clauses, params = self._where(None, user_id, style, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        counts = dict(conn.execute(
+            f"SELECT status, COUNT(*) FROM job_history {where} GROUP BY status", params
+        ).fetchall())
+
+        clauses, params = self._where("completed", user_id, style, since, until)
+        where = " AND ".join(clauses + ["duration IS NOT NULL"])
+        completed = counts.get("completed", 0)
+        percentiles = {}
+        for name, fraction in (("p50", 0.50), ("p95", 0.95)):
+            if not completed:
+                percentiles[name] = None
+                continue
+            # Nearest-rank percentile; the status index covers the scan
+            row = conn.execute(
+                f"SELECT duration FROM job_history WHERE {where} ORDER BY duration LIMIT 1 OFFSET ?",
+                params + [max(math.ceil(fraction * completed) - 1, 0)],
+            ).fetchone()
+            percentiles[name] = row[0] if row else None
+        return {"total": sum(counts.values()), "counts": counts, "durationSeconds": percentiles}
+
+    def purge(self, older_than: float) -> int:
+        cursor = self._connect().execute("DELETE FROM job_history WHERE created_at < ?", (older_than,))
+        return cursor.rowcount
+
+
+def encode_cursor(created_at: float, job_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at!r}|{job_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """
+    Inverse of encode_cursor. Raises ValueError on a malformed cursor.
+    """
+    try:
+        created_at, job_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return float(created_at), job_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# Global instance
+job_history = JobHistory(settings.JOB_HISTORY_PATH)
@@ -1,23 +1,633 @@
-from typing import Dict, Any
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
-# In-memory store for jobs. In a real application, use Redis or a database.
-JOBS: Dict[str, Dict[str, Any]] = {}
+from .config import settings
+from .events import job_event_bus, TERMINAL_STATUSES
+from .history import job_history
+from .metrics import registry, Gauge
 
-def create_job(job_id: str) -> None:
-    JOBS[job_id] = {"status": "pending", "progress": 0, "details": "Job created."}
+
+class JobStore(ABC):
+    """
+    Interface for job state backends.
+    Every backend returns job records as plain dicts in the JobStatusResponse shape.
+    """
+
+    @abstractmethod
+    def create(self, job_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, status: str, progress: int, details: str) -> None:
+        """
+        Set a job's status. A cancelled job is final and is left untouched.
+        """
+
+    @abstractmethod
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def update_progress(self, updates: List[Tuple[str, int, str]]) -> None:
+        """
+        Record (job_id, progress, details) of several processing jobs in one write.
+        A job that is not processing, or already reports more progress, is left untouched,
+        so a late progress report never overrides a stage transition.
+        """
+
+    @abstractmethod
+    def purge(self, status: str, older_than: float) -> int:
+        """
+        Delete jobs in the given status last updated before older_than. Returns the number removed.
+        """
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """
+        Number of stored jobs per status.
+        """
+
+    @abstractmethod
+    def save_batch(self, batch_id: str, job_ids: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    def get_batch(self, batch_id: str) -> Optional[List[str]]:
+        ...
+
+    @abstractmethod
+    def purge_batches(self, older_than: float) -> int:
+        ...
+
+    @abstractmethod
+    def join_flight(self, key: str, job_id: str) -> str:
+        """
+        Single-flight registration for identical requests. job_id becomes the leader of
+        flight key unless a pending or processing leader already holds it; then job_id is
+        attached as that leader's follower and takes over its current state. Returns the
+        leader's job ID.
+        """
+
+    @abstractmethod
+    def end_flight(self, leader_id: str) -> None:
+        """
+        Release the flight led by leader_id and drop its follower links.
+        """
+
+    @abstractmethod
+    def followers(self, leader_id: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def detach(self, job_id: str) -> Optional[str]:
+        """
+        Stop mirroring a follower. Returns the leader it was attached to, if any.
+        """
+
+
+class JobRecord:
+    """
+    Compact per-job state for the in-memory backend.
+    Slots avoid a per-instance __dict__, which matters with many thousands of live jobs.
+    """
+    __slots__ = ("job_id", "status", "progress", "details", "result", "created_at", "updated_at")
+
+    def __init__(self, job_id: str, created_at: float):
+        self.job_id = job_id
+        self.status = "pending"
+        self.progress = 0
+        self.details = "Job created."
+        self.result = None
+        self.created_at = created_at
+        self.updated_at = created_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        job = {
+            "jobId": self.job_id,
+            "status": self.status,
+            "progress": self.progress,
+            "details": self.details,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if self.result is not None:
+            job["result"] = self.result
+        return job
+
+
+class InMemoryJobStore(JobStore):
+    """
+    Process-local store backed by a dict of JobRecords.
+    Only valid with a single API worker; state is lost on restart.
+    """
+
+    def __init__(self, jobs: Dict[str, JobRecord]):
+        self.jobs = jobs
+        self.batches: Dict[str, tuple] = {}
+        self.flights: Dict[str, str] = {}
+        self.leaders: Dict[str, str] = {}
+        self.followers_of: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str) -> None:
+        with self._lock:
+            self.jobs[job_id] = JobRecord(job_id, time.time())
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def update(self, job_id: str, status: str, progress: int, details: str) -> None:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status != "cancelled":
+                job.status = status
+                job.progress = progress
+                job.details = details
+                job.updated_at = time.time()
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status != "cancelled":
+                job.status = "completed"
+                job.progress = 100
+                job.details = "Job completed successfully."
+                job.result = result
+                job.updated_at = time.time()
+
+    def update_progress(self, updates: List[Tuple[str, int, str]]) -> None:
+        now = time.time()
+        with self._lock:
+            for job_id, progress, details in updates:
+                job = self.jobs.get(job_id)
+                if job is not None and job.status == "processing" and job.progress < progress:
+                    job.progress = progress
+                    job.details = details
+                    job.updated_at = now
+
+    def purge(self, status: str, older_than: float) -> int:
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self.jobs.items()
+                if job.status == status and job.updated_at < older_than
+            ]
+            for job_id in expired:
+                del self.jobs[job_id]
+        return len(expired)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def save_batch(self, batch_id: str, job_ids: List[str]) -> None:
+        with self._lock:
+            self.batches[batch_id] = (tuple(job_ids), time.time())
+
+    def get_batch(self, batch_id: str) -> Optional[List[str]]:
+        with self._lock:
+            batch = self.batches.get(batch_id)
+        return list(batch[0]) if batch else None
+
+    def purge_batches(self, older_than: float) -> int:
+        with self._lock:
+            expired = [batch_id for batch_id, (_, created_at) in self.batches.items() if created_at < older_than]
+            for batch_id in expired:
+                del self.batches[batch_id]
+        return len(expired)
+
+    def join_flight(self, key: str, job_id: str) -> str:
+        with self._lock:
+            leader_id = self.flights.get(key)
+            leader = self.jobs.get(leader_id) if leader_id else None
+            if leader is None or leader.status not in ("pending", "processing"):
+                self.flights[key] = job_id
+                return job_id
+            self.leaders[job_id] = leader_id
+            self.followers_of.setdefault(leader_id, set()).add(job_id)
+            follower = self.jobs.get(job_id)
+            if follower is not None:
+                follower.status = leader.status
+                follower.progress = leader.progress
+                follower.details = leader.details
+                follower.updated_at = time.time()
+            return leader_id
+
+    def end_flight(self, leader_id: str) -> None:
+        with self._lock:
+            for key in [key for key, leader in self.flights.items() if leader == leader_id]:
+                del self.flights[key]
+            for job_id in self.followers_of.pop(leader_id, ()):
+                self.leaders.pop(job_id, None)
+
+    def followers(self, leader_id: str) -> List[str]:
+        with self._lock:
+            return list(self.followers_of.get(leader_id, ()))
+
+    def detach(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            leader_id = self.leaders.pop(job_id, None)
+            if leader_id is not None:
+                self.followers_of.get(leader_id, set()).discard(job_id)
+            return leader_id
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Durable store shared by every process on the host.
+
+    The database runs in WAL mode so readers never block the writer, and every
+    status write is a single autocommit UPDATE to keep the write lock short.
+    Connections are opened per thread and per process (sqlite3 connections
+    must not cross a fork).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                details TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_updated_at ON jobs (status, updated_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_batches (batch_id TEXT PRIMARY KEY, job_ids TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_flights (key TEXT PRIMARY KEY, leader_id TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS job_followers (job_id TEXT PRIMARY KEY, leader_id TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_followers_leader_id ON job_followers (leader_id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # isolation_level=None -> autocommit, so each statement is its own short transaction
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def create(self, job_id: str) -> None:
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, progress, details, result, created_at, updated_at) "
+            "VALUES (?, 'pending', 0, 'Job created.', NULL, ?, ?)",
+            (job_id, now, now),
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT job_id, status, progress, details, result, created_at, updated_at FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "jobId": row[0],
+            "status": row[1],
+            "progress": row[2],
+            "details": row[3],
+            "created_at": row[5],
+            "updated_at": row[6],
+        }
+        if row[4] is not None:
+            job["result"] = json.loads(row[4])
+        return job
+
+    def update(self, job_id: str, status: str, progress: int, details: str) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, progress = ?, details = ?, updated_at = ? "
+            "WHERE job_id = ? AND status != 'cancelled'",
+            (status, progress, details, time.time(), job_id),
+        )
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET status = 'completed', progress = 100, details = 'Job completed successfully.', "
+            "result = ?, updated_at = ? WHERE job_id = ? AND status != 'cancelled'",
+            (json.dumps(result), time.time(), job_id),
+        )
+
+    def update_progress(self, updates: List[Tuple[str, int, str]]) -> None:
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "UPDATE jobs SET progress = ?, details = ?, updated_at = ? "
+                "WHERE job_id = ? AND status = 'processing' AND progress < ?",
+                [(progress, details, now, job_id, progress) for job_id, progress, details in updates],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def purge(self, status: str, older_than: float) -> int:
+        cursor = self._connect().execute(
+            "DELETE FROM jobs WHERE status = ? AND updated_at < ?",
+            (status, older_than),
+        )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def save_batch(self, batch_id: str, job_ids: List[str]) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO job_batches (batch_id, job_ids, created_at) VALUES (?, ?, ?)",
+            (batch_id, json.dumps(job_ids), time.time()),
+        )
+
+    def get_batch(self, batch_id: str) -> Optional[List[str]]:
+        row = self._connect().execute("SELECT job_ids FROM job_batches WHERE batch_id = ?", (batch_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge_batches(self, older_than: float) -> int:
+        conn = self._connect()
+        cursor = conn.execute("DELETE FROM job_batches WHERE created_at < ?", (older_than,))
+        # Flights whose leader was evicted without ending them (e.g. the worker died)
+        conn.execute("DELETE FROM job_flights WHERE leader_id NOT IN (SELECT job_id FROM jobs)")
+        conn.execute("DELETE FROM job_followers WHERE leader_id NOT IN (SELECT job_id FROM jobs)")
+        return cursor.rowcount
+
+    def join_flight(self, key: str, job_id: str) -> str:
+        conn = self._connect()
+        # One write transaction, so a leader cannot finish between the check and the attach
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT f.leader_id FROM job_flights f JOIN jobs j ON j.job_id = f.leader_id "
+                "WHERE f.key = ? AND j.status IN ('pending', 'processing')",
+                (key,),
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO job_flights (key, leader_id, created_at) VALUES (?, ?, ?)",
+                    (key, job_id, time.time()),
+                )
+                leader_id = job_id
+            else:
+                leader_id = row[0]
+                conn.execute("INSERT OR REPLACE INTO job_followers (job_id, leader_id) VALUES (?, ?)", (job_id, leader_id))
+                conn.execute(
+                    "UPDATE jobs SET (status, progress, details) = "
+                    "(SELECT status, progress, details FROM jobs WHERE job_id = ?), updated_at = ? WHERE job_id = ?",
+                    (leader_id, time.time(), job_id),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return leader_id
+
+    def end_flight(self, leader_id: str) -> None:
+        conn = self._connect()
+        conn.execute("DELETE FROM job_flights WHERE leader_id = ?", (leader_id,))
+        conn.execute("DELETE FROM job_followers WHERE leader_id = ?", (leader_id,))
+
+    def followers(self, leader_id: str) -> List[str]:
+        rows = self._connect().execute("SELECT job_id FROM job_followers WHERE leader_id = ?", (leader_id,)).fetchall()
+        return [row[0] for row in rows]
+
+    def detach(self, job_id: str) -> Optional[str]:
+        conn = self._connect()
+        row = conn.execute("SELECT leader_id FROM job_followers WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("DELETE FROM job_followers WHERE job_id = ?", (job_id,))
+        return row[0]
+
+
+def create_job_store(backend: str = None, path: str = None) -> JobStore:
+    """
+    Build the job store configured by JOB_STORE_BACKEND ("sqlite" or "memory").
+    """
+    backend = backend or settings.JOB_STORE_BACKEND
+    if backend == "memory":
+        return InMemoryJobStore(JOBS)
+    if backend == "sqlite":
+        return SQLiteJobStore(path or settings.JOB_STORE_PATH)
+    raise ValueError(f"Unknown job store backend: {backend}")
+
+
+class JobSweeper:
+    """
+    Background thread that evicts jobs once they have sat in a terminal state
+    for longer than that state's TTL. Finished results stay retrievable from the
+    Asset row the pipeline persisted (looked up by job_id).
+    """
+
+    def __init__(self, store: JobStore, ttls: Dict[str, float], interval: float):
+        self.store = store
+        self.ttls = ttls
+        self.interval = interval
+        self.evicted: Dict[str, int] = {status: 0 for status in ttls}
+        self.last_sweep_at: Optional[float] = None
+        # Extra cleanups run on every sweep with the current time (e.g. stale checkpoints)
+        self.hooks: List[Callable[[float], Any]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep(self) -> Dict[str, int]:
+        now = time.time()
+        removed = {}
+        for status, ttl in self.ttls.items():
+            if ttl <= 0:
+                continue  # 0 keeps jobs in this state forever
+            removed[status] = self.store.purge(status, now - ttl)
+            self.evicted[status] = self.evicted.get(status, 0) + removed[status]
+        # A batch is kept as long as its jobs could be
+        if self.ttls and min(self.ttls.values()) > 0:
+            self.store.purge_batches(now - max(self.ttls.values()))
+        for hook in self.hooks:
+            hook(now)
+        self.last_sweep_at = now
+        return removed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Job sweep failed: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="job-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        counts = self.store.counts()
+        return {
+            "backend": type(self.store).__name__,
+            "size": sum(counts.values()),
+            "by_status": counts,
+            "ttl_seconds": self.ttls,
+            "evicted": dict(self.evicted),
+            "evicted_total": sum(self.evicted.values()),
+            "last_sweep_at": self.last_sweep_at,
+        }
+
+
+# Backing dict for the in-memory backend. Use the sqlite backend with more than one worker.
+JOBS: Dict[str, JobRecord] = {}
+
+job_store: JobStore = create_job_store()
+
+job_sweeper = JobSweeper(
+    job_store,
+    ttls={
+        "completed": settings.JOB_TTL_COMPLETED,
+        "failed": settings.JOB_TTL_FAILED,
+        "cancelled": settings.JOB_TTL_CANCELLED,
+    },
+    interval=settings.JOB_SWEEP_INTERVAL,
+)
+
+registry.register(Gauge(
+    "jambam_jobs",
+    "Jobs currently held by the job store, by status.",
+    ("status",),
+    callback=lambda: {(status,): count for status, count in job_store.counts().items()},
+))
+
+def create_job(job_id: str, request_data=None, user_id: str = None) -> None:
+    """
+    Register a new pending job, and its labels (user, style, quality) in the job history.
+    user_id must come from authentication, never from the request body; the generation
+    endpoints are unauthenticated, so their jobs have no user yet.
+    """
+    job_store.create(job_id)
+    job_history.record_created(
+        job_id,
+        user_id=user_id,
+        style=getattr(request_data, 'style', None) or "custom",
+        quality=getattr(request_data, 'quality', None),
+    )
+    job_event_bus.publish(job_id, {"jobId": job_id, "status": "pending", "progress": 0, "details": "Job created."})
 
 def get_job_status(job_id: str) -> Dict[str, Any]:
-    return JOBS.get(job_id, {"status": "not_found"})
+    return job_store.get(job_id) or {"status": "not_found"}
+
+def create_batch(batch_id: str, job_ids: List[str]) -> None:
+    job_store.save_batch(batch_id, job_ids)
+
+def get_batch_jobs(batch_id: str) -> Optional[List[str]]:
+    return job_store.get_batch(batch_id)
+
+def join_flight(key: str, job_id: str) -> str:
+    """
+    Attach job_id to an identical in-flight job, if there is one. Returns the job ID that will
+    actually run: job_id itself when it leads a new flight, otherwise the existing leader.
+    """
+    leader_id = job_store.join_flight(key, job_id)
+    if leader_id != job_id:
+        job = job_store.get(job_id) or {}
+        job_event_bus.publish(job_id, {
+            "jobId": job_id, "status": job.get("status"), "progress": job.get("progress"), "details": job.get("details"),
+        })
+    return leader_id
+
+def end_flight(job_id: str) -> None:
+    job_store.end_flight(job_id)
+
+def flight_followers(job_id: str) -> List[str]:
+    """
+    The coalesced requests attached to job_id's run.
+    """
+    return job_store.followers(job_id)
+
+def run_cancelled(job_id: str) -> bool:
+    """
+    True once nobody wants the pipeline run of job_id anymore: the job is cancelled
+    and no follower is still attached to it.
+    """
+    job = job_store.get(job_id)
+    return job is not None and job["status"] == "cancelled" and not job_store.followers(job_id)
 
 def update_job_status(job_id: str, status: str, progress: int, details: str) -> None:
-    if job_id in JOBS:
-        JOBS[job_id]["status"] = status
-        JOBS[job_id]["progress"] = progress
-        JOBS[job_id]["details"] = details
+    # Followers of a coalesced request mirror their leader
+    for target in [job_id] + job_store.followers(job_id):
+        job_store.update(target, status, progress, details)
+        job_history.record_status(target, status, status in TERMINAL_STATUSES)
+        job_event_bus.publish(target, {"jobId": target, "status": status, "progress": progress, "details": details})
+
+def update_job_progress(updates: Dict[str, Tuple[int, str]]) -> None:
+    """
+    Record in-stage progress of processing jobs, {job_id: (progress, details)}, in one store write.
+    """
+    writes = []
+    for job_id, (progress, details) in updates.items():
+        for target in [job_id] + job_store.followers(job_id):
+            writes.append((target, progress, details))
+            job_event_bus.publish(target, {"jobId": target, "status": "processing", "progress": progress, "details": details})
+    if writes:
+        job_store.update_progress(writes)
+
+def fail_jobs(job_ids: List[str], details: str) -> None:
+    """
+    Mark the jobs that have not finished yet as failed and release the flights they lead.
+    """
+    for job_id in job_ids:
+        if get_job_status(job_id).get("status") in TERMINAL_STATUSES:
+            continue
+        update_job_status(job_id, "failed", 100, details)
+        end_flight(job_id)
+
+def cancel_job(job_id: str, progress: int = 0) -> Optional[str]:
+    """
+    Cancel one job handle. Its followers are not cancelled with it, and a cancelled
+    follower stops mirroring its leader. Returns that leader, if any.
+    """
+    job_store.update(job_id, "cancelled", progress, "Job cancelled.")
+    job_history.record_status(job_id, "cancelled", True)
+    job_event_bus.publish(job_id, {"jobId": job_id, "status": "cancelled", "progress": progress, "details": "Job cancelled."})
+    return job_store.detach(job_id)
 
 def complete_job(job_id: str, result: Dict[str, str]) -> None:
-    if job_id in JOBS:
-        JOBS[job_id]["status"] = "completed"
-        JOBS[job_id]["progress"] = 100
-        JOBS[job_id]["details"] = "Job completed successfully."
-        JOBS[job_id]["result"] = result 
\ No newline at end of file
+    for target in [job_id] + job_store.followers(job_id):
+        job_store.complete(target, result)
+        job_history.record_status(target, "completed", True)
+        job_event_bus.publish(target, {
+            "jobId": target,
+            "status": "completed",
+            "progress": 100,
+            "details": "Job completed successfully.",
+            "result": result,
+        })
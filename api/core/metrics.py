@@ -0,0 +1,180 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+
+# Stage durations range from milliseconds (DB save) to minutes (high-quality generation)
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [per-bucket counts..., sum, count]
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for index, bound in enumerate(self.buckets):
+                cumulative += state[index]
+                labels = _format_labels(self.labelnames, key, (("le", _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+class Gauge(Metric):
+    """
+    A gauge read at scrape time from a callback returning {label values tuple: value}.
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Callable[[], Dict[Tuple[str, ...], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.callback() if self.callback else {}
+        except Exception as e:
+            print(f"Gauge {self.name} failed: {e}")
+            values = {}
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+# Global registry. Values are per process: with several uvicorn workers each one is scraped on its own.
+registry = MetricsRegistry()
+
+stage_duration = registry.register(Histogram(
+    "jambam_pipeline_stage_duration_seconds",
+    "Time spent in each asset pipeline stage.",
+    ("stage", "style", "quality"),
+))
+job_duration = registry.register(Histogram(
+    "jambam_pipeline_job_duration_seconds",
+    "End-to-end asset pipeline run time, excluding queue wait.",
+    ("style", "quality", "outcome"),
+))
+queue_wait = registry.register(Histogram(
+    "jambam_pipeline_queue_wait_seconds",
+    "Time jobs spend queued before an executor slot or a worker picks them up.",
+    ("lane",),
+    buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+))
+jobs_total = registry.register(Counter(
+    "jambam_pipeline_jobs_total",
+    "Asset pipeline runs by outcome.",
+    ("style", "quality", "outcome"),
+))
+
+
+def observe_pipeline_result(summary: Optional[Dict[str, Any]]):
+    """
+    Record the run summary returned by asset_pipeline, or the stage timings returned by
+    batch_pipeline (which has no outcome of its own; its jobs are counted by their own runs).
+    Observed in the process that owns the executor, so process-mode slots are counted too,
+    or in the broker worker that ran the pipeline.
+    """
+    if not isinstance(summary, dict):
+        return
+    style = summary.get("style") or "unknown"
+    quality = summary.get("quality") or "n/a"
+    for stage, seconds in (summary.get("stageTimings") or {}).items():
+        stage_duration.observe(seconds, stage=stage, style=style, quality=quality)
+    if "outcome" not in summary:
+        return
+    outcome = summary["outcome"]
+    if summary.get("duration") is not None:
+        job_duration.observe(summary["duration"], style=style, quality=quality, outcome=outcome)
+    jobs_total.inc(style=style, quality=quality, outcome=outcome)
@@ -0,0 +1,151 @@
+import threading
+from typing import Callable, Dict, Any, Hashable, List, Optional
+
+from .cancellation import cancellations
+from .config import settings
+from .metrics import registry, Histogram
+from ..generators import stable_diffusion_3d
+
+batch_sizes = registry.register(Histogram(
+    "jambam_microbatch_size",
+    "Requests served by one micro-batched generation call.",
+    ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32),
+))
+
+
+class _Pending:
+    __slots__ = ("request", "done", "result")
+
+    def __init__(self, request: Dict[str, Any]):
+        self.request = request
+        self.done = threading.Event()
+        self.result = None
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent calls with the same key into one batched call.
+
+    The first submit() for a key opens a batch and waits up to window seconds
+    (or until max_batch_size requests joined), then runs run_batch(key, requests)
+    on its own thread for everyone, while the other callers block until their
+    result is in. run_batch returns a result per request "job_id"; a BaseException in
+    place of a result is raised to that caller only. With a window of 0 or a
+    max batch size of 1, every request runs on its own right away.
+
+    check(request), if given, runs on every request just before the batch is
+    dispatched; a request it raises for (e.g. JobCancelled for a job cancelled
+    while it waited) is left out of the call and its caller gets the exception.
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[Hashable, List[Dict[str, Any]]], Dict[str, Any]],
+                 window: float, max_batch_size: int, check: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.name = name
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.check = check
+        self._cond = threading.Condition()
+        self._open: Dict[Hashable, List[_Pending]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_batch_size > 1
+
+    def submit(self, key: Hashable, request: Dict[str, Any]) -> Any:
+        entry = _Pending(request)
+        if not self.enabled:
+            self._run(key, [entry])
+        else:
+            with self._cond:
+                batch = self._open.get(key)
+                leader = batch is None
+                if leader:
+                    batch = self._open[key] = []
+                batch.append(entry)
+                if len(batch) >= self.max_batch_size:
+                    # Full: later requests open the next batch
+                    del self._open[key]
+                    self._cond.notify_all()
+                if leader:
+                    self._cond.wait_for(lambda: self._open.get(key) is not batch, timeout=self.window)
+                    if self._open.get(key) is batch:
+                        del self._open[key]
+            if leader:
+                self._run(key, batch)
+            else:
+                entry.done.wait()
+        if isinstance(entry.result, BaseException):
+            raise entry.result
+        return entry.result
+
+    def _run(self, key: Hashable, batch: List[_Pending]):
+        if self.check is not None:
+            batch = [entry for entry in batch if self._passes_check(entry)]
+            if not batch:
+                return
+        batch_sizes.observe(len(batch), batcher=self.name)
+        try:
+            results = self.run_batch(key, [entry.request for entry in batch])
+            for entry in batch:
+                entry.result = results[entry.request["job_id"]]
+        except BaseException as e:
+            for entry in batch:
+                entry.result = e
+        finally:
+            for entry in batch:
+                entry.done.set()
+
+    def _passes_check(self, entry: _Pending) -> bool:
+        try:
+            self.check(entry.request)
+        except BaseException as e:
+            entry.result = e
+            entry.done.set()
+            return False
+        return True
+
+
+def _isolated_step_callback(request: Dict[str, Any], errors: Dict[str, BaseException]) -> Callable[[int, int], None]:
+    """
+    Step callback of one member of a shared call: an exception (e.g. JobCancelled)
+    is kept for that member, which stops receiving steps, instead of aborting the call.
+    """
+    step_callback = request["step_callback"]
+    def on_step(step: int, total_steps: int):
+        if request["job_id"] not in errors:
+            try:
+                step_callback(step, total_steps)
+            except BaseException as e:
+                errors[request["job_id"]] = e
+    return on_step
+
+
+def _run_sd3d_batch(key, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    style, quality = key
+    generator = stable_diffusion_3d.sd3d_generator
+    if len(requests) == 1:
+        request = requests[0]
+        return {request["job_id"]: generator.generate(
+            request["job_id"], request["prompt"], style, quality,
+            seed=request.get("seed"), step_callback=request.get("step_callback"),
+        )}
+    errors: Dict[str, BaseException] = {}
+    outputs = generator.generate_batch(
+        [dict(request, quality=quality) for request in requests],
+        style,
+        step_callbacks={
+            request["job_id"]: _isolated_step_callback(request, errors)
+            for request in requests if request.get("step_callback") is not None
+        },
+    )
+    outputs.update(errors)
+    return outputs
+
+
+# Global instance
+sd3d_batcher = MicroBatcher(
+    "sd3d", _run_sd3d_batch, settings.SD3D_BATCH_WINDOW, settings.SD3D_BATCH_MAX_SIZE,
+    check=lambda request: cancellations.check(request["job_id"]),
+)
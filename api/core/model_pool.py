@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from .metrics import registry, Counter, Gauge, Histogram
+
+model_loads = registry.register(Counter(
+    "jambam_model_pool_loads_total",
+    "Models loaded into a model pool.",
+    ("pool", "model"),
+))
+model_evictions = registry.register(Counter(
+    "jambam_model_pool_evictions_total",
+    "Models evicted from a model pool to stay within its memory budget.",
+    ("pool", "model"),
+))
+model_load_duration = registry.register(Histogram(
+    "jambam_model_pool_load_seconds",
+    "Time spent loading a model into a model pool.",
+    ("pool",),
+))
+
+
+class _Entry:
+    __slots__ = ("model", "size", "refs", "loading")
+
+    def __init__(self, size: int):
+        self.model = None
+        self.size = size
+        self.refs = 1
+        self.loading = True
+
+
+class ModelPool:
+    """
+    Memory-budgeted LRU cache of loaded models.
+
+    acquire() hands out a model and pins it until the matching release(); only
+    unpinned models are evicted, least recently used first. Before loading, a
+    model reserves its size from its last load (or the largest model seen so
+    far, or default_size before any model has loaded), and a load that would
+    not fit next to the pinned models waits for a release rather than
+    overshooting the budget. A model larger than the whole
+    budget still loads once the pool is otherwise empty.
+    """
+
+    def __init__(self, name: str, budget_bytes: int, loader: Callable[[str], Any],
+                 sizer: Callable[[Any], int] = lambda model: 0,
+                 on_evict: Optional[Callable[[str], None]] = None, default_size: int = 0):
+        self.name = name
+        self.budget_bytes = budget_bytes
+        self.default_size = default_size
+        self.loader = loader
+        self.sizer = sizer
+        self.on_evict = on_evict
+        self._cond = threading.Condition()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.loads = 0
+        self.evictions = 0
+        pools.append(self)
+
+    def _used(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    def _estimate(self, key: str) -> int:
+        return self._sizes.get(key, max(self._sizes.values(), default=self.default_size))
+
+    def _make_room(self, needed: int) -> Tuple[bool, List[Tuple[str, Any]]]:
+        """
+        Evict idle models, least recently used first, until needed more bytes fit.
+        Returns whether they fit and the evicted (key, model) pairs. Call with the lock held.
+        """
+        evicted = []
+        used = self._used()
+        while used + needed > self.budget_bytes:
+            idle = next((key for key, entry in self._entries.items() if entry.refs == 0 and not entry.loading), None)
+            if idle is None:
+                return not self._entries, evicted
+            entry = self._entries.pop(idle)
+            used -= entry.size
+            evicted.append((idle, entry.model))
+        return True, evicted
+
+    def _evicted(self, evicted: List[Tuple[str, Any]]):
+        while evicted:
+            key, model = evicted.pop()
+            del model  # on_evict runs once the pool no longer references the model
+            self.evictions += 1
+            model_evictions.inc(pool=self.name, model=key)
+            print(f"Model pool {self.name}: evicted {key}")
+            if self.on_evict is not None:
+                self.on_evict(key)
+
+    def acquire(self, key: str) -> Any:
+        """
+        The model for key, loading it if needed. Pinned until release(key).
+        """
+        with self._cond:
+            while True:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refs += 1
+                    self._entries.move_to_end(key)
+                    while entry.loading:
+                        self._cond.wait()
+                    if entry.model is None:
+                        raise RuntimeError(f"Loading model {key} failed")
+                    return entry.model
+                fits, evicted = self._make_room(self._estimate(key))
+                if fits:
+                    entry = _Entry(self._estimate(key))
+                    self._entries[key] = entry
+                    break
+                self._cond.wait()
+        self._evicted(evicted)
+
+        started = time.time()
+        try:
+            model = self.loader(key)
+            size = self.sizer(model)
+        except BaseException:
+            with self._cond:
+                self._entries.pop(key, None)
+                entry.loading = False
+                self._cond.notify_all()
+            raise
+        model_load_duration.observe(time.time() - started, pool=self.name)
+        model_loads.inc(pool=self.name, model=key)
+        with self._cond:
+            entry.model, entry.size, entry.loading = model, size, False
+            self._sizes[key] = size
+            self.loads += 1
+            # The reservation was an estimate; settle up with the real size
+            _, evicted = self._make_room(0)
+            self._cond.notify_all()
+        self._evicted(evicted)
+        return model
+
+    def release(self, key: str):
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refs -= 1
+            _, evicted = self._make_room(0)
+            self._cond.notify_all()
+        self._evicted(evicted)
+
+    @contextmanager
+    def use(self, key: str):
+        model = self.acquire(key)
+        try:
+            yield model
+        finally:
+            self.release(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": self._used(),
+                "models": {key: {"bytes": entry.size, "refs": entry.refs, "loading": entry.loading}
+                           for key, entry in self._entries.items()},
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+def default_memory_budget(fraction: float = 0.5) -> int:
+    """
+    A share of physical memory, for pools configured with a budget of 0.
+    """
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * fraction)
+    except (ValueError, OSError, AttributeError):
+        return 8 * 1024 ** 3
+
+
+# Every pool in this process, for the gauges below
+pools: List[ModelPool] = []
+
+registry.register(Gauge(
+    "jambam_model_pool_bytes",
+    "Estimated memory held by the models resident in a model pool.",
+    ("pool",),
+    callback=lambda: {(pool.name,): pool.stats()["used_bytes"] for pool in pools},
+))
+registry.register(Gauge(
+    "jambam_model_pool_budget_bytes",
+    "Memory budget of a model pool.",
+    ("pool",),
+    callback=lambda: {(pool.name,): pool.budget_bytes for pool in pools},
+))
+registry.register(Gauge(
+    "jambam_model_pool_models",
+    "Models resident in a model pool.",
+    ("pool",),
+    callback=lambda: {(pool.name,): len(pool.stats()["models"]) for pool in pools},
+))
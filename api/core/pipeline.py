@@ -1,102 +1,413 @@
 import time
 import os
+import shutil
+import hashlib
+import json
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from .jobs import update_job_status, complete_job
+from .jobs import update_job_status, complete_job, cancel_job, end_flight, flight_followers
+from .cancellation import cancellations, JobCancelled
+from .progress import progress_reporter
+from .database import session_scope
+from .stages import Stage, StageGraph
+from .generation_cache import generation_cache, generation_key
+from .checkpoints import checkpoint_store
+from .microbatch import sd3d_batcher
 from ..generators import dreamfusion, brickgpt, gaussian_splatting, stable_diffusion_3d
 from ..postprocessing import rigging, animation, converter
 from ..models import database as db_models
+from ..models.assets import GenerateRequest
 
-def asset_pipeline(job_id: str, db: Session, request_data=None, uploaded_file_path: str = None, remix_of_id: int = None):
+# --- Pipeline Stages ---
+
+def _generation_progress(job_id: str):
+    """
+    Per-inference-step progress, between the start of the pipeline (10) and the generate stage's done progress.
+    """
+    return progress_reporter.step_reporter(job_id, 10, 10 + 80 // len(ASSET_GRAPH.stages), "Generating model")
+
+def _generation_step_callback(job_id: str):
+    """
+    Per-inference-step hook of a single generation: cancellation checkpoint plus progress.
+    """
+    report = _generation_progress(job_id)
+    def on_step(step: int, total_steps: int):
+        cancellations.check(job_id)
+        report(step, total_steps)
+    return on_step
+
+def _run_generator(job_id: str, prompt: str, style: str, quality: str, seed: Optional[int]) -> str:
+    # Use Stable Diffusion 3D for most styles, batched with concurrent jobs of the same style and quality
+    if style in stable_diffusion_3d.sd3d_generator.get_available_styles():
+        return sd3d_batcher.submit((style, quality), {
+            "job_id": job_id, "prompt": prompt, "seed": seed, "step_callback": _generation_step_callback(job_id),
+        })
+    # Fallback to legacy generators for specific cases
+    elif style == "voxel":
+        return brickgpt.generate(job_id, prompt)
+    else:
+        return dreamfusion.generate(job_id, prompt, style)
+
+def _model_version(style: str) -> str:
+    if style in stable_diffusion_3d.sd3d_generator.get_available_styles():
+        return stable_diffusion_3d.sd3d_generator.model_version
+    return "brickgpt" if style == "voxel" else "dreamfusion"
+
+def _generation_cache_key(request_data) -> str:
+    return generation_key(
+        request_data.prompt,
+        request_data.style,
+        getattr(request_data, 'quality', 'standard'),
+        getattr(request_data, 'seed', None),
+        _model_version(request_data.style),
+    )
+
+def flight_key(request_data) -> str:
+    """
+    Single-flight key of a text-to-3D request: the generation cache key plus the
+    post-processing and save options, so only requests producing the same asset coalesce.
+    """
+    payload = json.dumps([
+        _generation_cache_key(request_data),
+        getattr(request_data, 'animation', None) or [],
+        getattr(request_data, 'output_format', 'glb'),
+        getattr(request_data, 'tags', None) or [],
+        [option.dict() for option in getattr(request_data, 'licenses', None) or []],
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _restore_cached_generation(job_id: str, request_data) -> Optional[str]:
+    if generation_cache is None:
+        return None
+    model_path = generation_cache.restore(_generation_cache_key(request_data), f"static/generated/{job_id}/{job_id}_cached")
+    if model_path:
+        print(f"[{job_id}] Generation cache hit, skipping generator.")
+    return model_path
+
+def _cache_generation(request_data, model_path: str):
+    # A mock fallback stands in for a failed generation; caching it would serve it to every later request
+    if stable_diffusion_3d.sd3d_generator.is_fallback(model_path):
+        print(f"Not caching fallback asset {model_path}")
+        return
+    if generation_cache is not None:
+        generation_cache.put(_generation_cache_key(request_data), model_path, {
+            "prompt": request_data.prompt,
+            "style": request_data.style,
+            "quality": getattr(request_data, 'quality', 'standard'),
+            "seed": getattr(request_data, 'seed', None),
+        })
+
+def generate_stage(job_id: str, request_data, uploaded_file_path: Optional[str]) -> Dict[str, Any]:
+    """
+    Generate the initial model from a prompt, or pass an uploaded file through.
+    Identical generation requests are served from the generation cache.
+    """
+    if request_data: # Text-to-3D
+        prompt = request_data.prompt
+        style = request_data.style
+        quality = getattr(request_data, 'quality', 'standard')
+        seed = getattr(request_data, 'seed', None)
+
+        model_path = _restore_cached_generation(job_id, request_data)
+        if model_path is None:
+            model_path = _run_generator(job_id, prompt, style, quality, seed)
+            _cache_generation(request_data, model_path)
+    elif uploaded_file_path:
+        prompt = None
+        style = "custom"
+        model_path = uploaded_file_path
+    else:
+        raise ValueError("No generation request or file provided.")
+
+    return {"model_path": model_path, "prompt": prompt, "style": style}
+
+def splat_stage(job_id: str, model_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Generate Gaussian Splat previews for all platforms. Only needs the generated mesh.
+    """
+    splat_output_dir = f"static/generated/{job_id}/splats"
+    splat_result = gaussian_splatting.splat_converter.convert_model_to_splats(
+        model_path, splat_output_dir, check_cancelled=cancellations.checker(job_id)
+    )
+    if splat_result["status"] != "success":
+        return None
+    return {
+        "splatPreviews": {
+            "web": f"/static/generated/{job_id}/splats/splats_web.json",
+            "desktop": f"/static/generated/{job_id}/splats/splats_desktop.bin",
+            "android": f"/static/generated/{job_id}/splats/splats_android.json"
+        },
+        "splatCount": splat_result["splat_count"],
+    }
+
+def _tags_for(db: Session, names: List[str]) -> List[db_models.Tag]:
+    existing = {tag.name: tag for tag in db.query(db_models.Tag).filter(db_models.Tag.name.in_(names)).all()}
+    return [existing.get(name) or db_models.Tag(name=name) for name in names]
+
+def _insert_asset(db: Session, job_id: str, final_assets: Dict[str, Any], splats: Optional[Dict[str, Any]],
+                  request_data, prompt: Optional[str], style: str, remix_of_id: Optional[int]) -> int:
+    # In a real app, user_id would come from an authentication system.
+    new_asset = db_models.Asset(
+        name=prompt or "Uploaded Asset",
+        description=f"A {style} asset generated with Stable Diffusion 3D." if style in stable_diffusion_3d.sd3d_generator.get_available_styles() else f"A {style} asset.",
+        prompt=prompt,
+        style=style,
+        model_url=final_assets.get("modelUrl"),
+        thumbnail_url=final_assets.get("thumbnailUrl"),
+        owner_id=1, # Dummy user for now
+        remix_of_asset_id=remix_of_id,
+        job_id=job_id,
+        is_public=False, # Default to private
+        price=0.0, # Default to free
+        is_for_sale=False, # Default to not for sale
+        # Default limitation settings
+        max_quantity=None, # Unlimited
+        current_quantity_sold=0,
+        available_until=None, # Always available
+        exclusive_to_organization_id=None, # Public
+        exclusivity_level="public",
+        preview_metadata=splats,
+    )
+    tag_names = list(dict.fromkeys([style] + list(getattr(request_data, 'tags', None) or [])))
+    new_asset.tags = _tags_for(db, tag_names)
+    new_asset.licenses = [
+        db_models.AssetLicense(license_type_id=option.license_type_id, price=option.price, is_available=True)
+        for option in getattr(request_data, 'licenses', None) or []
+    ]
+    db.add(new_asset)
+    db.flush()
+    # Coalesced followers get the same asset; link their job IDs so they can still be looked up after eviction
+    db.add_all([db_models.AssetJob(job_id=follower_id, asset_id=new_asset.id) for follower_id in flight_followers(job_id)])
+    return new_asset.id
+
+def find_job_asset(db: Session, job_id: str) -> Optional[db_models.Asset]:
+    """
+    The asset a job produced, also for a coalesced follower, which shares its leader's asset.
+    """
+    asset = db.query(db_models.Asset).filter(db_models.Asset.job_id == job_id).first()
+    if asset is None:
+        asset = (
+            db.query(db_models.Asset)
+            .join(db_models.AssetJob, db_models.AssetJob.asset_id == db_models.Asset.id)
+            .filter(db_models.AssetJob.job_id == job_id)
+            .first()
+        )
+    return asset
+
+def asset_job_result(asset: db_models.Asset) -> Dict[str, Any]:
+    """
+    The result of a job the job store has evicted, rebuilt from the asset it saved,
+    with the same model, thumbnail and splat preview fields a live job returns.
+    """
+    result = {"modelUrl": asset.model_url, "thumbnailUrl": asset.thumbnail_url}
+    result.update(asset.preview_metadata or {})
+    return result
+
+def save_stage(job_id: str, final_assets: Dict[str, Any], splats: Optional[Dict[str, Any]], request_data,
+               prompt: Optional[str], style: str, remix_of_id: Optional[int]) -> int:
+    """
+    Save the asset with its tags, licenses and preview metadata in a single short
+    transaction. This is the only point where the pipeline holds a DB connection.
+    """
+    cancellations.check(job_id)
+    try:
+        with session_scope() as db:
+            return _insert_asset(db, job_id, final_assets, splats, request_data, prompt, style, remix_of_id)
+    except IntegrityError:
+        # A concurrent pipeline created one of our new tags first; it exists now
+        with session_scope() as db:
+            return _insert_asset(db, job_id, final_assets, splats, request_data, prompt, style, remix_of_id)
+
+# generate -> rig -> animate -> convert -> save, with splat previews branching off the generated mesh
+ASSET_GRAPH = StageGraph(
+    [
+        Stage("generate", generate_stage,
+              inputs=("job_id", "request_data", "uploaded_file_path"),
+              outputs=("model_path", "prompt", "style"),
+              done_message="Model generated, starting post-processing."),
+        Stage("rigging", lambda job_id, model_path: rigging.run(job_id, model_path),
+              inputs=("job_id", "model_path"), outputs=("rigged_path",),
+              done_message="Rigging complete."),
+        Stage("animation", lambda job_id, rigged_path, animations: animation.run(job_id, rigged_path, animations),
+              inputs=("job_id", "rigged_path", "animations"), outputs=("animated_path",),
+              done_message="Animation complete."),
+        Stage("conversion", lambda job_id, animated_path, output_format: converter.run(job_id, animated_path, output_format),
+              inputs=("job_id", "animated_path", "output_format"), outputs=("final_assets",),
+              done_message="Conversion complete."),
+        Stage("splats", splat_stage,
+              inputs=("job_id", "model_path"), outputs=("splats",),
+              done_message="Cross-platform previews generated."),
+        Stage("save", save_stage,
+              inputs=("job_id", "final_assets", "splats", "request_data", "prompt", "style", "remix_of_id"),
+              outputs=("asset_id",),
+              done_message="Asset saved."),
+    ],
+    initial=("job_id", "request_data", "uploaded_file_path", "remix_of_id", "animations", "output_format"),
+)
+
+# --- Job Requests ---
+
+def discard_job_files(job_id: str):
+    """
+    Remove everything a job produced or checkpointed, e.g. after it was cancelled.
+    """
+    shutil.rmtree(f"static/generated/{job_id}", ignore_errors=True)
+    checkpoint_store.clear(job_id)
+
+def encode_job_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    asset_pipeline keyword arguments as plain JSON-serializable data.
+    """
+    params = dict(params)
+    if params.get("request_data") is not None:
+        params["request_data"] = params["request_data"].dict()
+    return params
+
+def decode_job_params(params: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if params and params.get("request_data") is not None:
+        params = dict(params, request_data=GenerateRequest(**params["request_data"]))
+    return params
+
+def record_job_request(job_id: str, **params):
+    """
+    Persist the arguments a job was submitted with, so it can be resumed or retried later.
+    """
+    checkpoint_store.save_request(job_id, encode_job_params(params))
+
+def load_job_request(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    The asset_pipeline keyword arguments recorded for a job, or None.
+    """
+    return decode_job_params(checkpoint_store.load_request(job_id))
+
+def asset_pipeline(job_id: str, request_data=None, uploaded_file_path: str = None, remix_of_id: int = None,
+                   animations: Optional[List[str]] = None, output_format: Optional[str] = None):
     """
     The main pipeline for asset generation and processing.
+    animations and output_format are the options of an upload, which has no request_data to carry them.
     This function orchestrates the call to different services and saves the result to the DB.
+    No DB session is held while generating; the save stage opens a short-lived one.
+    Every finished stage is checkpointed; a re-run of the same job skips the
+    stages whose outputs are still on disk.
+    Returns a run summary (outcome, labels and timings of the stages that ran)
+    for observe_pipeline_result.
     """
+    started = time.time()
+    summary = {
+        "jobId": job_id,
+        "style": getattr(request_data, 'style', None) or "custom",
+        "quality": getattr(request_data, 'quality', None) if request_data else "n/a",
+        "outcome": "failed",
+        "stageTimings": {},
+    }
     try:
-        # 1. Generate or receive initial model
-        update_job_status(job_id, "processing", 10, "Initializing pipeline...")
-        
-        if request_data: # Text-to-3D
-            prompt = request_data.prompt
-            style = request_data.style
-            quality = getattr(request_data, 'quality', 'standard')
-            
-            # Use Stable Diffusion 3D for most styles
-            if style in stable_diffusion_3d.sd3d_generator.get_available_styles():
-                model_path = stable_diffusion_3d.sd3d_generator.generate(
-                    job_id, prompt, style, quality
-                )
-            # Fallback to legacy generators for specific cases
-            elif style == "voxel":
-                model_path = brickgpt.generate(job_id, prompt)
-            else:
-                model_path = dreamfusion.generate(job_id, prompt, style)
-        elif uploaded_file_path:
-            prompt = None
-            style = "custom"
-            model_path = uploaded_file_path
+        cancellations.check(job_id)
+        completed = checkpoint_store.load(job_id)
+        if completed:
+            update_job_status(job_id, "processing", 10, f"Resuming pipeline after: {', '.join(completed)}.")
         else:
-            raise ValueError("No generation request or file provided.")
-
-        update_job_status(job_id, "processing", 30, "Model generated, starting post-processing.")
-
-        # 2. Rigging
-        rigged_path = rigging.run(job_id, model_path)
-        update_job_status(job_id, "processing", 50, "Rigging complete.")
-        
-        # 3. Animation
-        animated_path = animation.run(job_id, rigged_path, getattr(request_data, 'animation', []))
-        update_job_status(job_id, "processing", 70, "Animation complete.")
-
-        # 4. Format Conversion & Optimization
-        final_assets = converter.run(job_id, animated_path, getattr(request_data, 'output_format', 'glb'))
-        update_job_status(job_id, "processing", 70, "Generating cross-platform previews...")
-
-        # 5. Generate Gaussian Splat previews for all platforms
-        splat_output_dir = f"static/generated/{job_id}/splats"
-        splat_result = gaussian_splatting.splat_converter.convert_model_to_splats(
-            final_assets.get("modelUrl"), 
-            splat_output_dir
-        )
-        
-        if splat_result["status"] == "success":
-            # Add splat preview URLs to final assets
-            final_assets["splatPreviews"] = {
-                "web": f"/static/generated/{job_id}/splats/splats_web.json",
-                "desktop": f"/static/generated/{job_id}/splats/splats_desktop.bin", 
-                "android": f"/static/generated/{job_id}/splats/splats_android.json"
-            }
-            final_assets["splatCount"] = splat_result["splat_count"]
-        
-        update_job_status(job_id, "processing", 90, "Finalizing assets.")
-
-        # 6. Save asset to database
-        # In a real app, user_id would come from an authentication system.
-        new_asset = db_models.Asset(
-            name=prompt or "Uploaded Asset",
-            description=f"A {style} asset generated with Stable Diffusion 3D." if style in stable_diffusion_3d.sd3d_generator.get_available_styles() else f"A {style} asset.",
-            prompt=prompt,
-            style=style,
-            model_url=final_assets.get("modelUrl"),
-            thumbnail_url=final_assets.get("thumbnailUrl"),
-            owner_id=1, # Dummy user for now
-            remix_of_asset_id=remix_of_id,
-            is_public=False, # Default to private
-            price=0.0, # Default to free
-            is_for_sale=False, # Default to not for sale
-            # Default limitation settings
-            max_quantity=None, # Unlimited
-            current_quantity_sold=0,
-            available_until=None, # Always available
-            exclusive_to_organization_id=None, # Public
-            exclusivity_level="public"
+            update_job_status(job_id, "processing", 10, "Initializing pipeline...")
+
+        def on_stage_done(stage: Stage, outputs: Dict[str, Any], done: int, total: int):
+            if done < total:  # once saved, the asset is kept
+                cancellations.check(job_id)
+            checkpoint_store.save(job_id, stage.name, outputs)
+            update_job_status(job_id, "processing", 10 + (80 * done) // total, stage.done_message)
+
+        context, timings = ASSET_GRAPH.run(
+            {
+                "job_id": job_id,
+                "request_data": request_data,
+                "uploaded_file_path": uploaded_file_path,
+                "remix_of_id": remix_of_id,
+                "animations": animations if animations is not None else getattr(request_data, 'animation', []),
+                "output_format": output_format or getattr(request_data, 'output_format', 'glb'),
+            },
+            on_stage_done=on_stage_done,
+            completed=completed,
         )
-        db.add(new_asset)
-        db.commit()
 
-        # 7. Complete Job
+        final_assets = dict(context["final_assets"])
+        if context["splats"]:
+            final_assets.update(context["splats"])
+        final_assets["stageTimings"] = {name: round(timing.duration, 3) for name, timing in timings.items()}
+        final_assets["criticalPath"] = ASSET_GRAPH.critical_path(timings)
+        summary["stageTimings"] = {name: timing.duration for name, timing in timings.items() if name not in completed}
+        print(f"[{job_id}] Stage timings: {final_assets['stageTimings']} (critical path: {' -> '.join(final_assets['criticalPath'])})")
+
+        # Complete Job
         complete_job(job_id, final_assets)
+        checkpoint_store.clear(job_id)
+        summary["outcome"] = "completed"
 
+    except JobCancelled:
+        print(f"[{job_id}] Pipeline cancelled, discarding partial output.")
+        cancel_job(job_id)
+        discard_job_files(job_id)
+        summary["outcome"] = "cancelled"
     except Exception as e:
         print(f"Pipeline failed for job {job_id}: {e}")
         update_job_status(job_id, "failed", 100, str(e))
-        db.rollback() 
\ No newline at end of file
+    finally:
+        end_flight(job_id)
+        cancellations.discard(job_id)
+        progress_reporter.discard(job_id)
+    summary["duration"] = time.time() - started
+    return summary
+
+def batch_pipeline(batch_id: str, style: str, items: List[Tuple[str, GenerateRequest]]):
+    """
+    Run the generation of one style group of a batch: every prompt is generated by a
+    single loaded SD3D pipeline. Returns a summary with the shared batch generation time
+    as the "generate_batch" stage, and the group's items as "members"; the dispatcher
+    that ran the group queues each of them as its own asset_pipeline task, which picks
+    up the generated model from its "generate" checkpoint.
+    """
+    pending = []
+    batch_seconds = None
+    for job_id, request_data in items:
+        if cancellations.is_cancelled(job_id):
+            continue
+        update_job_status(job_id, "processing", 10, f"Generating as part of batch {batch_id}...")
+        model_path = _restore_cached_generation(job_id, request_data)
+        if model_path:
+            checkpoint_store.save(job_id, "generate", {"model_path": model_path, "prompt": request_data.prompt, "style": style})
+        else:
+            pending.append((job_id, request_data))
+
+    if pending:
+        started = time.time()
+        try:
+            model_paths = stable_diffusion_3d.sd3d_generator.generate_batch(
+                [
+                    {
+                        "job_id": job_id,
+                        "prompt": request_data.prompt,
+                        "quality": getattr(request_data, 'quality', 'standard'),
+                        "seed": getattr(request_data, 'seed', None),
+                    }
+                    for job_id, request_data in pending
+                ],
+                style,
+                # Progress only: a cancelled member must not abort the shared call
+                step_callbacks={job_id: _generation_progress(job_id) for job_id, _ in pending},
+            )
+            for job_id, request_data in pending:
+                _cache_generation(request_data, model_paths[job_id])
+                checkpoint_store.save(job_id, "generate", {
+                    "model_path": model_paths[job_id], "prompt": request_data.prompt, "style": style,
+                })
+            batch_seconds = time.time() - started
+        except Exception as e:
+            # Each job falls back to generating on its own inside asset_pipeline
+            print(f"Batch generation failed for batch {batch_id}: {e}")
+
+    qualities = {getattr(request_data, 'quality', 'standard') for _, request_data in items}
+    return {
+        "jobId": batch_id,
+        "style": style,
+        "quality": qualities.pop() if len(qualities) == 1 else "mixed",
+        "stageTimings": {"generate_batch": batch_seconds} if batch_seconds is not None else {},
+        "members": items,
+    }
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from .config import settings
+from .jobs import update_job_progress
+
+
+class ProgressReporter:
+    """
+    Throttled, coalesced writer for in-stage job progress (e.g. per diffusion step).
+
+    report() only remembers the latest progress of each job. A background thread
+    writes whatever is pending every interval seconds in one job store write, so a
+    job reporting hundreds of steps costs at most one write per interval, and all
+    running jobs together cost one write transaction per interval. Reports that do
+    not move a job's integer progress are dropped before they reach the store.
+    """
+
+    def __init__(self, writer: Callable[[Dict[str, Tuple[int, str]]], None], interval: float = 1.0):
+        self.writer = writer
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[int, str]] = {}
+        self._reported: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def report(self, job_id: str, progress: int, details: str):
+        with self._lock:
+            if progress <= self._reported.get(job_id, -1):
+                return
+            self._reported[job_id] = progress
+            self._pending[job_id] = (progress, details)
+            # Started on first use in every process, since threads do not survive a fork
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+                self._thread.start()
+
+    def discard(self, job_id: str):
+        """
+        Forget a job, dropping its unwritten report. Call when the job's run ends.
+        """
+        with self._lock:
+            self._pending.pop(job_id, None)
+            self._reported.pop(job_id, None)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self.writer(pending)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Progress write failed: {e}")
+
+    def step_reporter(self, job_id: str, start: int, end: int, label: str) -> Callable[[int, int], None]:
+        """
+        A (step, total_steps) callback spreading a stage's steps over progress start..end.
+        """
+        def on_step(step: int, total_steps: int):
+            self.report(job_id, start + (end - start) * step // max(total_steps, 1),
+                        f"{label}: step {step}/{total_steps}")
+        return on_step
+
+
+# Global instance
+progress_reporter = ProgressReporter(update_job_progress, settings.JOB_PROGRESS_INTERVAL)
@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+
+class Stage:
+    """
+    One step of a pipeline with declared inputs and outputs.
+
+    fn is called with the declared inputs as keyword arguments. It returns the
+    value of its single output, or a dict keyed by output name when it declares
+    several.
+    """
+
+    def __init__(self, name: str, fn: Callable, inputs: Iterable[str] = (), outputs: Iterable[str] = (),
+                 done_message: str = None):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.done_message = done_message or f"{name} complete."
+
+    def run(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        value = self.fn(**{key: context[key] for key in self.inputs})
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: value}
+        if not self.outputs:
+            return {}
+        return {key: value[key] for key in self.outputs}
+
+
+class StageTiming:
+    __slots__ = ("stage", "started_at", "finished_at")
+
+    def __init__(self, stage: str, started_at: float, finished_at: float):
+        self.stage = stage
+        self.started_at = started_at
+        self.finished_at = finished_at
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+
+class StageGraph:
+    """
+    A DAG of stages wired together by input/output names.
+
+    Stages whose inputs are all available run concurrently on a thread pool, so
+    independent branches (e.g. splat previews next to rigging/animation) overlap.
+    """
+
+    def __init__(self, stages: List[Stage], initial: Iterable[str] = ()):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        self.producer: Dict[str, str] = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self.producer:
+                    raise ValueError(f"Output '{output}' is produced by both {self.producer[output]} and {stage.name}")
+                self.producer[output] = stage.name
+        available = set(initial)
+        self.dependencies: Dict[str, set] = {}
+        for stage in stages:
+            missing = [key for key in stage.inputs if key not in self.producer and key not in available]
+            if missing:
+                raise ValueError(f"Stage {stage.name} needs inputs nobody provides: {missing}")
+            self.dependencies[stage.name] = {self.producer[key] for key in stage.inputs if key in self.producer}
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        remaining = {name: set(deps) for name, deps in self.dependencies.items()}
+        order = []
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise ValueError(f"Stage graph has a cycle between: {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def run(self, context: Dict[str, Any], max_workers: int = None,
+            on_stage_done: Callable[[Stage, Dict[str, Any], int, int], None] = None,
+            completed: Dict[str, Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, StageTiming]]:
+        """
+        Execute every stage, returning the final context and per-stage timings.
+
+        completed maps stage names to outputs recorded by an earlier run; those
+        stages are skipped (as long as everything upstream of them was completed
+        too) and report a zero duration. The first stage failure cancels stages
+        that have not started yet and is re-raised.
+        """
+        context = dict(context)
+        timings: Dict[str, StageTiming] = {}
+        done: set = set()
+        running = {}
+        max_workers = max_workers or len(self.stages)
+
+        for name in self.order:
+            if completed and name in completed and self.dependencies[name] <= done:
+                context.update(completed[name])
+                now = time.time()
+                timings[name] = StageTiming(name, now, now)
+                done.add(name)
+
+        def timed(stage: Stage):
+            started = time.time()
+            outputs = stage.run(context)
+            return outputs, StageTiming(stage.name, started, time.time())
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as pool:
+            while len(done) < len(self.stages):
+                for name in self.order:
+                    if name in done or name in running.values():
+                        continue
+                    if self.dependencies[name] <= done:
+                        running[pool.submit(timed, self.stages[name])] = name
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        outputs, timing = future.result()
+                    except BaseException:
+                        for pending in running:
+                            pending.cancel()
+                        raise
+                    context.update(outputs)
+                    timings[name] = timing
+                    done.add(name)
+                    if on_stage_done is not None:
+                        on_stage_done(self.stages[name], outputs, len(done), len(self.stages))
+        return context, timings
+
+    def critical_path(self, timings: Dict[str, StageTiming]) -> List[str]:
+        """
+        The chain of dependent stages with the largest summed duration, i.e. the
+        stages that bound the job's wall-clock time.
+        """
+        longest: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name in self.order:
+            best_dep = max(self.dependencies[name], key=lambda dep: longest[dep], default=None)
+            longest[name] = timings[name].duration + (longest[best_dep] if best_dep else 0.0)
+            previous[name] = best_dep
+        path = []
+        node = max(longest, key=longest.get) if longest else None
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return list(reversed(path))
@@ -0,0 +1,97 @@
+import json
+from typing import Dict, Any, AsyncIterator, Iterable, Optional, Tuple
+
+from .config import settings
+from .events import JobSubscription, TERMINAL_STATUSES, job_event_bus
+from .jobs import get_job_status
+
+STREAM_FIELDS = ("jobId", "status", "progress", "details", "result")
+
+
+def _snapshot(job_id: str) -> Dict[str, Any]:
+    job = get_job_status(job_id)
+    event = {key: job[key] for key in STREAM_FIELDS if key in job}
+    event["jobId"] = job_id
+    return event
+
+
+def _fingerprint(event: Dict[str, Any]) -> Tuple:
+    return (event.get("status"), event.get("progress"), event.get("details"))
+
+
+def watch(subscription: JobSubscription, job_ids: Iterable[str]):
+    """
+    Add jobs to a subscription and queue their current state, so a client
+    that subscribes late still starts from a known status.
+    """
+    job_ids = [job_id for job_id in job_ids if job_id not in subscription.job_ids]
+    subscription.add(job_ids)
+    for job_id in job_ids:
+        subscription.queue.put_nowait(_snapshot(job_id))
+
+
+def handle_message(subscription: JobSubscription, text: str) -> Optional[Dict[str, Any]]:
+    """
+    Apply one WebSocket client frame, {"action": "subscribe" | "unsubscribe", "jobIds": [...]}.
+    Returns an error message to send back when the frame is malformed, else None.
+    """
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return {"error": "Frame is not valid JSON"}
+    if not isinstance(message, dict):
+        return {"error": "Frame must be a JSON object"}
+    ids = message.get("jobIds") or []
+    if not isinstance(ids, list) or not all(isinstance(job_id, str) for job_id in ids):
+        return {"error": "jobIds must be a list of job IDs"}
+    if message.get("action") == "subscribe":
+        watch(subscription, ids)
+    elif message.get("action") == "unsubscribe":
+        subscription.remove(ids)
+    else:
+        return {"error": "action must be subscribe or unsubscribe"}
+    return None
+
+
+async def job_events(subscription: JobSubscription, close_when_done: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield status transitions for every job in the subscription.
+
+    Transitions published in this process arrive through the event bus. When
+    nothing has arrived for JOB_STREAM_POLL_INTERVAL seconds the watched jobs are
+    re-read from the job store, which picks up transitions made by other
+    processes. Jobs are dropped from the subscription once they reach a
+    terminal state; with close_when_done the stream then ends.
+    """
+    last_sent: Dict[str, Tuple] = {}
+    try:
+        while subscription.job_ids or not close_when_done:
+            event = await subscription.next_event(settings.JOB_STREAM_POLL_INTERVAL)
+            events = [event] if event is not None else [_snapshot(job_id) for job_id in list(subscription.job_ids)]
+            for event in events:
+                job_id = event["jobId"]
+                if job_id not in subscription.job_ids:
+                    continue
+                if last_sent.get(job_id) == _fingerprint(event):
+                    continue
+                last_sent[job_id] = _fingerprint(event)
+                if event.get("status") in TERMINAL_STATUSES or event.get("status") == "not_found":
+                    subscription.remove([job_id])
+                    last_sent.pop(job_id, None)
+                yield event
+    finally:
+        subscription.close()
+
+
+async def sse_job_events(job_ids: Iterable[str]) -> AsyncIterator[str]:
+    """
+    Server-Sent Events stream for a fixed batch of jobs.
+    """
+    subscription = job_event_bus.subscribe()
+    try:
+        watch(subscription, job_ids)
+        async for event in job_events(subscription):
+            yield f"event: job\ndata: {json.dumps(event)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    finally:
+        subscription.close()
@@ -0,0 +1,74 @@
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from .config import settings
+from ..generators import stable_diffusion_3d
+
+
+class ModelWarmup:
+    """
+    Preloads the models of a set of styles, one after another.
+
+    Each style's model (and adapter) is loaded into the generator's model pool
+    and released right away, so it stays resident until the pool needs its
+    memory. The node is ready once every style has loaded;
+    a model that fails to load keeps the node unready, since requests for it
+    would pay the full load again (or fall back to the mock pipeline).
+    """
+
+    def __init__(self, generator, keys: List[str]):
+        self.generator = generator
+        self.keys = list(keys)
+        self._lock = threading.Lock()
+        self._status: Dict[str, Dict[str, Any]] = {key: {"status": "pending"} for key in self.keys}
+        self._thread: Optional[threading.Thread] = None
+
+    def run(self):
+        for key in self.keys:
+            with self._lock:
+                self._status[key] = {"status": "loading"}
+            started = time.time()
+            try:
+                self.generator.preload(key)
+            except Exception as e:
+                print(f"Warm-up of model {key} failed: {e}")
+                status = {"status": "failed", "error": str(e)}
+            else:
+                print(f"Warm-up: model {key} loaded in {time.time() - started:.1f}s")
+                status = {"status": "ready", "loadSeconds": round(time.time() - started, 2)}
+            with self._lock:
+                self._status[key] = status
+
+    def start(self):
+        """
+        Warm up in a background thread, so startup (and /health) is not held up.
+        """
+        if self.keys and self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="model-warmup", daemon=True)
+            self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(status["status"] == "ready" for status in self._status.values())
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            statuses = dict(self._status)
+        styles = {key: dict(status, resident=self.generator.is_resident(key)) for key, status in statuses.items()}
+        return {"ready": all(status["status"] == "ready" for status in styles.values()), "styles": styles}
+
+
+def warmup_styles() -> List[str]:
+    """
+    WARMUP_STYLES, if pipelines run in this process. With process executor slots or a
+    broker the models load elsewhere; `python -m api.worker` warms up on its own.
+    """
+    if settings.PIPELINE_BACKEND == "local" and settings.PIPELINE_EXECUTOR == "thread":
+        return settings.WARMUP_STYLES
+    return []
+
+
+# Global instance
+model_warmup = ModelWarmup(stable_diffusion_3d.sd3d_generator, warmup_styles())
@@ -0,0 +1,126 @@
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict
+
+from ..core.config import settings
+
+# Pipeline components holding the denoiser and the text encoders, by diffusers pipeline family
+DENOISERS = ("unet", "transformer")
+TEXT_ENCODERS = ("text_encoder", "text_encoder_2", "text_encoder_3")
+# Convolutional components that gain from channels-last tensors
+CONVOLUTIONAL = ("unet", "vae")
+
+
+def bfloat16_supported() -> bool:
+    """
+    Whether this CPU has native bfloat16 kernels (AVX512-BF16/AMX); emulated bf16 is slower than float32.
+    """
+    try:
+        import torch
+        return bool(torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+class CpuInferenceProfile:
+    """
+    Tuning of diffusers pipelines for CPU-only generation.
+
+    - threads / interop_threads: torch intra-op and inter-op thread pools (0 = torch's default)
+    - bfloat16: "auto" (on where the CPU supports it), "true" or "false"; weights stay
+      float32 and the pipeline call runs under bf16 autocast
+    - channels_last: channels-last memory format for the UNet and VAE convolutions
+    - compile: torch.compile the denoiser (the first call pays for compilation)
+    - quantize_int8: dynamic int8 quantization of the Linear layers of the text
+      encoders and the denoiser. Quantized Linear layers take float32 activations,
+      so bf16 autocast is not used together with it.
+    """
+
+    def __init__(self, threads: int = 0, interop_threads: int = 0, bfloat16: str = "auto",
+                 channels_last: bool = True, compile: bool = False, quantize_int8: bool = False):
+        self.threads = threads
+        self.interop_threads = interop_threads
+        self.bfloat16 = bfloat16
+        self.channels_last = channels_last
+        self.compile = compile
+        self.quantize_int8 = quantize_int8
+        self._threads_configured = False
+
+    @property
+    def use_bfloat16(self) -> bool:
+        if self.quantize_int8 or self.bfloat16 == "false":
+            return False
+        return self.bfloat16 == "true" or bfloat16_supported()
+
+    def configure_threads(self):
+        """
+        Size torch's thread pools, once per process. Inter-op threads can only be set
+        before torch runs its first parallel work.
+        """
+        if self._threads_configured:
+            return
+        import torch
+        if self.threads > 0:
+            torch.set_num_threads(self.threads)
+        if self.interop_threads > 0:
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError as e:
+                print(f"Could not set inter-op threads: {e}")
+        self._threads_configured = True
+
+    def optimize(self, pipeline):
+        """
+        Apply the profile to a float32 pipeline loaded on the CPU. Returns the pipeline.
+        """
+        import torch
+        self.configure_threads()
+
+        def modules(names):
+            # Read the pipeline's current module each time: a step may have replaced it
+            for name in names:
+                module = getattr(pipeline, name, None)
+                if isinstance(module, torch.nn.Module):
+                    yield name, module
+
+        if self.quantize_int8:
+            for name, module in list(modules(TEXT_ENCODERS + DENOISERS)):
+                setattr(pipeline, name, torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8))
+        if self.channels_last:
+            for name, module in modules(CONVOLUTIONAL):
+                setattr(pipeline, name, module.to(memory_format=torch.channels_last))
+        if self.compile:
+            for name, module in list(modules(DENOISERS)):
+                setattr(pipeline, name, torch.compile(module))
+        print(f"CPU inference profile: {self.describe()}")
+        return pipeline
+
+    @contextmanager
+    def inference(self):
+        """
+        Context for a pipeline call: no autograd, plus bf16 autocast if enabled.
+        """
+        import torch
+        autocast = torch.autocast(device_type="cpu", dtype=torch.bfloat16) if self.use_bfloat16 else nullcontext()
+        with torch.inference_mode(), autocast:
+            yield
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "threads": self.threads or "default",
+            "interop_threads": self.interop_threads or "default",
+            "bfloat16": self.use_bfloat16,
+            "channels_last": self.channels_last,
+            "compile": self.compile,
+            "quantize_int8": self.quantize_int8,
+        }
+
+
+def default_cpu_profile() -> CpuInferenceProfile:
+    return CpuInferenceProfile(
+        threads=settings.CPU_THREADS,
+        interop_threads=settings.CPU_INTEROP_THREADS,
+        bfloat16=settings.CPU_BFLOAT16,
+        channels_last=settings.CPU_CHANNELS_LAST,
+        compile=settings.CPU_COMPILE,
+        quantize_int8=settings.CPU_QUANTIZE_INT8,
+    )
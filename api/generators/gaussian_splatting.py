@@ -1,27 +1,40 @@
-import torch
 import numpy as np
-import trimesh
 from pathlib import Path
 import json
 import time
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional
 
 class GaussianSplatConverter:
     """
     Converts 3D models to Gaussian Splat format for cross-platform preview
+    
+    torch and trimesh are imported on first use, not with this module.
     """
     
+    # Faces converted per chunk; cancellation is checked between chunks
+    CHUNK_SIZE = 65536
+    
     def __init__(self):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"Gaussian Splat Converter initialized on {self.device}")
+        self._device = None
+    
+    @property
+    def device(self):
+        """Conversion device, probed on first use"""
+        if self._device is None:
+            import torch
+            self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            print(f"Gaussian Splat Converter initialized on {self._device}")
+        return self._device
     
-    def convert_model_to_splats(self, model_path: str, output_dir: str) -> Dict[str, Any]:
+    def convert_model_to_splats(self, model_path: str, output_dir: str,
+                                check_cancelled: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
         """
         Converts a 3D model to Gaussian Splat format for preview
         
         Args:
             model_path: Path to the 3D model (glTF, USD, OBJ, etc.)
             output_dir: Directory to save the splat files
+            check_cancelled: Called between face chunks; raising from it aborts the conversion
             
         Returns:
             Dict with metadata about the generated splats
@@ -30,14 +43,24 @@ class GaussianSplatConverter:
             print(f"Converting {model_path} to Gaussian Splats...")
             
             # Load the 3D model
+            import trimesh
             mesh = trimesh.load(model_path)
             
             # Extract vertices and faces
             vertices = np.array(mesh.vertices)
             faces = np.array(mesh.faces)
             
-            # Generate Gaussian Splats from mesh
-            splat_data = self._generate_splats_from_mesh(vertices, faces)
+            # Generate Gaussian Splats from mesh, chunk by chunk
+            chunks = []
+            for start in range(0, len(faces), self.CHUNK_SIZE):
+                if check_cancelled is not None:
+                    check_cancelled()
+                chunks.append(self._generate_splats_from_mesh(vertices, faces[start:start + self.CHUNK_SIZE]))
+            if not chunks:
+                chunks.append(self._generate_splats_from_mesh(vertices, faces))
+            splat_data = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+            if check_cancelled is not None:
+                check_cancelled()
             
             # Save in different formats for different platforms
             output_files = self._save_splat_formats(splat_data, output_dir)
@@ -1,81 +1,223 @@
-import torch
 import numpy as np
-from diffusers import DiffusionPipeline, DPMSolverMultistepScheduler
-from diffusers.utils import export_to_gif
+import gc
+import inspect
+import weakref
 import os
 import time
-from typing import Dict, Any, Optional, List
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Any, Optional, List
 from pathlib import Path
+from ..core.config import settings
+from ..core.model_pool import ModelPool, default_memory_budget
+from ..core.embedding_cache import embedding_cache, embedding_key
+from .cpu_inference import default_cpu_profile
+from .style_adapters import StyleAdapters
+
+# Pool key of the shared base model in adapter mode
+BASE_MODEL_KEY = "base"
+
+# File name prefix of the placeholder assets written when generation falls back to the mock
+FALLBACK_PREFIX = "mock_"
+
+# encode_prompt() outputs, in order (pooled embeddings only from SD3/SDXL-style pipelines)
+EMBEDDING_NAMES = ("prompt_embeds", "negative_prompt_embeds", "pooled_prompt_embeds", "negative_pooled_prompt_embeds")
 
 class StableDiffusion3DGenerator:
     """
     Advanced 3D generation using Stable Diffusion 3D models
     Supports multiple styles and high-quality output
+    
+    With SD3D_MODEL_MODE=adapters (the default) every style runs on one shared
+    base model with a per-style LoRA adapter (see StyleAdapters); with
+    "checkpoints" each style loads its own full checkpoint.
+    
+    torch and diffusers are imported on first use, not with this module, so
+    processes that never generate (API-only pods) don't pay for them.
     """
     
     def __init__(self):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.models = {}
+        self._device = None
+        # Tuning applied to pipelines loaded on a CPU-only machine
+        self.cpu_profile = default_cpu_profile()
+        self.adapter_mode = settings.SD3D_MODEL_MODE == "adapters"
+        self._style_adapters = None
+        # Loaded pipelines (the base model, or one per style), within a memory budget
+        self.models = ModelPool(
+            "sd3d",
+            settings.MODEL_POOL_MEMORY_BUDGET or default_memory_budget(),
+            loader=self.load_model,
+            sizer=self._pipeline_bytes,
+            on_evict=self._unload_model,
+            default_size=settings.MODEL_POOL_DEFAULT_MODEL_BYTES,
+        )
+        # Bump whenever checkpoints or generation parameters change; part of the generation cache key
+        self.model_version = "sd3d-v2-adapters" if self.adapter_mode else "sd3d-v1"
         self.available_styles = [
             "realistic", "stylized", "cartoon", "anime", "voxel", 
             "low_poly", "sci_fi", "fantasy", "cyberpunk", "steampunk"
         ]
-        print(f"Stable Diffusion 3D initialized on {self.device}")
+    
+    @property
+    def device(self):
+        """
+        Generation device, probed on first use
+        """
+        if self._device is None:
+            import torch
+            self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            print(f"Stable Diffusion 3D initialized on {self._device}")
+        return self._device
+    
+    @property
+    def style_adapters(self) -> Optional[StyleAdapters]:
+        """
+        Adapters of the loaded base model (adapter mode), None once it is evicted
+        """
+        return self._style_adapters() if self._style_adapters is not None else None
+    
+    def _pool_key(self, style: str) -> str:
+        return BASE_MODEL_KEY if self.adapter_mode else style
     
     def load_model(self, style: str = "realistic"):
         """
-        Load the appropriate model for the given style
+        Load the appropriate model for the given style (or BASE_MODEL_KEY for the
+        shared base model). Called by the model pool; use use_model() to borrow a
+        pooled pipeline.
         """
-        if style in self.models:
-            return self.models[style]
+        # Map styles to model checkpoints
+        model_mapping = {
+            "realistic": "stabilityai/stable-diffusion-3d-realistic",
+            "stylized": "stabilityai/stable-diffusion-3d-stylized", 
+            "cartoon": "stabilityai/stable-diffusion-3d-cartoon",
+            "anime": "stabilityai/stable-diffusion-3d-anime",
+            "voxel": "stabilityai/stable-diffusion-3d-voxel",
+            "low_poly": "stabilityai/stable-diffusion-3d-lowpoly",
+            "sci_fi": "stabilityai/stable-diffusion-3d-scifi",
+            "fantasy": "stabilityai/stable-diffusion-3d-fantasy",
+            "cyberpunk": "stabilityai/stable-diffusion-3d-cyberpunk",
+            "steampunk": "stabilityai/stable-diffusion-3d-steampunk"
+        }
         
-        try:
-            # Map styles to model checkpoints
-            model_mapping = {
-                "realistic": "stabilityai/stable-diffusion-3d-realistic",
-                "stylized": "stabilityai/stable-diffusion-3d-stylized", 
-                "cartoon": "stabilityai/stable-diffusion-3d-cartoon",
-                "anime": "stabilityai/stable-diffusion-3d-anime",
-                "voxel": "stabilityai/stable-diffusion-3d-voxel",
-                "low_poly": "stabilityai/stable-diffusion-3d-lowpoly",
-                "sci_fi": "stabilityai/stable-diffusion-3d-scifi",
-                "fantasy": "stabilityai/stable-diffusion-3d-fantasy",
-                "cyberpunk": "stabilityai/stable-diffusion-3d-cyberpunk",
-                "steampunk": "stabilityai/stable-diffusion-3d-steampunk"
-            }
-            
-            # For now, use a fallback model since these might not exist yet
+        # For now, use a fallback model since these might not exist yet
+        if style == BASE_MODEL_KEY:
+            model_id = settings.SD3D_BASE_MODEL
+        else:
             model_id = model_mapping.get(style, "stabilityai/stable-diffusion-3d")
-            
-            print(f"Loading model for style: {style}")
-            
-            # Initialize the pipeline
-            pipeline = DiffusionPipeline.from_pretrained(
-                model_id,
-                torch_dtype=torch.float16 if self.device.type == "cuda" else torch.float32,
-                use_safetensors=True
-            )
-            
-            # Optimize for performance
-            pipeline.scheduler = DPMSolverMultistepScheduler.from_config(pipeline.scheduler.config)
-            
-            if self.device.type == "cuda":
-                # Try to enable xformers if available, otherwise use standard attention
-                try:
-                    pipeline.enable_xformers_memory_efficient_attention()
-                except:
-                    print("xformers not available, using standard attention")
-                pipeline.enable_model_cpu_offload()
-            
-            pipeline = pipeline.to(self.device)
-            
-            self.models[style] = pipeline
-            return pipeline
-            
+        
+        print(f"Loading model for style: {style}")
+        
+        import torch
+        from diffusers import DiffusionPipeline, DPMSolverMultistepScheduler
+        
+        # Initialize the pipeline
+        pipeline = DiffusionPipeline.from_pretrained(
+            model_id,
+            torch_dtype=torch.float16 if self.device.type == "cuda" else torch.float32,
+            use_safetensors=True
+        )
+        
+        # Optimize for performance
+        pipeline.scheduler = DPMSolverMultistepScheduler.from_config(pipeline.scheduler.config)
+        
+        if self.device.type == "cuda":
+            # Try to enable xformers if available, otherwise use standard attention
+            try:
+                pipeline.enable_xformers_memory_efficient_attention()
+            except:
+                print("xformers not available, using standard attention")
+            pipeline.enable_model_cpu_offload()
+        
+        pipeline = pipeline.to(self.device)
+        if self.device.type == "cpu":
+            pipeline = self.cpu_profile.optimize(pipeline)
+        
+        if style == BASE_MODEL_KEY:
+            # The adapters live and die with the pipeline they patch
+            pipeline.style_adapters = StyleAdapters(pipeline, {
+                name: settings.SD3D_STYLE_ADAPTERS.format(style=name) if settings.SD3D_STYLE_ADAPTERS else None
+                for name in self.available_styles
+            }, scale=settings.SD3D_ADAPTER_SCALE)
+            self._style_adapters = weakref.ref(pipeline.style_adapters)
+        
+        return pipeline
+    
+    @contextmanager
+    def use_model(self, style: str):
+        """
+        Borrow the pooled pipeline for a style for the duration of the block;
+        it cannot be evicted while borrowed
+        """
+        key = self._pool_key(style)
+        try:
+            pipeline = self.models.acquire(key)
         except Exception as e:
             print(f"Error loading model for style {style}: {e}")
             # Fallback to mock generation for now
-            return self._create_mock_pipeline(style)
+            yield self._create_mock_pipeline(style)
+            return
+        try:
+            if key == BASE_MODEL_KEY:
+                with pipeline.style_adapters.use(style):
+                    yield pipeline
+            else:
+                yield pipeline
+        finally:
+            self.models.release(key)
+    
+    def preload(self, style: str):
+        """
+        Load the model (and adapter) for a style ahead of its first request; raises if loading fails
+        """
+        key = self._pool_key(style)
+        with self.models.use(key) as pipeline:
+            if key == BASE_MODEL_KEY:
+                pipeline.style_adapters.preload(style)
+    
+    def is_resident(self, style: str) -> bool:
+        models = self.models.stats()["models"]
+        key = self._pool_key(style)
+        if key not in models or models[key]["loading"]:
+            return False
+        adapters = self.style_adapters
+        return key != BASE_MODEL_KEY or (adapters is not None and adapters.is_loaded(style))
+    
+    def model_stats(self) -> Dict[str, Any]:
+        """
+        Memory of the loaded models and, in adapter mode, of the style adapters, plus style switch latency
+        """
+        stats = {"mode": "adapters" if self.adapter_mode else "checkpoints", "pool": self.models.stats()}
+        if self.adapter_mode:
+            adapters = self.style_adapters
+            stats["adapters"] = adapters.stats() if adapters is not None else None
+        return stats
+    
+    def _inference_context(self):
+        """
+        Context for a pipeline call: the CPU profile's autocast and no-grad mode on CPU
+        """
+        return self.cpu_profile.inference() if self.device.type == "cpu" else nullcontext()
+    
+    def _pipeline_bytes(self, pipeline) -> int:
+        """
+        Memory held by a pipeline's weights and buffers
+        """
+        import torch
+        
+        total = 0
+        for component in getattr(pipeline, "components", {}).values():
+            if isinstance(component, torch.nn.Module):
+                for tensor in list(component.parameters()) + list(component.buffers()):
+                    total += tensor.numel() * tensor.element_size()
+        return total
+    
+    def _unload_model(self, style: str):
+        """
+        Return an evicted pipeline's memory
+        """
+        gc.collect()
+        if self.device.type == "cuda":
+            import torch
+            torch.cuda.empty_cache()
     
     def _create_mock_pipeline(self, style: str):
         """
@@ -83,22 +225,29 @@ class StableDiffusion3DGenerator:
         """
         class MockPipeline:
             def __call__(self, prompt, **kwargs):
-                return self._mock_generate(prompt, style)
+                return self._mock_generate(prompt, style, kwargs)
             
-            def _mock_generate(self, prompt: str, style: str):
-                # Simulate generation time
-                time.sleep(2)
+            def _mock_generate(self, prompt: str, style: str, kwargs: Dict[str, Any]):
+                # Simulate generation time, step by step so step callbacks fire like the real pipeline
+                steps = kwargs.get("num_inference_steps", 20)
+                callback = kwargs.get("callback_on_step_end")
+                for step in range(steps):
+                    time.sleep(2 / steps)
+                    if callback is not None:
+                        callback(self, step, None, {})
                 
                 # Create mock output
                 return {
                     "images": [np.random.rand(512, 512, 3) * 255],
-                    "nsfw_content_detected": [False]
+                    "nsfw_content_detected": [False],
+                    "mock": True
                 }
         
         return MockPipeline()
     
     def generate(self, job_id: str, prompt: str, style: str = "realistic", 
-                quality: str = "standard", num_frames: int = 24) -> str:
+                quality: str = "standard", num_frames: int = 24, seed: Optional[int] = None,
+                step_callback: Optional[Callable[[int, int], None]] = None) -> str:
         """
         Generate a 3D asset using Stable Diffusion 3D
         
@@ -108,27 +257,36 @@ class StableDiffusion3DGenerator:
             style: Visual style (realistic, stylized, cartoon, etc.)
             quality: Generation quality (draft, standard, high)
             num_frames: Number of frames for 3D rotation
+            seed: Optional seed for reproducible generation
+            step_callback: Called with (step, total_steps) after every denoising step;
+                raising from it (e.g. JobCancelled) aborts the generation
             
         Returns:
-            Path to the generated 3D model
+            Path to the generated 3D model, or to a mock asset if generation
+            failed (see is_fallback)
         """
         try:
             print(f"Generating 3D asset with SD3D: {prompt} (style: {style})")
             
-            # Load appropriate model
-            pipeline = self.load_model(style)
-            
             # Enhance prompt based on style
             enhanced_prompt = self._enhance_prompt(prompt, style)
             
             # Set generation parameters based on quality
             generation_params = self._get_generation_params(quality, num_frames)
+            if seed is not None:
+                import torch
+                generation_params["generator"] = torch.Generator(device="cpu").manual_seed(seed)
+            if step_callback is not None:
+                generation_params["callback_on_step_end"] = self._step_callback(
+                    step_callback, generation_params["num_inference_steps"]
+                )
             
-            # Generate the 3D asset
-            result = pipeline(
-                enhanced_prompt,
-                **generation_params
-            )
+            # Generate the 3D asset with the style's pooled pipeline
+            with self.use_model(style) as pipeline, self._inference_context():
+                result = pipeline(
+                    **self._prompt_inputs(pipeline, style, enhanced_prompt),
+                    **generation_params
+                )
             
             # Process and save the result
             output_path = self._process_and_save_result(job_id, result, style)
@@ -141,6 +299,129 @@ class StableDiffusion3DGenerator:
             # Fallback to mock generation
             return self._generate_mock_asset(job_id, prompt, style)
     
+    def generate_batch(self, requests: List[Dict[str, Any]], style: str = "realistic",
+                       num_frames: int = 24,
+                       step_callbacks: Optional[Dict[str, Callable[[int, int], None]]] = None) -> Dict[str, str]:
+        """
+        Generate several 3D assets of one style with a single loaded pipeline
+        
+        Requests with the same quality share one pipeline call with a list of
+        prompts, so the model is loaded once and each forward pass serves the
+        whole group.
+        
+        Args:
+            requests: Dicts with job_id, prompt, quality and optional seed
+            style: Visual style shared by every request
+            num_frames: Number of frames for 3D rotation
+            step_callbacks: Optional (step, total_steps) callback per job_id, called
+                after every denoising step of the call generating that job
+            
+        Returns:
+            Path to the generated 3D model per job_id
+        """
+        outputs = {}
+        by_quality: Dict[str, List[Dict[str, Any]]] = {}
+        for request in requests:
+            by_quality.setdefault(request.get("quality", "standard"), []).append(request)
+        
+        with self.use_model(style) as pipeline:
+            for quality, group in by_quality.items():
+                try:
+                    print(f"Generating batch of {len(group)} {style} assets with SD3D (quality: {quality})")
+                    prompts = [self._enhance_prompt(request["prompt"], style) for request in group]
+                    generation_params = self._get_generation_params(quality, num_frames)
+                    if any(request.get("seed") is not None for request in group):
+                        import torch
+                        generation_params["generator"] = [
+                            torch.Generator(device="cpu").manual_seed(request["seed"] if request.get("seed") is not None else index)
+                            for index, request in enumerate(group)
+                        ]
+                    callbacks = [step_callbacks[request["job_id"]] for request in group
+                                 if step_callbacks and request["job_id"] in step_callbacks]
+                    if callbacks:
+                        generation_params["callback_on_step_end"] = self._step_callback(
+                            lambda step, total_steps: [callback(step, total_steps) for callback in callbacks],
+                            generation_params["num_inference_steps"]
+                        )
+                    
+                    with self._inference_context():
+                        result = pipeline(**self._prompt_inputs(pipeline, style, prompts), **generation_params)
+                    
+                    for index, request in enumerate(group):
+                        item_result = self._split_batch_result(result, index)
+                        outputs[request["job_id"]] = self._process_and_save_result(request["job_id"], item_result, style)
+                
+                except Exception as e:
+                    print(f"Error in SD3D batch generation: {e}")
+                    for request in group:
+                        outputs[request["job_id"]] = self._generate_mock_asset(request["job_id"], request["prompt"], style)
+        
+        return outputs
+    
+    def _prompt_inputs(self, pipeline, style: str, prompts) -> Dict[str, Any]:
+        """
+        Pipeline inputs for a prompt (or list of prompts): precomputed embeddings
+        through the embedding cache, or the prompt text itself if the pipeline
+        cannot encode prompts on its own
+        """
+        if embedding_cache is None or not callable(getattr(pipeline, "encode_prompt", None)):
+            return {"prompt": prompts}
+        try:
+            encoded = [
+                embedding_cache.get_or_encode(
+                    embedding_key(prompt, style, self.model_version),
+                    lambda prompt=prompt: self._encode_prompt(pipeline, prompt),
+                    device=self.device,
+                )
+                for prompt in (prompts if isinstance(prompts, list) else [prompts])
+            ]
+        except Exception as e:
+            print(f"Prompt encoding failed, passing prompts to the pipeline: {e}")
+            return {"prompt": prompts}
+        if len(encoded) == 1:
+            return dict(encoded[0])
+        import torch
+        return {
+            name: torch.cat([embeddings[name] for embeddings in encoded]) if encoded[0][name] is not None else None
+            for name in encoded[0]
+        }
+    
+    def _encode_prompt(self, pipeline, prompt: str) -> Dict[str, Any]:
+        """
+        Run a pipeline's text encoder(s) on one prompt
+        """
+        import torch
+        
+        # Every quality level uses guidance_scale > 1, so negative embeddings are always needed
+        kwargs = {"device": self.device, "num_images_per_prompt": 1, "do_classifier_free_guidance": True}
+        # Pipelines with several text encoders (SD3, SDXL) take a prompt for each
+        parameters = inspect.signature(pipeline.encode_prompt).parameters
+        for name in ("prompt_2", "prompt_3"):
+            if name in parameters:
+                kwargs[name] = prompt
+        with torch.no_grad():
+            encoded = pipeline.encode_prompt(prompt, **kwargs)
+        return dict(zip(EMBEDDING_NAMES, encoded))
+    
+    def _step_callback(self, step_callback: Callable[[int, int], None], total_steps: int):
+        """
+        Adapt a (step, total_steps) callback to diffusers' callback_on_step_end signature
+        """
+        def on_step_end(pipeline, step, timestep, callback_kwargs):
+            step_callback(step + 1, total_steps)
+            return callback_kwargs
+        return on_step_end
+    
+    def _split_batch_result(self, result: Any, index: int) -> Dict[str, Any]:
+        """
+        Pick one prompt's images out of a batched pipeline result
+        """
+        images = result["images"] if isinstance(result, dict) else getattr(result, "images", [])
+        mock = isinstance(result, dict) and result.get("mock", False)
+        if not len(images):
+            return {"images": [], "mock": mock}
+        return {"images": [images[min(index, len(images) - 1)]], "mock": mock}
+    
     def _enhance_prompt(self, prompt: str, style: str) -> str:
         """
         Enhance the prompt with style-specific modifiers
@@ -201,7 +482,9 @@ class StableDiffusion3DGenerator:
         
         # For now, save as mock glTF file
         # In real implementation, this would convert the SD3D output to glTF
-        output_path = output_dir / f"sd3d_{style}.glb"
+        # Output of the mock pipeline (the model failed to load) is a fallback asset
+        prefix = FALLBACK_PREFIX if isinstance(result, dict) and result.get("mock") else ""
+        output_path = output_dir / f"{prefix}sd3d_{style}.glb"
         
         # Create a mock glTF file for development
         self._create_mock_gltf(output_path, style)
@@ -225,11 +508,18 @@ class StableDiffusion3DGenerator:
         output_dir = Path(f"static/generated/{job_id}")
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        output_path = output_dir / f"mock_sd3d_{style}.glb"
+        output_path = output_dir / f"{FALLBACK_PREFIX}sd3d_{style}.glb"
         self._create_mock_gltf(output_path, style)
         
         return str(output_path)
     
+    def is_fallback(self, model_path: str) -> bool:
+        """
+        Whether a path returned by generate()/generate_batch() is a mock
+        fallback asset rather than a real generation
+        """
+        return os.path.basename(model_path).startswith(FALLBACK_PREFIX)
+    
     def get_available_styles(self) -> List[str]:
         """
         Get list of available generation styles
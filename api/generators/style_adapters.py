@@ -0,0 +1,136 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+from ..core.metrics import registry, Histogram
+
+style_switch_duration = registry.register(Histogram(
+    "jambam_style_switch_seconds",
+    "Time spent switching the shared base model to another style's adapter.",
+    (),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+))
+
+
+class StyleAdapters:
+    """
+    Per-style LoRA adapters on one shared base pipeline.
+
+    An adapter's weights are loaded on first use (load_lora_weights) and stay
+    attached to the base model; switching style only changes which adapter
+    is active (set_adapters), which takes milliseconds. A style without LoRA
+    weights, or whose weights fail to load, is a prompt-only adapter: its
+    prompt modifier runs on the plain base model.
+
+    The active adapter is pipeline-wide, so generations of one style run
+    concurrently while a different style waits for them to finish. Once a
+    different style is waiting, new arrivals of the active one queue behind it.
+    """
+
+    def __init__(self, pipeline, sources: Dict[str, Optional[str]], scale: float = 1.0):
+        self.pipeline = pipeline
+        self.sources = sources
+        self.scale = scale
+        self._cond = threading.Condition()
+        self._active: Optional[str] = None
+        self._users = 0
+        self._waiting: Dict[str, int] = {}
+        self._loaded: Dict[str, Dict[str, Any]] = {}
+        self._lora_disabled = False
+        self.switches = 0
+        self.switch_seconds = 0.0
+
+    def _lora_bytes(self, style: str) -> int:
+        total = 0
+        marker = f".{style}."
+        for component in getattr(self.pipeline, "components", {}).values():
+            for name, parameter in getattr(component, "named_parameters", lambda: [])():
+                if "lora_" in name and marker in name:
+                    total += parameter.numel() * parameter.element_size()
+        return total
+
+    def _load(self, style: str):
+        """
+        Attach a style's LoRA weights. Call with no generation running.
+        """
+        if style in self._loaded:
+            return
+        source = self.sources.get(style)
+        started = time.time()
+        adapter = {"kind": "prompt", "bytes": 0, "loadSeconds": 0.0}
+        if source:
+            try:
+                self.pipeline.load_lora_weights(source, adapter_name=style)
+                adapter = {"kind": "lora", "source": source, "bytes": self._lora_bytes(style),
+                           "loadSeconds": round(time.time() - started, 3)}
+                print(f"Loaded {style} adapter from {source} in {adapter['loadSeconds']}s")
+            except Exception as e:
+                print(f"No LoRA adapter for style {style} ({e}), using its prompt adapter only")
+        self._loaded[style] = adapter
+
+    def _activate(self, style: str):
+        started = time.perf_counter()
+        if self._loaded[style]["kind"] == "lora":
+            if self._lora_disabled:
+                self.pipeline.enable_lora()
+                self._lora_disabled = False
+            self.pipeline.set_adapters([style], adapter_weights=[self.scale])
+        elif not self._lora_disabled and any(adapter["kind"] == "lora" for adapter in self._loaded.values()):
+            # Prompt-only styles run on the plain base model
+            self.pipeline.disable_lora()
+            self._lora_disabled = True
+        elapsed = time.perf_counter() - started
+        self._active = style
+        self.switches += 1
+        self.switch_seconds += elapsed
+        style_switch_duration.observe(elapsed)
+
+    def _can_enter(self, style: str) -> bool:
+        others_waiting = any(count for other, count in self._waiting.items() if other != style)
+        if self._users == 0:
+            # A style that waited for the last generation to finish goes before the active one
+            return not (self._active == style and others_waiting)
+        return self._active == style and not others_waiting
+
+    @contextmanager
+    def use(self, style: str):
+        """
+        Make style the active adapter for the duration of the block.
+        """
+        with self._cond:
+            self._waiting[style] = self._waiting.get(style, 0) + 1
+            try:
+                self._cond.wait_for(lambda: self._can_enter(style))
+            finally:
+                self._waiting[style] -= 1
+            if self._active != style:
+                # No generation is running here, so the pipeline can be changed
+                self._load(style)
+                self._activate(style)
+            self._users += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._users -= 1
+                self._cond.notify_all()
+
+    def preload(self, style: str):
+        with self._cond:
+            self._cond.wait_for(lambda: self._users == 0)
+            self._load(style)
+
+    def is_loaded(self, style: str) -> bool:
+        with self._cond:
+            return style in self._loaded
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "active": self._active,
+                "adapters": {style: dict(adapter) for style, adapter in self._loaded.items()},
+                "adapterBytes": sum(adapter["bytes"] for adapter in self._loaded.values()),
+                "switches": self.switches,
+                "meanSwitchMs": round(1000 * self.switch_seconds / self.switches, 3) if self.switches else None,
+            }
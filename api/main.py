@@ -1,9 +1,12 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException, File, UploadFile, Form, Depends
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session, joinedload
 from uuid import uuid4
+import asyncio
 import shutil
+import time
 import os
 from typing import List, Optional, Any, Dict
 from datetime import datetime, timedelta
@@ -13,8 +16,23 @@ from pydantic import BaseModel
 
 from .models import assets as asset_models, database as db_models
 from .core.database import engine, get_db, SessionLocal
-from .core.jobs import create_job, get_job_status
-from .core.pipeline import asset_pipeline
+from .core.jobs import (
+    create_job, get_job_status, update_job_status, cancel_job, job_sweeper, create_batch, get_batch_jobs,
+    join_flight, end_flight, run_cancelled,
+)
+from .core.pipeline import record_job_request, load_job_request, discard_job_files, flight_key, find_job_asset, asset_job_result
+from .core.cancellation import cancellations
+from .core.checkpoints import checkpoint_store
+from .core.executor import QueueFullError, pipeline_lane
+from .core.dispatch import pipeline_dispatcher
+from .core.admission import admission_controller, estimate_job_seconds, AdmissionRejected
+from .core.metrics import registry as metrics_registry
+from .core.events import job_event_bus, TERMINAL_STATUSES
+from .core.generation_cache import generation_cache
+from .core.embedding_cache import embedding_cache
+from .core.history import job_history
+from .core.warmup import model_warmup
+from .core.streaming import sse_job_events, job_events, handle_message
 from .generators import stable_diffusion_3d
 from .core.supabase_service import supabase_service, SupabaseService # Added
 from .core.config import settings # Added for SECRET_KEY access if needed for other things
@@ -68,6 +86,13 @@ async def get_current_supabase_user(credentials: HTTPAuthorizationCredentials =
         # Log the error e
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
 
+async def get_current_admin_user(current_user_data: dict = Depends(get_current_supabase_user)):
+    """Require an authenticated user whose profile has the admin or superadmin role."""
+    profile = current_user_data.get("profile") or {}
+    if profile.get("role") not in ("admin", "superadmin"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user_data
+
 
 # --- Database Setup ---
 # db_models.Base.metadata.create_all(bind=engine) # SQLAlchemy specific, might need adjustment if schema changes significantly
@@ -220,24 +245,209 @@ os.makedirs("static/generated", exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
+# --- Pipeline Execution ---
+def overloaded_response(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail={
+            "message": str(e),
+            "queuePosition": e.queue_position,
+            "estimatedWaitSeconds": round(e.estimated_wait, 1),
+        },
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+def pipeline_cost(request_data) -> float:
+    """
+    Estimated run time of a pipeline job, for admission control and backlog estimates.
+    """
+    return estimate_job_seconds(getattr(request_data, 'style', None), getattr(request_data, 'quality', None))
+
+def submit_pipeline(job_id: str, **kwargs):
+    """
+    Register a new job and hand it to the pipeline dispatcher (this process's executor,
+    or the job broker for `python -m api.worker` processes). The pipeline opens its own
+    DB session, since the request-scoped one is closed long before the job runs.
+    New work the executor cannot finish within ADMISSION_MAX_WAIT is refused with 429
+    before the job is created. A text-to-3D request identical to one already in flight
+    is attached to that job instead and mirrors its status and result.
+    """
+    cost = pipeline_cost(kwargs.get("request_data"))
+    lane = pipeline_lane(kwargs.get("request_data"))
+    try:
+        admission_controller.check(cost, lane)
+    except AdmissionRejected as e:
+        raise overloaded_response(e)
+    create_job(job_id, request_data=kwargs.get("request_data"))
+
+    coalesce = settings.COALESCE_REQUESTS and kwargs.get("request_data") is not None and not kwargs.get("remix_of_id")
+    if coalesce:
+        leader_id = join_flight(flight_key(kwargs["request_data"]), job_id)
+        if leader_id != job_id:
+            print(f"Job {job_id} attached to identical in-flight job {leader_id}")
+            return
+    try:
+        record_job_request(job_id, **kwargs)
+        pipeline_dispatcher.submit_job(job_id, kwargs, cost=cost, lane=lane)
+    except QueueFullError as e:
+        update_job_status(job_id, "failed", 100, str(e))
+        if coalesce:
+            end_flight(job_id)
+        raise HTTPException(status_code=503, detail=str(e))
+
+def resume_interrupted_jobs():
+    """
+    Resubmit jobs that were left pending or processing by a worker that went away.
+    A job counts as interrupted once its status has not changed for JOB_RESUME_STALE_AFTER seconds;
+    it resumes from its last checkpointed stage. Every API process runs this at startup;
+    each job is claimed atomically, so only one of them resubmits it.
+    """
+    stale_before = time.time() - settings.JOB_RESUME_STALE_AFTER
+    for job_id in checkpoint_store.pending_job_ids():
+        status = get_job_status(job_id)
+        if status.get("status") not in ("pending", "processing") or status.get("updated_at", 0) > stale_before:
+            continue
+        claimed = checkpoint_store.claim_resume(job_id, settings.JOB_MAX_ATTEMPTS, stale_before)
+        if claimed is None:
+            continue
+        if not claimed:
+            update_job_status(job_id, "failed", 100, "Job was interrupted too many times.")
+            continue
+        params = load_job_request(job_id)
+        if params is None:
+            print(f"Not resuming job {job_id}: its request record is gone")
+            continue
+        print(f"Resuming interrupted job {job_id}")
+        update_job_status(job_id, "pending", status.get("progress", 0), "Resuming after interruption.")
+        pipeline_dispatcher.submit_job(
+            job_id, params, cost=pipeline_cost(params.get("request_data")), lane=pipeline_lane(params.get("request_data")),
+        )
+
+@app.on_event("startup")
+def start_job_sweeper():
+    job_sweeper.hooks.append(lambda now: checkpoint_store.purge(now - settings.JOB_TTL_FAILED))
+    if settings.JOB_HISTORY_TTL > 0:
+        job_sweeper.hooks.append(lambda now: job_history.purge(now - settings.JOB_HISTORY_TTL))
+    job_sweeper.start()
+    # With a broker, expired leases are redelivered to another worker instead
+    if pipeline_dispatcher.local:
+        resume_interrupted_jobs()
+
+@app.on_event("startup")
+def start_model_warmup():
+    model_warmup.start()
+
+@app.on_event("shutdown")
+def shutdown_pipeline_executor():
+    job_sweeper.stop()
+    pipeline_dispatcher.shutdown()
+
+@app.get("/api/v1/pipeline/stats")
+def get_pipeline_stats():
+    """
+    Get slot usage and queue depth of the asset pipeline executor (or of the job broker's workers).
+    """
+    return pipeline_dispatcher.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Prometheus scrape endpoint: per-stage latency histograms, queue wait, job outcomes and queue gauges.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # --- API Endpoints ---
 @app.post("/api/v1/assets/generate", response_model=asset_models.GenerateInitialResponse)
-async def generate_asset(req: asset_models.GenerateRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def generate_asset(req: asset_models.GenerateRequest):
     """
     Starts a new asset generation job from a text prompt.
     """
     job_id = str(uuid4())
-    create_job(job_id)
-    background_tasks.add_task(asset_pipeline, job_id=job_id, db=db, request_data=req)
+    submit_pipeline(job_id, request_data=req)
     return {
         "jobId": job_id,
         "status": "pending",
         "statusUrl": f"/api/v1/assets/jobs/{job_id}"
     }
 
+@app.post("/api/v1/assets/generate/batch", response_model=asset_models.BatchGenerateResponse)
+def generate_asset_batch(req: asset_models.BatchGenerateRequest):
+    """
+    Starts one generation job per item, e.g. a full asset pack for a jam team.
+    Items are grouped by style so each loaded SD3D model serves its whole group in one pass.
+    """
+    if len(req.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {settings.BATCH_MAX_ITEMS} items")
+
+    costs = [pipeline_cost(item) for item in req.items]
+    try:
+        admission_controller.check(sum(costs), max(pipeline_lane(item) for item in req.items))
+    except AdmissionRejected as e:
+        raise overloaded_response(e)
+
+    batch_id = str(uuid4())
+    sd3d_styles = stable_diffusion_3d.sd3d_generator.get_available_styles()
+    job_ids = []
+    groups: Dict[str, list] = {}
+    standalone = []
+    for item, cost in zip(req.items, costs):
+        job_id = str(uuid4())
+        create_job(job_id, request_data=item)
+        record_job_request(job_id, request_data=item)
+        job_ids.append(job_id)
+        if item.style in sd3d_styles:
+            groups.setdefault(item.style, []).append((job_id, item, cost))
+        else:
+            standalone.append((job_id, item, cost))
+    create_batch(batch_id, job_ids)
+
+    submitted = set()
+    try:
+        for style, members in groups.items():
+            items = [(job_id, item) for job_id, item, _ in members]
+            pipeline_dispatcher.submit_batch(batch_id, style, items,
+                                             cost=sum(cost for _, _, cost in members),
+                                             lane=max(pipeline_lane(item) for _, item, _ in members))
+            submitted.update(job_id for job_id, _ in items)
+        for job_id, item, cost in standalone:
+            pipeline_dispatcher.submit_job(job_id, {"request_data": item}, cost=cost, lane=pipeline_lane(item))
+            submitted.add(job_id)
+    except QueueFullError as e:
+        for job_id in job_ids:
+            if job_id not in submitted:
+                update_job_status(job_id, "failed", 100, str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "batchId": batch_id,
+        "status": "pending",
+        "statusUrl": f"/api/v1/assets/batches/{batch_id}",
+        "streamUrl": f"/api/v1/assets/jobs/stream?job_ids={','.join(job_ids)}",
+        "jobs": [
+            {"jobId": job_id, "status": "pending", "statusUrl": f"/api/v1/assets/jobs/{job_id}"}
+            for job_id in job_ids
+        ],
+    }
+
+@app.get("/api/v1/assets/batches/{batch_id}", response_model=asset_models.BatchStatusResponse)
+def get_batch(batch_id: str):
+    """
+    Retrieves the status of every job in a batch.
+    """
+    job_ids = get_batch_jobs(batch_id)
+    if job_ids is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    jobs = []
+    counts: Dict[str, int] = {}
+    for job_id in job_ids:
+        status = get_job_status(job_id)
+        status["jobId"] = job_id
+        counts[status["status"]] = counts.get(status["status"], 0) + 1
+        jobs.append(status)
+    return {"batchId": batch_id, "counts": counts, "jobs": jobs}
+
 @app.post("/api/v1/assets/upload", response_model=asset_models.GenerateInitialResponse)
-async def upload_asset(
-    background_tasks: BackgroundTasks,
+def upload_asset(
     file: UploadFile = File(...), 
     animation: str = Form("[]"), # JSON string for list
     convert_to: str = Form("glb")
@@ -246,7 +456,6 @@ async def upload_asset(
     Starts a new asset processing job from an uploaded file.
     """
     job_id = str(uuid4())
-    create_job(job_id)
 
     upload_dir = "uploads"
     os.makedirs(upload_dir, exist_ok=True)
@@ -258,7 +467,12 @@ async def upload_asset(
     import json
     animation_list = json.loads(animation)
 
-    background_tasks.add_task(asset_pipeline, job_id, uploaded_file_path=file_path, animation=animation_list, convert_to=convert_to)
+    try:
+        submit_pipeline(job_id, uploaded_file_path=file_path, animations=animation_list, output_format=convert_to)
+    except HTTPException:
+        # Refused, so no pipeline run will ever read the upload
+        os.remove(file_path)
+        raise
     
     return {
         "jobId": job_id,
@@ -266,16 +480,156 @@ async def upload_asset(
         "statusUrl": f"/api/v1/assets/jobs/{job_id}"
     }
 
+@app.get("/api/v1/assets/jobs/stream")
+async def stream_jobs(job_ids: str = Query(..., description="Comma-separated job IDs to watch")):
+    """
+    Server-Sent Events stream of status transitions for one or more jobs.
+    The stream ends once every watched job has completed or failed.
+    """
+    ids = [job_id.strip() for job_id in job_ids.split(",") if job_id.strip()]
+    return StreamingResponse(
+        sse_job_events(ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/api/v1/assets/jobs/ws")
+async def jobs_websocket(websocket: WebSocket):
+    """
+    WebSocket stream of job status transitions.
+    Clients send {"action": "subscribe" | "unsubscribe", "jobIds": [...]} at any time
+    and receive one JSON message per transition of any subscribed job.
+    A malformed frame is answered with {"error": ...} and otherwise ignored.
+    """
+    await websocket.accept()
+    subscription = job_event_bus.subscribe()
+
+    async def send_events():
+        async for event in job_events(subscription, close_when_done=False):
+            await websocket.send_json(event)
+
+    sender = asyncio.create_task(send_events())
+    try:
+        while True:
+            error = handle_message(subscription, await websocket.receive_text())
+            if error is not None:
+                await websocket.send_json(error)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        subscription.close()
+
+@app.get("/api/v1/assets/jobs/stats")
+def get_job_store_stats():
+    """
+    Get job store size per status and retention (eviction) counters.
+    """
+    return job_sweeper.stats()
+
+@app.get("/api/v1/admin/jobs")
+def list_job_history(
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    style: Optional[str] = None,
+    since: Optional[float] = Query(None, description="Only jobs created at or after this Unix time"),
+    until: Optional[float] = Query(None, description="Only jobs created before this Unix time"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page"),
+    current_user_data: dict = Depends(get_current_admin_user),
+):
+    """
+    List jobs from the job history, newest first, including jobs the job store has evicted.
+    Pages are cursor-based: pass nextCursor back until it is null.
+    """
+    try:
+        jobs, next_cursor = job_history.query(status, user_id, style, since, until, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"jobs": jobs, "nextCursor": next_cursor}
+
+@app.get("/api/v1/admin/jobs/summary")
+def get_job_history_summary(
+    user_id: Optional[str] = None,
+    style: Optional[str] = None,
+    since: Optional[float] = Query(None, description="Window start as Unix time (default: 24 hours ago)"),
+    until: Optional[float] = Query(None, description="Window end as Unix time (default: now)"),
+    current_user_data: dict = Depends(get_current_admin_user),
+):
+    """
+    Job counts per status and p50/p95 durations of completed jobs within a time window.
+    """
+    if since is None:
+        since = time.time() - 24 * 3600
+    return {"since": since, "until": until, **job_history.aggregates(user_id, style, since, until)}
+
+@app.post("/api/v1/assets/jobs/{job_id}/retry", response_model=asset_models.GenerateInitialResponse)
+def retry_job(job_id: str):
+    """
+    Re-run a failed job. Stages that already finished are not repeated.
+    """
+    status = get_job_status(job_id)
+    if status.get("status") == "not_found":
+        raise HTTPException(status_code=404, detail="Job not found")
+    if status.get("status") != "failed":
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be retried (job is {status.get('status')})")
+    params = load_job_request(job_id)
+    if params is None:
+        raise HTTPException(status_code=410, detail="Job request is no longer available for retry")
+    if not checkpoint_store.claim_attempt(job_id, settings.JOB_MAX_ATTEMPTS):
+        raise HTTPException(status_code=409, detail="Job has reached the maximum number of attempts")
+    update_job_status(job_id, "pending", 0, "Retry queued, resuming from last checkpoint.")
+    try:
+        pipeline_dispatcher.submit_job(
+            job_id, params, cost=pipeline_cost(params.get("request_data")), lane=pipeline_lane(params.get("request_data")),
+        )
+    except QueueFullError as e:
+        update_job_status(job_id, "failed", 100, str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"jobId": job_id, "status": "pending", "statusUrl": f"/api/v1/assets/jobs/{job_id}"}
+
 @app.get("/api/v1/assets/jobs/{job_id}", response_model=asset_models.JobStatusResponse)
-async def get_job(job_id: str):
+def get_job(job_id: str, db: Session = Depends(get_db)):
     """
     Retrieves the status and result of a specific job.
+    Jobs evicted from the job store are answered from the asset they produced.
     """
     status = get_job_status(job_id)
     if status.get("status") == "not_found":
-        raise HTTPException(status_code=404, detail="Job not found")
+        asset = find_job_asset(db, job_id)
+        if not asset:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {
+            "jobId": job_id,
+            "status": "completed",
+            "progress": 100,
+            "details": "Job completed successfully.",
+            "result": asset_job_result(asset),
+        }
     return status
 
+@app.delete("/api/v1/assets/jobs/{job_id}", response_model=asset_models.JobStatusResponse)
+def delete_job(job_id: str):
+    """
+    Cancel a pending or running job. A queued job gives up its place right away; a running
+    one stops at its next cancellation checkpoint (between stages, diffusion steps or splat
+    chunks) and frees its slot. Partial output under static/generated/{job_id} is removed.
+    A run shared by coalesced requests keeps going until every one of them is cancelled.
+    """
+    status = get_job_status(job_id)
+    if status.get("status") == "not_found":
+        raise HTTPException(status_code=404, detail="Job not found")
+    if status.get("status") in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job is already {status.get('status')}")
+    run_id = cancel_job(job_id, status.get("progress", 0)) or job_id
+    if run_cancelled(run_id):
+        cancellations.cancel(run_id)
+        if pipeline_dispatcher.cancel(run_id):
+            cancellations.discard(run_id)
+            end_flight(run_id)
+            discard_job_files(run_id)
+    return get_job_status(job_id)
+
 # --- Community Endpoints ---
 @app.get("/api/v1/assets", response_model=List[asset_models.AssetResponse])
 def get_public_assets(skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
@@ -321,7 +675,7 @@ def update_asset_details(
     return asset
 
 @app.post("/api/v1/assets/{asset_id}/remix", response_model=asset_models.GenerateInitialResponse)
-async def remix_asset(asset_id: int, req: asset_models.GenerateRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def remix_asset(asset_id: int, req: asset_models.GenerateRequest, db: Session = Depends(get_db)):
     """
     Create a new asset based on an existing one (remix).
     """
@@ -330,8 +684,7 @@ async def remix_asset(asset_id: int, req: asset_models.GenerateRequest, backgrou
         raise HTTPException(status_code=404, detail="Asset to remix not found")
     
     job_id = str(uuid4())
-    create_job(job_id)
-    background_tasks.add_task(asset_pipeline, job_id=job_id, db=db, request_data=req, remix_of_id=asset_id)
+    submit_pipeline(job_id, request_data=req, remix_of_id=asset_id)
     return {"jobId": job_id, "status": "pending", "statusUrl": f"/api/v1/assets/jobs/{job_id}"}
 
 # --- New Endpoints for Rating and Tagging ---
@@ -621,6 +974,15 @@ def update_asset_limitations(
 def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+def readiness_check():
+    """
+    Readiness probe: 200 once every WARMUP_STYLES model is loaded, 503 until then.
+    Reports the warm-up status of each style and whether it is still resident.
+    """
+    status = model_warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 # --- License System Endpoints ---
 
 @app.post("/api/v1/license-types", response_model=asset_models.LicenseTypeResponse)
@@ -831,6 +1193,31 @@ def get_available_styles():
         "style_info": style_info
     }
 
+@app.get("/api/v1/generation/cache/stats")
+def get_generation_cache_stats():
+    """
+    Get size, hit/miss and eviction counters of the generation cache.
+    """
+    if generation_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **generation_cache.stats()}
+
+@app.get("/api/v1/generation/models/stats")
+def get_generation_model_stats():
+    """
+    Get memory use of the loaded SD3D models and style adapters, and style switch latency.
+    """
+    return stable_diffusion_3d.sd3d_generator.model_stats()
+
+@app.get("/api/v1/generation/embeddings/stats")
+def get_embedding_cache_stats():
+    """
+    Get size and hit/miss counters of the prompt embedding cache.
+    """
+    if embedding_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **embedding_cache.stats()}
+
 @app.get("/api/v1/generation/styles/{style}")
 def get_style_info(style: str):
     """
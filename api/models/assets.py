@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class GenerateRequest(BaseModel):
@@ -12,14 +12,21 @@ class GenerateRequest(BaseModel):
         default="standard", 
         description="Generation quality: draft, standard, high"
     )
+    seed: Optional[int] = Field(default=None, description="Optional seed for reproducible generation.")
     output_format: Optional[str] = Field(default='glb', description="The desired output format for the final model.")
     animation: Optional[List[str]] = Field(default=[], description="A list of standard animations to apply.")
+    tags: Optional[List[str]] = Field(default=[], description="Tags to attach to the saved asset.")
+    licenses: Optional[List["AssetLicenseRequest"]] = Field(default=[], description="License options to offer the saved asset under.")
     high_quality: bool = Field(default=False, description="Legacy field for backward compatibility")
 
 class JobResult(BaseModel):
     modelUrl: Optional[str] = None
     usdUrl: Optional[str] = None
     thumbnailUrl: Optional[str] = None
+    splatPreviews: Optional[Dict[str, str]] = None
+    splatCount: Optional[int] = None
+    stageTimings: Optional[Dict[str, float]] = Field(default=None, description="Seconds spent in each pipeline stage.")
+    criticalPath: Optional[List[str]] = Field(default=None, description="Stages that bounded the job's wall-clock time.")
 
 class JobStatusResponse(BaseModel):
     jobId: str
@@ -33,6 +40,21 @@ class GenerateInitialResponse(BaseModel):
     status: str
     statusUrl: str
 
+class BatchGenerateRequest(BaseModel):
+    items: List[GenerateRequest] = Field(..., min_items=1, description="Generation requests to run as one batch.")
+
+class BatchGenerateResponse(BaseModel):
+    batchId: str
+    status: str
+    statusUrl: str
+    streamUrl: str
+    jobs: List[GenerateInitialResponse]
+
+class BatchStatusResponse(BaseModel):
+    batchId: str
+    counts: Dict[str, int]
+    jobs: List[JobStatusResponse]
+
 # --- New Models for Community Features ---
 
 class RateRequest(BaseModel):
@@ -149,6 +171,8 @@ class AssetLicenseRequest(BaseModel):
     license_type_id: int = Field(..., description="ID of the license type")
     price: float = Field(..., gt=0, description="Price for this license")
 
+GenerateRequest.update_forward_refs()
+
 class AssetLicenseResponse(BaseModel):
     """Response model for asset licenses."""
     id: int
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -119,6 +119,11 @@ class Asset(Base):
     remixes = relationship("Asset", back_populates="remix_parent")
     remix_parent = relationship("Asset", remote_side=[id], back_populates="remixes")
 
+    # Generation job that produced this asset (results outlive the job store entry)
+    job_id = Column(String, index=True, nullable=True)
+    # Cross-platform preview data written with the asset (splat preview URLs and splat count)
+    preview_metadata = Column(JSON, nullable=True)
+
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -129,6 +134,12 @@ class Asset(Base):
     ownerships = relationship("AssetOwnership", back_populates="asset")
     licenses = relationship("AssetLicense", back_populates="asset")
 
+# Coalesced generation jobs served by another job's asset (the asset keeps the leader's job_id)
+class AssetJob(Base):
+    __tablename__ = "asset_jobs"
+    job_id = Column(String, primary_key=True)
+    asset_id = Column(Integer, ForeignKey("assets.id"), index=True, nullable=False)
+
 class AssetOwnership(Base):
     __tablename__ = "asset_ownerships"
     id = Column(Integer, primary_key=True, index=True)
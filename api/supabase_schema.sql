@@ -69,6 +69,8 @@ CREATE TABLE IF NOT EXISTS assets (
     exclusivity_level TEXT DEFAULT 'public' CHECK (exclusivity_level IN ('public', 'organization', 'exclusive')),
     owner_id UUID REFERENCES profiles(id) ON DELETE CASCADE,
     remix_of_asset_id INTEGER REFERENCES assets(id),
+    job_id TEXT,
+    preview_metadata JSONB,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -119,6 +121,11 @@ CREATE TABLE IF NOT EXISTS asset_tags (
     PRIMARY KEY (asset_id, tag_id)
 );
 
+CREATE TABLE IF NOT EXISTS asset_jobs (
+    job_id TEXT PRIMARY KEY,
+    asset_id INTEGER REFERENCES assets(id) ON DELETE CASCADE NOT NULL
+);
+
 CREATE TABLE IF NOT EXISTS community_themes (
     id SERIAL PRIMARY KEY,
     title TEXT NOT NULL,
@@ -157,6 +164,8 @@ CREATE TABLE IF NOT EXISTS admin_audit_log (
 CREATE INDEX IF NOT EXISTS idx_assets_owner_id ON assets(owner_id);
 CREATE INDEX IF NOT EXISTS idx_assets_is_public ON assets(is_public);
 CREATE INDEX IF NOT EXISTS idx_assets_created_at ON assets(created_at);
+CREATE INDEX IF NOT EXISTS idx_assets_job_id ON assets(job_id);
+CREATE INDEX IF NOT EXISTS idx_asset_jobs_asset_id ON asset_jobs(asset_id);
 CREATE INDEX IF NOT EXISTS idx_ratings_asset_id ON ratings(asset_id);
 CREATE INDEX IF NOT EXISTS idx_asset_tags_asset_id ON asset_tags(asset_id);
 CREATE INDEX IF NOT EXISTS idx_asset_tags_tag_id ON asset_tags(tag_id);
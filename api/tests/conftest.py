@@ -0,0 +1,34 @@
+"""
+Shared setup of the API tests.
+
+The stores, caches and the SQLAlchemy engine are created when their modules are
+imported, from settings read at that time, so every state path is pointed at a
+throwaway directory here, before any api module is imported.
+
+Usage (from the repository root):
+    python -m pytest api/tests
+"""
+import os
+import tempfile
+
+import pytest
+
+_STATE_DIR = tempfile.mkdtemp(prefix="jambam-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_STATE_DIR, 'jambam.db')}",
+    "JOB_STORE_BACKEND": "sqlite",
+    "JOB_STORE_PATH": os.path.join(_STATE_DIR, "jobs.db"),
+    "JOB_HISTORY_PATH": os.path.join(_STATE_DIR, "jobs.db"),
+    "CHECKPOINT_STORE_PATH": os.path.join(_STATE_DIR, "jobs.db"),
+    "BROKER_PATH": os.path.join(_STATE_DIR, "broker.db"),
+    "GENERATION_CACHE_DIR": os.path.join(_STATE_DIR, "cache", "generations"),
+    "EMBEDDING_CACHE_DIR": "",
+    "PIPELINE_BACKEND": "local",
+    "WARMUP_STYLES": "",
+})
+
+
+@pytest.fixture(autouse=True)
+def _work_dir(tmp_path, monkeypatch):
+    # Pipelines write their output under the relative static/generated directory
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,57 @@
+import pytest
+
+from api.core.admission import AdmissionController, AdmissionRejected, estimate_job_seconds
+from api.core.config import settings
+
+
+class FakeDispatcher:
+    def __init__(self, slots=1, busy_slots=0, queue_depth=0, backlog=0.0, position=0):
+        self._stats = {"slots": slots, "busy_slots": busy_slots, "queue_depth": queue_depth}
+        self.backlog = backlog
+        self.position = position
+        self.lanes = []
+
+    def stats(self):
+        return self._stats
+
+    def backlog_seconds(self, lane=None):
+        self.lanes.append(lane)
+        return self.backlog
+
+    def queue_position(self, lane):
+        return self.position
+
+
+def test_idle_pipeline_admits_anything():
+    AdmissionController(FakeDispatcher(), max_wait=10).check(cost=1000)
+
+
+def test_disabled_controller_admits_anything():
+    AdmissionController(FakeDispatcher(busy_slots=1, queue_depth=50, backlog=1e6), max_wait=0).check(cost=10)
+
+
+def test_admits_within_max_wait():
+    dispatcher = FakeDispatcher(busy_slots=1, queue_depth=2, backlog=60)
+    AdmissionController(dispatcher, max_wait=100).check(cost=40, lane=0)
+    assert dispatcher.lanes == [0]
+
+
+def test_rejects_past_max_wait():
+    dispatcher = FakeDispatcher(busy_slots=1, queue_depth=3, backlog=90, position=3)
+    with pytest.raises(AdmissionRejected) as info:
+        AdmissionController(dispatcher, max_wait=100).check(cost=30.5)
+    assert info.value.retry_after == 21
+    assert info.value.queue_position == 3
+    assert info.value.estimated_wait == 90
+
+
+def test_estimate_scales_with_quality():
+    # "realistic" advertises 30-60 seconds at standard quality
+    assert estimate_job_seconds("realistic", "standard") == 45
+    assert estimate_job_seconds("realistic", "draft") == 22.5
+    assert estimate_job_seconds("realistic", None) == 45
+
+
+def test_estimate_falls_back_for_unknown_styles():
+    assert estimate_job_seconds(None, None) == settings.ADMISSION_DEFAULT_JOB_SECONDS
+    assert estimate_job_seconds("custom", "high") == settings.ADMISSION_DEFAULT_JOB_SECONDS
@@ -0,0 +1,54 @@
+import time
+from uuid import uuid4
+
+import pytest
+
+from api.core.checkpoints import CheckpointStore
+from api.core.config import settings
+from api.core.dispatch import LocalDispatcher
+from api.core.executor import PipelineExecutor
+from api.core.jobs import create_job
+from api.generators import stable_diffusion_3d
+from api.models.assets import GenerateRequest
+
+
+@pytest.fixture
+def generated(monkeypatch, tmp_path):
+    def generate_batch(requests, style, step_callbacks=None):
+        paths = {}
+        for request in requests:
+            path = tmp_path / f"{request['job_id']}.glb"
+            path.write_text(request["prompt"])
+            paths[request["job_id"]] = str(path)
+        return paths
+
+    monkeypatch.setattr(stable_diffusion_3d.sd3d_generator, "generate_batch", generate_batch)
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_batch_members_are_queued_after_the_shared_generation(generated, mode):
+    executor = PipelineExecutor(slots=1, mode=mode)
+    dispatcher = LocalDispatcher(executor)
+    queued = []
+    # Post-processing is recorded instead of run
+    dispatcher.submit_job = lambda job_id, params, cost=0.0, lane=1: queued.append((job_id, params, cost))
+    items = []
+    for prompt in ("a chest", "a barrel"):
+        job_id = str(uuid4())
+        create_job(job_id)
+        items.append((job_id, GenerateRequest(prompt=f"{prompt} {uuid4()}", style="voxel")))
+    try:
+        dispatcher.submit_batch(str(uuid4()), "voxel", items)
+        deadline = time.time() + 30
+        while len(queued) < len(items) and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        executor.shutdown()
+
+    assert [job_id for job_id, _, _ in queued] == [job_id for job_id, _ in items]
+    assert all(cost == settings.ADMISSION_DEFAULT_JOB_SECONDS for _, _, cost in queued)
+    assert [params["request_data"].prompt for _, params, _ in queued] == [item.prompt for _, item in items]
+    # The queued runs resume from the generated models
+    checkpoints = CheckpointStore(settings.CHECKPOINT_STORE_PATH)
+    for job_id, _ in items:
+        assert checkpoints.load(job_id)["generate"]["style"] == "voxel"
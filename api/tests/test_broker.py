@@ -0,0 +1,140 @@
+import time
+import urllib.error
+import urllib.request
+from uuid import uuid4
+
+import pytest
+
+from api import worker
+from api.core.broker import SQLiteBroker
+from api.core.executor import QueueFullError
+from api.core.jobs import create_job, get_job_status
+from api.core.metrics import registry
+from api.worker import _run_lease, _serve_metrics
+
+
+@pytest.fixture
+def broker(tmp_path):
+    return SQLiteBroker(str(tmp_path / "broker.db"), max_queue=2, max_deliveries=2, aging_seconds=60)
+
+
+def wait_for_expiry():
+    # Leases in these tests last 10 ms
+    time.sleep(0.05)
+
+
+def test_lease_and_ack(broker):
+    broker.enqueue("asset_pipeline", {"job_id": "job-1"}, job_id="job-1")
+    lease = broker.lease("worker-1", 30)
+    assert lease.job_id == "job-1"
+    assert lease.payload == {"job_id": "job-1"}
+    assert lease.deliveries == 1
+    assert lease.lane == 1
+    assert lease.enqueued_at <= lease.leased_at
+    # Held by worker-1, so nobody else gets it
+    assert broker.lease("worker-2", 30) is None
+    assert broker.heartbeat(lease, 30)
+
+    broker.ack(lease)
+    assert broker.lease("worker-2", 30) is None
+    assert broker.queue_depth() == 0
+
+
+def test_lanes_lease_in_priority_order(broker):
+    broker.enqueue("asset_pipeline", {"job_id": "bulk"}, job_id="bulk", lane=2)
+    broker.enqueue("asset_pipeline", {"job_id": "draft"}, job_id="draft", lane=0)
+    assert broker.lease("worker-1", 30).job_id == "draft"
+    assert broker.lease("worker-1", 30).job_id == "bulk"
+
+
+def test_full_queue_is_refused(broker):
+    broker.enqueue("asset_pipeline", {"job_id": "a"}, job_id="a")
+    broker.enqueue("asset_pipeline", {"job_id": "b"}, job_id="b")
+    with pytest.raises(QueueFullError):
+        broker.enqueue("asset_pipeline", {"job_id": "c"}, job_id="c")
+
+
+def test_expired_lease_is_redelivered(broker):
+    broker.enqueue("asset_pipeline", {"job_id": "job-1"}, job_id="job-1")
+    first = broker.lease("worker-1", 0.01)
+    wait_for_expiry()
+
+    second = broker.lease("worker-2", 30)
+    assert second.message_id == first.message_id
+    assert second.deliveries == 2
+    # The first worker lost its lease: it can neither extend nor ack it
+    assert not broker.heartbeat(first, 30)
+    broker.ack(first)
+    assert broker.heartbeat(second, 30)
+
+
+def test_release_redelivers_right_away(broker):
+    broker.enqueue("asset_pipeline", {"job_id": "job-1"}, job_id="job-1")
+    lease = broker.lease("worker-1", 30)
+    broker.release(lease)
+    assert broker.lease("worker-2", 30).deliveries == 2
+
+
+def test_dead_letter_after_max_deliveries(broker):
+    broker.enqueue("asset_pipeline", {"job_id": "job-1"}, job_id="job-1")
+    for _ in range(2):
+        lease = broker.lease("worker-1", 0.01)
+        assert lease is not None
+        wait_for_expiry()
+    assert broker.lease("worker-1", 30) is None
+
+    dead = broker.dead_letters()
+    assert [lease.job_id for lease in dead] == ["job-1"]
+    assert dead[0].deliveries == 2
+    # Dead letters are handed out once
+    assert broker.dead_letters() == []
+
+
+def test_cancel_only_drops_queued_messages(broker):
+    broker.enqueue("asset_pipeline", {"job_id": "queued"}, job_id="queued")
+    broker.enqueue("asset_pipeline", {"job_id": "leased"}, job_id="leased", lane=0)
+    broker.lease("worker-1", 30)
+    assert not broker.cancel("leased")
+    assert broker.cancel("queued")
+    assert broker.lease("worker-2", 30) is None
+
+
+def test_worker_fails_the_jobs_of_a_crashing_message(broker):
+    create_job("worker-job")
+    # A payload asset_pipeline does not accept
+    broker.enqueue("asset_pipeline", {"job_id": "worker-job", "params": {"animation": ["idle"]}}, job_id="worker-job")
+    _run_lease(broker, broker.lease("worker-1", 30))
+
+    job = get_job_status("worker-job")
+    assert job["status"] == "failed"
+    assert "animation" in job["details"]
+    # Acked, not redelivered into the same crash
+    assert broker.lease("worker-2", 30) is None
+
+
+def test_worker_records_metrics_of_its_runs(broker, monkeypatch):
+    style = f"style-{uuid4().hex[:8]}"
+    monkeypatch.setattr(worker, "run_message", lambda task, payload: {
+        "jobId": payload["job_id"], "style": style, "quality": "draft", "outcome": "completed", "duration": 2.0,
+        "stageTimings": {"generate": 1.5},
+    })
+    broker.enqueue("asset_pipeline", {"job_id": "metrics-job"}, job_id="metrics-job", lane=2)
+    _run_lease(broker, broker.lease("worker-1", 30))
+
+    metrics = registry.render()
+    assert f'jambam_pipeline_jobs_total{{style="{style}",quality="draft",outcome="completed"}} 1' in metrics
+    assert f'jambam_pipeline_stage_duration_seconds_count{{stage="generate",style="{style}",quality="draft"}} 1' in metrics
+    assert 'jambam_pipeline_queue_wait_seconds_count{lane="bulk"}' in metrics
+
+
+def test_worker_serves_its_metrics():
+    server = _serve_metrics(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert b"jambam_pipeline_queue_wait_seconds" in response.read()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other", timeout=5)
+    finally:
+        server.shutdown()
@@ -0,0 +1,61 @@
+import os
+import threading
+from uuid import uuid4
+
+import pytest
+
+from api.core import pipeline
+from api.core.cancellation import cancellations, JobCancelled
+from api.core.executor import PipelineExecutor
+from api.core.jobs import create_job, get_job_status
+
+
+@pytest.fixture
+def executor():
+    executor = PipelineExecutor(slots=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_cancelled_job_discards_its_output():
+    job_id = str(uuid4())
+    create_job(job_id)
+    os.makedirs(f"static/generated/{job_id}")
+    cancellations.cancel(job_id)
+
+    summary = pipeline.asset_pipeline(job_id, uploaded_file_path="upload.glb")
+    assert summary["outcome"] == "cancelled"
+    assert get_job_status(job_id)["status"] == "cancelled"
+    assert not os.path.exists(f"static/generated/{job_id}")
+
+
+def test_cancelled_run_is_not_marked_failed(executor):
+    job_id = str(uuid4())
+    create_job(job_id)
+
+    def cancelled():
+        raise JobCancelled(job_id)
+
+    task = executor.submit(cancelled, job_id=job_id)
+    with pytest.raises(JobCancelled):
+        task.future.result(timeout=5)
+    assert get_job_status(job_id)["status"] == "pending"
+
+
+def test_cancel_drops_a_queued_task(executor):
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        return release.wait(5)
+
+    running = executor.submit(block, job_id="running")
+    queued = executor.submit(lambda: "ran", job_id="queued")
+    assert started.wait(5)
+
+    assert executor.cancel("queued")
+    assert not executor.cancel("running")
+    release.set()
+    assert running.future.result(timeout=5)
+    assert queued.future.cancelled()
+    assert executor.stats()["cancelled"] == 1
@@ -0,0 +1,98 @@
+import time
+from uuid import uuid4
+
+import pytest
+
+from api.core import pipeline
+from api.core.checkpoints import CheckpointStore
+from api.core.database import Base, engine
+from api.core.jobs import create_job, get_job_status
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(str(tmp_path / "checkpoints.db"))
+
+
+def test_request_round_trip(store):
+    store.save_request("job-1", {"request_data": {"prompt": "a chest"}})
+    assert store.load_request("job-1") == {"request_data": {"prompt": "a chest"}}
+    assert store.load_request("missing") is None
+    assert store.pending_job_ids() == ["job-1"]
+
+
+def test_checkpoint_needs_its_artifacts(store, tmp_path):
+    model = tmp_path / "model.glb"
+    rigged = tmp_path / "rigged.glb"
+    model.write_text("glb")
+    rigged.write_text("glb")
+    store.save("job-1", "generate", {"model_path": str(model), "style": "realistic"})
+    store.save("job-1", "rigging", {"rigged_path": str(rigged)})
+    assert set(store.load("job-1")) == {"generate", "rigging"}
+
+    rigged.unlink()
+    assert store.load("job-1") == {"generate": {"model_path": str(model), "style": "realistic"}}
+
+
+def test_clear_and_purge(store):
+    store.save_request("old", {})
+    store.save("old", "generate", {})
+    store.clear("old")
+    assert store.load_request("old") is None and store.load("old") == {}
+
+    store.save_request("stale", {})
+    assert store.purge(time.time() + 1) == 1
+    assert store.pending_job_ids() == []
+
+
+def test_claim_attempt_stops_at_the_limit(store):
+    store.save_request("job-1", {})
+    assert store.claim_attempt("job-1", 2)
+    assert store.claim_attempt("job-1", 2)
+    assert not store.claim_attempt("job-1", 2)
+    assert not store.claim_attempt("missing", 2)
+
+
+def test_claim_resume_is_won_once(store):
+    store.save_request("job-1", {})
+    stale_before = time.time() - 10
+    assert store.claim_resume("job-1", 3, stale_before) is True
+    # Another process resuming at the same time finds it claimed
+    assert store.claim_resume("job-1", 3, stale_before) is None
+    assert store.claim_resume("missing", 3, stale_before) is None
+
+
+def test_claim_resume_reports_exhausted_jobs(store):
+    store.save_request("job-1", {})
+    store.claim_attempt("job-1", 1)
+    assert store.claim_resume("job-1", 1, time.time() + 1) is False
+
+
+def test_pipeline_resumes_after_the_last_checkpoint(monkeypatch, tmp_path):
+    Base.metadata.create_all(bind=engine)
+    job_id = str(uuid4())
+    create_job(job_id)
+    upload = tmp_path / "upload.glb"
+    rigged = tmp_path / "rigged.glb"
+    upload.write_text("glb")
+    rigged.write_text("glb")
+    pipeline.checkpoint_store.save(job_id, "generate", {"model_path": str(upload), "prompt": None, "style": "custom"})
+    pipeline.checkpoint_store.save(job_id, "rigging", {"rigged_path": str(rigged)})
+
+    def rig_again(*args):
+        raise AssertionError("rigging ran again")
+
+    animated = []
+    monkeypatch.setattr(pipeline.rigging, "run", rig_again)
+    monkeypatch.setattr(pipeline.animation, "run", lambda job_id, path, animations: animated.append(path) or path)
+    monkeypatch.setattr(pipeline.converter, "run", lambda job_id, path, output_format: {"modelUrl": f"/{path}"})
+    monkeypatch.setattr(pipeline.gaussian_splatting.splat_converter, "convert_model_to_splats",
+                        lambda *args, **kwargs: {"status": "error"})
+
+    summary = pipeline.asset_pipeline(job_id, uploaded_file_path=str(upload))
+    assert summary["outcome"] == "completed"
+    assert animated == [str(rigged)]
+    assert "rigging" not in summary["stageTimings"]
+    assert get_job_status(job_id)["status"] == "completed"
+    # Checkpoints go once the job is done
+    assert pipeline.checkpoint_store.load(job_id) == {}
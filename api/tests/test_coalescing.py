@@ -0,0 +1,62 @@
+import time
+from uuid import uuid4
+
+from api.core import pipeline
+from api.core.database import Base, engine, session_scope
+from api.core.jobs import (
+    create_job, get_job_status, join_flight, end_flight, update_job_status, complete_job, cancel_job, run_cancelled,
+    job_store,
+)
+
+
+def coalesced_pair():
+    leader_id, follower_id = str(uuid4()), str(uuid4())
+    create_job(leader_id)
+    create_job(follower_id)
+    key = str(uuid4())
+    assert join_flight(key, leader_id) == leader_id
+    assert join_flight(key, follower_id) == leader_id
+    return leader_id, follower_id
+
+
+def test_follower_mirrors_its_leader():
+    leader_id, follower_id = coalesced_pair()
+    update_job_status(leader_id, "processing", 50, "Rigging complete.")
+    assert get_job_status(follower_id)["progress"] == 50
+    complete_job(leader_id, {"modelUrl": "/static/generated/model.glb"})
+    assert get_job_status(follower_id)["status"] == "completed"
+    assert get_job_status(follower_id)["result"] == {"modelUrl": "/static/generated/model.glb"}
+
+
+def test_run_continues_while_a_follower_wants_it():
+    leader_id, follower_id = coalesced_pair()
+    assert cancel_job(leader_id) is None
+    assert not run_cancelled(leader_id)
+    # A cancelled follower stops mirroring and releases the run
+    assert cancel_job(follower_id) == leader_id
+    assert run_cancelled(leader_id)
+    update_job_status(leader_id, "processing", 50, "Rigging complete.")
+    assert get_job_status(follower_id)["status"] == "cancelled"
+
+
+def test_follower_finds_leader_asset_after_eviction():
+    Base.metadata.create_all(bind=engine)
+    leader_id, follower_id = coalesced_pair()
+
+    splats = {"splatPreviews": {"web": f"/static/generated/{leader_id}/splats/splats_web.json"}, "splatCount": 1200}
+    asset_id = pipeline.save_stage(leader_id, {"modelUrl": f"/static/generated/{leader_id}/model.glb"}, splats,
+                                   None, "a chest", "realistic", None)
+    end_flight(leader_id)
+    job_store.purge("pending", time.time() + 1)
+    assert get_job_status(follower_id)["status"] == "not_found"
+
+    with session_scope() as db:
+        assert pipeline.find_job_asset(db, leader_id).id == asset_id
+        asset = pipeline.find_job_asset(db, follower_id)
+        assert asset.id == asset_id
+        assert asset.job_id == leader_id
+        # An evicted job answers with the same result fields as a live one
+        assert pipeline.asset_job_result(asset) == {
+            "modelUrl": f"/static/generated/{leader_id}/model.glb", "thumbnailUrl": None, **splats,
+        }
+        assert pipeline.find_job_asset(db, str(uuid4())) is None
@@ -0,0 +1,47 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from api.generators.cpu_inference import CpuInferenceProfile
+
+
+class TinyPipeline:
+    """Stands in for a diffusers pipeline: components are plain attributes."""
+
+    def __init__(self):
+        self.text_encoder = torch.nn.Sequential(torch.nn.Linear(8, 8))
+        self.unet = torch.nn.Sequential(torch.nn.Conv2d(3, 3, 1), torch.nn.Flatten(), torch.nn.Linear(12, 4))
+        self.vae = torch.nn.Sequential(torch.nn.Conv2d(3, 3, 1))
+
+    @property
+    def components(self):
+        return {"text_encoder": self.text_encoder, "unet": self.unet, "vae": self.vae}
+
+
+def quantized_linears(module):
+    return [child for child in module.modules() if isinstance(child, torch.ao.nn.quantized.dynamic.Linear)]
+
+
+def test_quantized_denoiser_survives_compilation():
+    pipeline = CpuInferenceProfile(bfloat16="false", channels_last=True, compile=True,
+                                   quantize_int8=True).optimize(TinyPipeline())
+    # torch.compile wraps the module it was given; that must be the int8 one
+    compiled = pipeline.unet
+    assert hasattr(compiled, "_orig_mod")
+    assert quantized_linears(compiled._orig_mod)
+    assert quantized_linears(pipeline.text_encoder)
+    # The text encoder is not compiled
+    assert not hasattr(pipeline.text_encoder, "_orig_mod")
+
+
+def test_plain_profile_leaves_modules_in_place():
+    original = TinyPipeline()
+    unet = original.unet
+    pipeline = CpuInferenceProfile(bfloat16="false", channels_last=False).optimize(original)
+    assert pipeline.unet is unet
+    assert not quantized_linears(pipeline.unet)
+
+
+def test_int8_rules_out_bfloat16():
+    assert not CpuInferenceProfile(bfloat16="true", quantize_int8=True).use_bfloat16
+    assert CpuInferenceProfile(bfloat16="true").use_bfloat16
@@ -0,0 +1,64 @@
+import pytest
+
+from api.core.embedding_cache import EmbeddingCache, embedding_key
+
+
+def counting_encoder(calls):
+    def encode():
+        calls.append(1)
+        return {"prompt_embeds": len(calls)}
+    return encode
+
+
+def test_key_depends_on_prompt_style_and_model():
+    key = embedding_key("a chest", "realistic", "sd3d-v1")
+    assert key == embedding_key("a chest", "realistic", "sd3d-v1")
+    assert key != embedding_key("a chest ", "realistic", "sd3d-v1")
+    assert key != embedding_key("a chest", "anime", "sd3d-v1")
+    assert key != embedding_key("a chest", "realistic", "sd3d-v2-adapters")
+
+
+def test_hits_skip_the_encoder():
+    cache = EmbeddingCache(max_entries=4)
+    calls = []
+    first = cache.get_or_encode("key", counting_encoder(calls))
+    assert cache.get_or_encode("key", counting_encoder(calls)) is first
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_least_recently_used_entry_is_dropped():
+    cache = EmbeddingCache(max_entries=2)
+    calls = []
+    for key in ("a", "b", "a", "c"):
+        cache.get_or_encode(key, counting_encoder(calls))
+    assert len(calls) == 3
+    cache.get_or_encode("a", counting_encoder(calls))
+    assert len(calls) == 3
+    cache.get_or_encode("b", counting_encoder(calls))
+    assert len(calls) == 4
+    assert cache.stats()["entries"] == 2
+
+
+def test_disk_cache_survives_a_restart(tmp_path):
+    torch = pytest.importorskip("torch")
+    directory = str(tmp_path / "embeddings")
+    encoded = {"prompt_embeds": torch.ones(2, 3), "negative_prompt_embeds": None}
+    EmbeddingCache(max_entries=4, directory=directory).get_or_encode("key", lambda: encoded)
+
+    restarted = EmbeddingCache(max_entries=4, directory=directory)
+    loaded = restarted.get_or_encode("key", lambda: pytest.fail("encoded again"))
+    assert torch.equal(loaded["prompt_embeds"], encoded["prompt_embeds"])
+    assert loaded["negative_prompt_embeds"] is None
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_unreadable_file_is_encoded_again(tmp_path):
+    pytest.importorskip("torch")
+    directory = tmp_path / "embeddings"
+    cache = EmbeddingCache(max_entries=4, directory=str(directory))
+    (directory / "key.pt").write_bytes(b"not a tensor file")
+    calls = []
+    cache.get_or_encode("key", counting_encoder(calls))
+    assert len(calls) == 1
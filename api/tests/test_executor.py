@@ -0,0 +1,97 @@
+import threading
+from uuid import uuid4
+
+import pytest
+
+from api.core.executor import PipelineExecutor, LaneQueue, PipelineTask
+from api.core.jobs import create_job, get_job_status, cancel_job
+
+
+@pytest.fixture
+def executor():
+    executor = PipelineExecutor(slots=1)
+    yield executor
+    executor.shutdown()
+
+
+def new_job() -> str:
+    job_id = str(uuid4())
+    create_job(job_id)
+    return job_id
+
+
+def crash(*args, **kwargs):
+    raise TypeError("asset_pipeline() got an unexpected keyword argument 'animation'")
+
+
+def test_task_result(executor):
+    task = executor.submit(lambda x, y=0: x + y, 1, y=2, job_id="sum")
+    assert task.future.result(timeout=5) == 3
+    assert executor.stats()["completed"] == 1
+
+
+def test_crashed_task_fails_its_job(executor):
+    job_id = new_job()
+    task = executor.submit(crash, job_id, job_id=job_id)
+    with pytest.raises(TypeError):
+        task.future.result(timeout=5)
+    job = get_job_status(job_id)
+    assert job["status"] == "failed"
+    assert "unexpected keyword argument 'animation'" in job["details"]
+    assert executor.stats()["failed"] == 1
+
+
+def test_crashed_batch_task_fails_every_member(executor):
+    members = [new_job(), new_job()]
+    task = executor.submit(crash, job_id="batch:realistic", job_ids=members)
+    with pytest.raises(TypeError):
+        task.future.result(timeout=5)
+    assert [get_job_status(job_id)["status"] for job_id in members] == ["failed", "failed"]
+
+
+def test_crash_leaves_finished_jobs_alone(executor):
+    job_id = new_job()
+    cancel_job(job_id)
+    task = executor.submit(crash, job_id=job_id)
+    with pytest.raises(TypeError):
+        task.future.result(timeout=5)
+    assert get_job_status(job_id)["status"] == "cancelled"
+
+
+def test_lane_queue_takes_the_most_urgent_lane_first():
+    queue = LaneQueue(lanes=3, aging_seconds=60)
+    bulk = PipelineTask("bulk", print, (), {}, lane=2)
+    standard = PipelineTask("standard", print, (), {}, lane=1)
+    interactive = PipelineTask("interactive", print, (), {}, lane=0)
+    for task in (bulk, standard, interactive):
+        queue.put_nowait(task)
+    assert [queue.get() for _ in range(3)] == [interactive, standard, bulk]
+    assert queue.depths() == {"interactive": 0, "standard": 0, "bulk": 0}
+
+
+def test_lane_queue_ages_bulk_work():
+    queue = LaneQueue(lanes=3, aging_seconds=10)
+    bulk = PipelineTask("bulk", print, (), {}, lane=2)
+    bulk.submitted_at -= 30
+    interactive = PipelineTask("interactive", print, (), {}, lane=0)
+    queue.put_nowait(interactive)
+    queue.put_nowait(bulk)
+    assert queue.get() is bulk
+    assert queue.get() is interactive
+
+
+def test_backlog_counts_only_work_ahead_of_a_lane():
+    executor = PipelineExecutor(slots=2)
+    try:
+        release = threading.Event()
+        # One task per slot keeps both busy, so the rest stay queued
+        for _ in range(2):
+            executor.submit(release.wait, 5, cost=10.0, lane=1)
+        executor.submit(print, cost=20.0, lane=2)
+        executor.submit(print, cost=4.0, lane=0)
+        assert executor.queue_position(0) == 2
+        assert executor.backlog_seconds(lane=0) <= (10.0 + 10.0 + 4.0) / 2
+        assert executor.backlog_seconds() > executor.backlog_seconds(lane=1)
+        release.set()
+    finally:
+        executor.shutdown()
@@ -0,0 +1,39 @@
+from uuid import uuid4
+
+import pytest
+
+from api.core import pipeline
+from api.core.generation_cache import generation_cache
+from api.generators import stable_diffusion_3d
+from api.generators.stable_diffusion_3d import sd3d_generator
+from api.models.assets import GenerateRequest
+
+
+@pytest.fixture
+def request_data():
+    # A unique prompt per test, so cache entries of other tests never match
+    return GenerateRequest(prompt=f"a wooden treasure chest {uuid4()}", style="realistic", quality="draft")
+
+
+def run_generate_stage(monkeypatch, request_data, generated_path):
+    monkeypatch.setattr(pipeline, "_run_generator", lambda *args: generated_path)
+    return pipeline.generate_stage("job-1", request_data, None)
+
+
+def test_generation_is_cached(monkeypatch, request_data):
+    model_path = sd3d_generator._process_and_save_result("job-1", {"images": []}, "realistic")
+    assert run_generate_stage(monkeypatch, request_data, model_path)["model_path"] == model_path
+    assert generation_cache.get(pipeline._generation_cache_key(request_data)) is not None
+
+
+def test_fallback_generation_is_not_cached(monkeypatch, request_data):
+    model_path = sd3d_generator._generate_mock_asset("job-1", request_data.prompt, "realistic")
+    assert sd3d_generator.is_fallback(model_path)
+    assert run_generate_stage(monkeypatch, request_data, model_path)["model_path"] == model_path
+    assert generation_cache.get(pipeline._generation_cache_key(request_data)) is None
+
+
+def test_mock_pipeline_output_is_a_fallback(monkeypatch):
+    monkeypatch.setattr(stable_diffusion_3d.time, "sleep", lambda seconds: None)
+    result = sd3d_generator._create_mock_pipeline("realistic")("a chest", num_inference_steps=1)
+    assert sd3d_generator.is_fallback(sd3d_generator._process_and_save_result("job-1", result, "realistic"))
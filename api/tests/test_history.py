@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from api.core.history import JobHistory, encode_cursor, decode_cursor
+
+
+@pytest.fixture
+def history(tmp_path):
+    return JobHistory(str(tmp_path / "history.db"))
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(1700000000.25, "job|1")) == (1700000000.25, "job|1")
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+
+def test_query_pages_newest_first(history):
+    for i in range(5):
+        history.record_created(f"job-{i}", style="realistic", created_at=1000.0 + i)
+    # Same created_at, so the job id breaks the tie
+    history.record_created("job-5b", created_at=1004.0)
+
+    pages, cursor = [], None
+    while True:
+        jobs, cursor = history.query(limit=2, cursor=cursor)
+        pages.append([job["job_id"] for job in jobs])
+        if cursor is None:
+            break
+    assert pages == [["job-5b", "job-4"], ["job-3", "job-2"], ["job-1", "job-0"]]
+
+
+def test_query_filters(history):
+    history.record_created("a", user_id="alice", style="realistic", created_at=1000.0)
+    history.record_created("b", user_id="bob", style="cartoon", created_at=1001.0)
+    history.record_status("b", "completed", terminal=True)
+    assert [job["job_id"] for job in history.query(user_id="alice")[0]] == ["a"]
+    assert [job["job_id"] for job in history.query(style="cartoon")[0]] == ["b"]
+    assert [job["job_id"] for job in history.query(status="completed")[0]] == ["b"]
+    assert [job["job_id"] for job in history.query(since=1000.5)[0]] == ["b"]
+    assert [job["job_id"] for job in history.query(until=1000.5)[0]] == ["a"]
+
+
+def test_cancelled_job_stays_cancelled(history):
+    history.record_created("job-1")
+    history.record_status("job-1", "cancelled", terminal=True)
+    history.record_status("job-1", "failed", terminal=True)
+    history.record_status("job-1", "processing", terminal=False)
+    assert history.query()[0][0]["status"] == "cancelled"
+
+
+def test_aggregates_percentiles(history):
+    now = time.time()
+    # Durations of 1..20 seconds
+    for seconds in range(1, 21):
+        history.record_created(f"done-{seconds}", created_at=now - seconds)
+        history.record_status(f"done-{seconds}", "completed", terminal=True)
+    history.record_created("failed", created_at=now - 100)
+    history.record_status("failed", "failed", terminal=True)
+    history.record_created("pending")
+
+    stats = history.aggregates()
+    assert stats["total"] == 22
+    assert stats["counts"] == {"completed": 20, "failed": 1, "pending": 1}
+    assert stats["durationSeconds"]["p50"] == pytest.approx(10, abs=0.5)
+    assert stats["durationSeconds"]["p95"] == pytest.approx(19, abs=0.5)
+
+
+def test_aggregates_without_completed_jobs(history):
+    history.record_created("pending")
+    assert history.aggregates()["durationSeconds"] == {"p50": None, "p95": None}
+
+
+def test_purge(history):
+    history.record_created("old", created_at=1000.0)
+    history.record_created("new")
+    assert history.purge(2000.0) == 1
+    assert [job["job_id"] for job in history.query()[0]] == ["new"]
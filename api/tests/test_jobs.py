@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from api.core.jobs import InMemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryJobStore({})
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_create_and_get(store):
+    store.create("job-1")
+    job = store.get("job-1")
+    assert job["jobId"] == "job-1"
+    assert job["status"] == "pending"
+    assert job["progress"] == 0
+    assert store.get("missing") is None
+
+
+def test_update_and_complete(store):
+    store.create("job-1")
+    store.update("job-1", "processing", 40, "Rigging complete.")
+    assert store.get("job-1")["status"] == "processing"
+    assert store.get("job-1")["details"] == "Rigging complete."
+
+    store.complete("job-1", {"modelUrl": "/static/generated/job-1/model.glb"})
+    job = store.get("job-1")
+    assert job["status"] == "completed"
+    assert job["progress"] == 100
+    assert job["result"] == {"modelUrl": "/static/generated/job-1/model.glb"}
+
+
+def test_cancelled_job_is_final(store):
+    store.create("job-1")
+    store.update("job-1", "cancelled", 10, "Job cancelled.")
+    store.update("job-1", "processing", 50, "Rigging complete.")
+    store.complete("job-1", {})
+    assert store.get("job-1")["status"] == "cancelled"
+
+
+def test_update_progress_never_goes_back(store):
+    store.create("job-1")
+    store.create("job-2")
+    store.update("job-1", "processing", 30, "Generating model")
+    store.update_progress([("job-1", 50, "Generating model"), ("job-2", 50, "Generating model")])
+    store.update_progress([("job-1", 40, "Generating model")])
+    assert store.get("job-1")["progress"] == 50
+    # Only processing jobs take in-stage progress
+    assert store.get("job-2")["progress"] == 0
+
+
+def test_purge_and_counts(store):
+    store.create("old")
+    store.create("new")
+    store.update("old", "failed", 100, "boom")
+    store.update("new", "failed", 100, "boom")
+    assert store.counts() == {"failed": 2}
+    assert store.purge("failed", time.time() + 1) == 2
+    assert store.get("old") is None
+    assert store.purge("failed", time.time() + 1) == 0
+
+
+def test_batches(store):
+    store.save_batch("batch-1", ["a", "b"])
+    assert store.get_batch("batch-1") == ["a", "b"]
+    assert store.get_batch("missing") is None
+    assert store.purge_batches(time.time() + 1) == 1
+    assert store.get_batch("batch-1") is None
+
+
+def test_join_flight(store):
+    store.create("leader")
+    store.create("follower")
+    assert store.join_flight("key", "leader") == "leader"
+    store.update("leader", "processing", 30, "Model generated, starting post-processing.")
+    assert store.join_flight("key", "follower") == "leader"
+    assert store.followers("leader") == ["follower"]
+    # The follower takes over the leader's current state
+    assert store.get("follower")["progress"] == 30
+
+    assert store.detach("follower") == "leader"
+    assert store.followers("leader") == []
+
+
+def test_end_flight_releases_the_key(store):
+    store.create("leader")
+    store.create("next")
+    store.join_flight("key", "leader")
+    store.end_flight("leader")
+    assert store.join_flight("key", "next") == "next"
+
+
+def test_finished_leader_does_not_take_followers(store):
+    store.create("leader")
+    store.create("late")
+    store.join_flight("key", "leader")
+    store.complete("leader", {})
+    assert store.join_flight("key", "late") == "late"
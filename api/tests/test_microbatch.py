@@ -0,0 +1,72 @@
+import threading
+
+from api.core.cancellation import cancellations, JobCancelled
+from api.core.microbatch import MicroBatcher
+
+
+def echo_batch(calls):
+    def run_batch(key, requests):
+        calls.append([request["job_id"] for request in requests])
+        return {request["job_id"]: f"{key}:{request['job_id']}" for request in requests}
+    return run_batch
+
+
+def submit_concurrently(batcher, job_ids, before_dispatch=None):
+    results = {}
+
+    def submit(job_id):
+        try:
+            results[job_id] = batcher.submit("realistic", {"job_id": job_id})
+        except BaseException as e:
+            results[job_id] = e
+
+    threads = [threading.Thread(target=submit, args=(job_id,)) for job_id in job_ids]
+    for thread in threads:
+        thread.start()
+    if before_dispatch is not None:
+        before_dispatch()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_concurrent_requests_share_one_call():
+    calls = []
+    batcher = MicroBatcher("test", echo_batch(calls), window=0.5, max_batch_size=3)
+    results = submit_concurrently(batcher, ["a", "b", "c"])
+    assert len(calls) == 1 and sorted(calls[0]) == ["a", "b", "c"]
+    assert results == {"a": "realistic:a", "b": "realistic:b", "c": "realistic:c"}
+
+
+def test_disabled_batcher_runs_requests_alone():
+    calls = []
+    batcher = MicroBatcher("test", echo_batch(calls), window=0, max_batch_size=8)
+    assert batcher.submit("realistic", {"job_id": "a"}) == "realistic:a"
+    assert calls == [["a"]]
+
+
+def test_cancelled_request_is_dropped_before_dispatch():
+    calls = []
+    batcher = MicroBatcher("test", echo_batch(calls), window=0.3, max_batch_size=8,
+                           check=lambda request: cancellations.check(request["job_id"]))
+    try:
+        results = submit_concurrently(batcher, ["keep-1", "drop", "keep-2"],
+                                      before_dispatch=lambda: cancellations.cancel("drop"))
+    finally:
+        cancellations.discard("drop")
+    assert len(calls) == 1 and sorted(calls[0]) == ["keep-1", "keep-2"]
+    assert isinstance(results["drop"], JobCancelled)
+    assert results["keep-1"] == "realistic:keep-1"
+
+
+def test_batch_of_only_cancelled_requests_is_not_run():
+    calls = []
+    batcher = MicroBatcher("test", echo_batch(calls), window=0, max_batch_size=1,
+                           check=lambda request: cancellations.check(request["job_id"]))
+    cancellations.cancel("drop")
+    try:
+        results = submit_concurrently(batcher, ["drop"])
+    finally:
+        cancellations.discard("drop")
+    assert calls == []
+    assert isinstance(results["drop"], JobCancelled)
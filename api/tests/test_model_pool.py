@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from api.core.model_pool import ModelPool
+
+SIZES = {"a": 40, "b": 40, "c": 40, "huge": 500}
+
+
+def make_pool(budget=100, default_size=0, loader=None):
+    loaded, evicted = [], []
+
+    def load(key):
+        loaded.append(key)
+        return loader(key) if loader else f"model-{key}"
+
+    pool = ModelPool("test", budget, loader=load, sizer=lambda model: SIZES[model.split("-", 1)[1]],
+                     on_evict=evicted.append, default_size=default_size)
+    return pool, loaded, evicted
+
+
+def test_loads_once_and_reuses():
+    pool, loaded, _ = make_pool()
+    with pool.use("a") as model:
+        assert model == "model-a"
+    with pool.use("a"):
+        pass
+    assert loaded == ["a"]
+    assert pool.stats()["models"] == {"a": {"bytes": 40, "refs": 0, "loading": False}}
+
+
+def test_evicts_least_recently_used():
+    pool, loaded, evicted = make_pool()
+    for key in ("a", "b", "a", "c"):
+        with pool.use(key):
+            pass
+    assert evicted == ["b"]
+    assert set(pool.stats()["models"]) == {"a", "c"}
+    assert pool.stats()["used_bytes"] == 80
+
+
+def test_pinned_model_is_never_evicted():
+    pool, loaded, evicted = make_pool()
+    pool.acquire("a")
+    for key in ("b", "c"):
+        with pool.use(key):
+            pass
+    assert evicted == ["b"]
+    assert pool.stats()["models"]["a"]["refs"] == 1
+    pool.release("a")
+
+
+def test_load_waits_for_a_release():
+    pool, loaded, _ = make_pool(budget=50)
+    pool.acquire("a")
+    thread = threading.Thread(target=lambda: pool.use("b").__enter__())
+    thread.start()
+    thread.join(0.2)
+    # b does not fit next to pinned a
+    assert loaded == ["a"]
+    pool.release("a")
+    thread.join(5)
+    assert loaded == ["a", "b"]
+    assert set(pool.stats()["models"]) == {"b"}
+
+
+def test_oversized_model_loads_into_an_empty_pool():
+    pool, loaded, _ = make_pool()
+    with pool.use("a"):
+        pass
+    with pool.use("huge"):
+        assert set(pool.stats()["models"]) == {"huge"}
+    assert loaded == ["a", "huge"]
+    # Over budget on its own, so it goes as soon as it is unpinned
+    assert pool.stats()["models"] == {}
+
+
+def test_cold_loads_reserve_the_default_size():
+    loading = threading.Event()
+    proceed = threading.Event()
+
+    def slow(key):
+        loading.set()
+        proceed.wait(5)
+        return f"model-{key}"
+
+    pool, loaded, _ = make_pool(budget=60, default_size=40, loader=slow)
+    first = threading.Thread(target=pool.acquire, args=("a",))
+    first.start()
+    assert loading.wait(5)
+    second = threading.Thread(target=lambda: pool.use("b").__enter__())
+    second.start()
+    second.join(0.2)
+    # Nothing is measured yet, but b would not fit next to a's reservation
+    assert loaded == ["a"]
+    proceed.set()
+    first.join(5)
+    pool.release("a")
+    second.join(5)
+    assert loaded == ["a", "b"]
+
+
+def test_failed_load_is_not_kept():
+    def broken(key):
+        raise OSError("no weights")
+
+    pool, _, _ = make_pool(loader=broken)
+    with pytest.raises(OSError):
+        pool.acquire("a")
+    assert pool.stats()["models"] == {}
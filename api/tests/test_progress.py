@@ -0,0 +1,65 @@
+import time
+
+from api.core.progress import ProgressReporter
+
+
+def test_reports_are_coalesced_per_job():
+    writes = []
+    reporter = ProgressReporter(writes.append, interval=3600)
+    reporter.report("job-1", 10, "step 1")
+    reporter.report("job-1", 20, "step 2")
+    reporter.report("job-2", 5, "step 1")
+    reporter.flush()
+    assert writes == [{"job-1": (20, "step 2"), "job-2": (5, "step 1")}]
+
+    # Nothing pending, nothing written
+    reporter.flush()
+    assert len(writes) == 1
+
+
+def test_reports_that_do_not_move_progress_are_dropped():
+    writes = []
+    reporter = ProgressReporter(writes.append, interval=3600)
+    reporter.report("job-1", 20, "step 2")
+    reporter.flush()
+    reporter.report("job-1", 20, "step 2 again")
+    reporter.report("job-1", 15, "step 1")
+    reporter.flush()
+    assert writes == [{"job-1": (20, "step 2")}]
+
+
+def test_discard_forgets_a_job():
+    writes = []
+    reporter = ProgressReporter(writes.append, interval=3600)
+    reporter.report("job-1", 50, "step 5")
+    reporter.discard("job-1")
+    reporter.flush()
+    assert writes == []
+    # A rerun of the job reports from the start again
+    reporter.report("job-1", 10, "step 1")
+    reporter.flush()
+    assert writes == [{"job-1": (10, "step 1")}]
+
+
+def test_background_writer_flushes():
+    writes = []
+    reporter = ProgressReporter(writes.append, interval=0.01)
+    reporter.report("job-1", 10, "step 1")
+    deadline = time.time() + 5
+    while not writes and time.time() < deadline:
+        time.sleep(0.01)
+    assert writes == [{"job-1": (10, "step 1")}]
+
+
+def test_step_reporter_spreads_steps_over_the_stage():
+    writes = []
+    reporter = ProgressReporter(writes.append, interval=3600)
+    on_step = reporter.step_reporter("job-1", 10, 30, "Generating model")
+    on_step(5, 20)
+    reporter.flush()
+    on_step(20, 20)
+    reporter.flush()
+    assert writes == [
+        {"job-1": (15, "Generating model: step 5/20")},
+        {"job-1": (30, "Generating model: step 20/20")},
+    ]
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from api.core.stages import Stage, StageGraph, StageTiming
+
+
+def diamond(calls, barrier=None):
+    """a -> (b, c) -> d; b and c meet at the barrier, so they only finish if they run side by side."""
+    def branch(name):
+        def run(x):
+            calls.append(name)
+            if barrier is not None:
+                barrier.wait(5)
+            return f"{x}{name}"
+        return run
+    return StageGraph(
+        [
+            Stage("a", lambda seed: calls.append("a") or seed, inputs=("seed",), outputs=("x",)),
+            Stage("b", branch("b"), inputs=("x",), outputs=("from_b",)),
+            Stage("c", branch("c"), inputs=("x",), outputs=("from_c",)),
+            Stage("d", lambda from_b, from_c: {"joined": from_b + from_c, "count": 2},
+                  inputs=("from_b", "from_c"), outputs=("joined", "count")),
+        ],
+        initial=("seed",),
+    )
+
+
+def test_runs_in_dependency_order():
+    calls = []
+    context, timings = diamond(calls).run({"seed": "s"})
+    assert calls[0] == "a" and sorted(calls[1:]) == ["b", "c"]
+    assert context["joined"] == "sbsc"
+    assert context["count"] == 2
+    assert set(timings) == {"a", "b", "c", "d"}
+
+
+def test_independent_branches_run_in_parallel():
+    calls = []
+    # Run one after another, b would wait at the barrier until it broke
+    context, _ = diamond(calls, threading.Barrier(2)).run({"seed": "s"})
+    assert context["joined"] == "sbsc"
+
+
+def test_progress_callback_sees_every_stage():
+    seen = []
+    diamond([]).run({"seed": "s"}, on_stage_done=lambda stage, outputs, done, total: seen.append((stage.name, done, total)))
+    assert [name for name, _, _ in seen][0] == "a"
+    assert [done for _, done, _ in seen] == [1, 2, 3, 4]
+    assert {total for _, _, total in seen} == {4}
+
+
+def test_completed_stages_are_skipped():
+    calls = []
+    context, timings = diamond(calls).run({"seed": "s"}, completed={"a": {"x": "r"}, "b": {"from_b": "rb"}})
+    assert calls == ["c"]
+    assert context["joined"] == "rbrc"
+    assert timings["a"].duration == 0
+
+
+def test_failure_is_raised():
+    def fail(x):
+        raise RuntimeError("rigging failed")
+
+    graph = StageGraph([
+        Stage("a", lambda seed: seed, inputs=("seed",), outputs=("x",)),
+        Stage("b", fail, inputs=("x",), outputs=("y",)),
+    ], initial=("seed",))
+    with pytest.raises(RuntimeError, match="rigging failed"):
+        graph.run({"seed": 1})
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="needs inputs"):
+        StageGraph([Stage("a", lambda missing: 1, inputs=("missing",), outputs=("x",))])
+    with pytest.raises(ValueError, match="produced by both"):
+        StageGraph([Stage("a", lambda: 1, outputs=("x",)), Stage("b", lambda: 2, outputs=("x",))])
+    with pytest.raises(ValueError, match="cycle"):
+        StageGraph([Stage("a", lambda y: 1, inputs=("y",), outputs=("x",)),
+                    Stage("b", lambda x: 2, inputs=("x",), outputs=("y",))])
+
+
+def test_critical_path_follows_the_slowest_branch():
+    graph = diamond([])
+    now = time.time()
+    timings = {name: StageTiming(name, now, now + seconds) for name, seconds in {"a": 1, "b": 5, "c": 2, "d": 1}.items()}
+    assert graph.critical_path(timings) == ["a", "b", "d"]
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+from uuid import uuid4
+
+import pytest
+
+from api.core import jobs
+from api.core.config import settings
+from api.core.events import job_event_bus
+from api.core.jobs import create_job, update_job_status, complete_job
+from api.core.streaming import sse_job_events, job_events, handle_message
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_STREAM_POLL_INTERVAL", 0.05)
+
+
+def new_job() -> str:
+    job_id = str(uuid4())
+    create_job(job_id)
+    return job_id
+
+
+def parse_sse(frames):
+    return [(frame.split("\n")[0][len("event: "):], json.loads(frame.split("\n")[1][len("data: "):])) for frame in frames]
+
+
+async def collect(stream, on_first=None):
+    frames = []
+    async for frame in stream:
+        frames.append(frame)
+        if len(frames) == 1 and on_first is not None:
+            on_first()
+    return frames
+
+
+def test_sse_of_a_finished_job_sends_its_state_and_ends():
+    job_id = new_job()
+    complete_job(job_id, {"modelUrl": "/static/generated/model.glb"})
+    events = parse_sse(asyncio.run(asyncio.wait_for(collect(sse_job_events([job_id])), 5)))
+    assert [name for name, _ in events] == ["job", "done"]
+    assert events[0][1]["status"] == "completed"
+    assert events[0][1]["result"] == {"modelUrl": "/static/generated/model.glb"}
+
+
+def test_sse_streams_transitions_until_every_job_finishes():
+    first, second = new_job(), new_job()
+
+    def run_jobs():
+        update_job_status(first, "processing", 30, "Model generated, starting post-processing.")
+        complete_job(first, {})
+        update_job_status(second, "failed", 100, "boom")
+
+    frames = asyncio.run(asyncio.wait_for(
+        collect(sse_job_events([first, second]), on_first=lambda: threading.Thread(target=run_jobs).start()), 5))
+    events = parse_sse(frames)
+    assert events[-1][0] == "done"
+    statuses = {}
+    for _, event in events[:-1]:
+        statuses.setdefault(event["jobId"], []).append(event["status"])
+    assert statuses[first] == ["pending", "processing", "completed"]
+    assert statuses[second] == ["pending", "failed"]
+
+
+def test_transitions_from_other_processes_are_polled():
+    job_id = new_job()
+
+    async def run():
+        stream = sse_job_events([job_id])
+        first = await stream.__anext__()
+        # Written straight to the store, as another process would, so nothing is published here
+        jobs.job_store.complete(job_id, {})
+        return [first] + await collect(stream)
+
+    events = parse_sse(asyncio.run(asyncio.wait_for(run(), 5)))
+    assert [event["status"] for _, event in events[:-1]] == ["pending", "completed"]
+
+
+def test_unknown_job_ends_the_stream():
+    events = parse_sse(asyncio.run(asyncio.wait_for(collect(sse_job_events(["missing"])), 5)))
+    assert events == [("job", {"status": "not_found", "jobId": "missing"}), ("done", {})]
+
+
+def test_websocket_messages_change_the_subscription():
+    job_id = new_job()
+
+    async def run():
+        subscription = job_event_bus.subscribe()
+        stream = job_events(subscription, close_when_done=False)
+        assert handle_message(subscription, json.dumps({"action": "subscribe", "jobIds": [job_id]})) is None
+        snapshot = await stream.__anext__()
+        update_job_status(job_id, "processing", 40, "Rigging complete.")
+        transition = await stream.__anext__()
+        assert handle_message(subscription, json.dumps({"action": "unsubscribe", "jobIds": [job_id]})) is None
+        remaining = set(subscription.job_ids)
+        await stream.aclose()
+        return snapshot, transition, remaining
+
+    snapshot, transition, remaining = asyncio.run(asyncio.wait_for(run(), 5))
+    assert (snapshot["status"], transition["status"], transition["progress"]) == ("pending", "processing", 40)
+    assert remaining == set()
+
+
+@pytest.mark.parametrize("frame", ["[]", '"x"', "42", "not json", '{"action": "subscribe", "jobIds": "job-1"}',
+                                   '{"action": "subscribe", "jobIds": [1]}', '{"action": "watch", "jobIds": []}'])
+def test_malformed_websocket_frames_are_answered_with_an_error(frame):
+    async def run():
+        subscription = job_event_bus.subscribe()
+        try:
+            return handle_message(subscription, frame), set(subscription.job_ids)
+        finally:
+            subscription.close()
+
+    error, job_ids = asyncio.run(run())
+    assert "error" in error
+    assert job_ids == set()
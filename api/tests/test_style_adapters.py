@@ -0,0 +1,96 @@
+import threading
+import time
+
+from api.generators.style_adapters import StyleAdapters
+
+
+class FakePipeline:
+    def __init__(self, broken=()):
+        self.calls = []
+        self.broken = broken
+
+    def load_lora_weights(self, source, adapter_name):
+        if adapter_name in self.broken:
+            raise OSError("missing weights")
+        self.calls.append(("load", adapter_name))
+
+    def set_adapters(self, names, adapter_weights):
+        self.calls.append(("set", names[0]))
+
+    def enable_lora(self):
+        self.calls.append(("enable",))
+
+    def disable_lora(self):
+        self.calls.append(("disable",))
+
+
+def test_adapter_loads_once_and_switches():
+    pipeline = FakePipeline()
+    adapters = StyleAdapters(pipeline, {"anime": "loras/anime", "voxel": "loras/voxel"})
+    for style in ("anime", "voxel", "anime"):
+        with adapters.use(style):
+            pass
+    assert pipeline.calls == [("load", "anime"), ("set", "anime"), ("load", "voxel"), ("set", "voxel"), ("set", "anime")]
+    stats = adapters.stats()
+    assert stats["active"] == "anime"
+    assert stats["switches"] == 3
+    assert stats["adapters"]["anime"]["kind"] == "lora"
+
+
+def test_same_style_does_not_switch():
+    pipeline = FakePipeline()
+    adapters = StyleAdapters(pipeline, {"anime": "loras/anime"})
+    for _ in range(3):
+        with adapters.use("anime"):
+            pass
+    assert adapters.stats()["switches"] == 1
+
+
+def test_prompt_only_style_runs_on_the_base_model():
+    pipeline = FakePipeline(broken=("voxel",))
+    adapters = StyleAdapters(pipeline, {"anime": "loras/anime", "voxel": "loras/voxel", "cartoon": None})
+    for style in ("anime", "voxel", "cartoon", "anime"):
+        with adapters.use(style):
+            pass
+    assert pipeline.calls == [("load", "anime"), ("set", "anime"), ("disable",), ("enable",), ("set", "anime")]
+    assert adapters.stats()["adapters"]["voxel"]["kind"] == "prompt"
+    assert adapters.stats()["adapters"]["cartoon"]["kind"] == "prompt"
+
+
+def test_preload():
+    pipeline = FakePipeline()
+    adapters = StyleAdapters(pipeline, {"anime": "loras/anime"})
+    adapters.preload("anime")
+    assert adapters.is_loaded("anime")
+    assert adapters.stats()["active"] is None
+
+
+def test_other_style_waits_for_running_generations():
+    adapters = StyleAdapters(FakePipeline(), {"anime": None, "voxel": None})
+    order = []
+
+    def generate(style, hold):
+        with adapters.use(style):
+            order.append(f"{style} start")
+            time.sleep(hold)
+            order.append(f"{style} end")
+
+    first = threading.Thread(target=generate, args=("anime", 0.2))
+    first.start()
+    time.sleep(0.05)
+    # Same style joins the running generation, another style waits for both
+    second = threading.Thread(target=generate, args=("anime", 0.2))
+    second.start()
+    time.sleep(0.05)
+    other = threading.Thread(target=generate, args=("voxel", 0))
+    other.start()
+    time.sleep(0.05)
+    # Once voxel waits, later anime work queues behind it
+    late = threading.Thread(target=generate, args=("anime", 0))
+    late.start()
+    for thread in (first, second, other, late):
+        thread.join(5)
+    assert order[:2] == ["anime start", "anime start"]
+    assert order.index("voxel start") > order.index("anime end")
+    assert order.index("voxel start") == 4
+    assert order[-2:] == ["anime start", "anime end"]
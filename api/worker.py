@@ -0,0 +1,144 @@
+"""
+Pipeline worker.
+
+Leases pipeline jobs from the job broker and runs them, so generation can run
+on machines separate from the API nodes (PIPELINE_BACKEND=broker). Each slot
+holds one lease at a time and heartbeats it while the pipeline runs; if the
+worker dies, the lease expires and another worker picks the job up again,
+resuming from its last checkpointed stage. Its pipeline metrics are served for
+Prometheus on WORKER_METRICS_PORT.
+
+Usage (from the repository root):
+    python -m api.worker --slots 2
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+from api.core.broker import JobBroker, Lease, create_job_broker
+from api.core.config import settings
+from api.core.dispatch import run_message, message_job_ids
+from api.core.executor import LANES
+from api.core.jobs import update_job_status, fail_jobs
+from api.core.metrics import registry, queue_wait, observe_pipeline_result
+from api.core.warmup import ModelWarmup
+from api.generators.stable_diffusion_3d import sd3d_generator
+
+
+def _keep_alive(broker: JobBroker, lease: Lease, done: threading.Event):
+    while not done.wait(settings.BROKER_HEARTBEAT_INTERVAL):
+        if not broker.heartbeat(lease, settings.BROKER_LEASE_SECONDS):
+            print(f"[{lease.worker_id}] Lost lease on message {lease.message_id} (job {lease.job_id})")
+            return
+
+
+def _run_lease(broker: JobBroker, lease: Lease):
+    print(f"[{lease.worker_id}] Running {lease.task} for job {lease.job_id} (delivery {lease.deliveries})")
+    if lease.enqueued_at is not None:
+        queue_wait.observe(lease.leased_at - lease.enqueued_at, lane=LANES[lease.lane])
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_keep_alive, args=(broker, lease, done), daemon=True)
+    heartbeat.start()
+    try:
+        result = run_message(lease.task, lease.payload)
+        try:
+            observe_pipeline_result(result)
+        except Exception as e:
+            print(f"[{lease.worker_id}] Recording metrics for job {lease.job_id} failed: {e}")
+    except Exception as e:
+        # The pipeline handles its own errors, so this is a bad payload or a crash that
+        # a redelivery would repeat: fail the jobs with the error instead
+        print(f"[{lease.worker_id}] {lease.task} for job {lease.job_id} raised: {e}")
+        try:
+            fail_jobs(message_job_ids(lease.task, lease.payload), f"Pipeline crashed: {e or type(e).__name__}")
+        except Exception as fail_error:
+            print(f"[{lease.worker_id}] Marking job {lease.job_id} failed raised: {fail_error}")
+    finally:
+        done.set()
+        heartbeat.join()
+    broker.ack(lease)
+
+
+def _slot_loop(broker: JobBroker, slot_id: str, stop: threading.Event):
+    while not stop.is_set():
+        lease = broker.lease(slot_id, settings.BROKER_LEASE_SECONDS)
+        if lease is None:
+            stop.wait(settings.BROKER_POLL_INTERVAL)
+            continue
+        _run_lease(broker, lease)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per scrape is noise
+
+
+def _serve_metrics(port: int) -> ThreadingHTTPServer:
+    """
+    Serve this worker's metrics registry at /metrics, the same text the API's /metrics returns.
+    """
+    server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="worker-metrics", daemon=True).start()
+    return server
+
+
+def _fail_dead_letters(broker: JobBroker):
+    for lease in broker.dead_letters():
+        for job_id in message_job_ids(lease.task, lease.payload):
+            update_job_status(job_id, "failed", 100, "Job was interrupted too many times.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run asset pipeline jobs from the job broker")
+    parser.add_argument("--slots", type=int, default=settings.PIPELINE_WORKERS, help="Jobs run concurrently")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:6]}")
+    parser.add_argument("--metrics-port", type=int, default=settings.WORKER_METRICS_PORT,
+                        help="Port of the Prometheus /metrics endpoint (0 = off)")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        _serve_metrics(args.metrics_port)
+        print(f"Serving metrics on :{args.metrics_port}/metrics")
+
+    # Load the configured styles before taking any jobs, so the first ones don't pay for it
+    ModelWarmup(sd3d_generator, settings.WARMUP_STYLES).run()
+
+    broker = create_job_broker()
+    stop = threading.Event()
+    slots = [
+        threading.Thread(target=_slot_loop, args=(broker, f"{args.worker_id}/{index}", stop), name=f"worker-slot-{index}")
+        for index in range(args.slots)
+    ]
+    for slot in slots:
+        slot.start()
+    print(f"Worker {args.worker_id} started with {args.slots} slots on {settings.BROKER_PATH}")
+
+    try:
+        while True:
+            broker.register_worker(args.worker_id, args.slots)
+            _fail_dead_letters(broker)
+            time.sleep(settings.BROKER_HEARTBEAT_INTERVAL)
+    except KeyboardInterrupt:
+        print(f"Worker {args.worker_id} stopping, waiting for running jobs...")
+        stop.set()
+        for slot in slots:
+            slot.join()
+
+
+if __name__ == "__main__":
+    main()